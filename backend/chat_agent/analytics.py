@@ -0,0 +1,150 @@
+"""
+Activity analytics over saved plans.
+
+Each saved TravelPlan's itinerary JSON is flattened into PlanActivity rows when the
+plan is written (and by the backfill_plan_activities command for older plans), so
+questions like "most planned attractions in Rome this month" are indexed SQL
+aggregates instead of a scan that parses every plan.
+
+A turn that only chats keeps the session's plan unchanged. Such unchanged copies
+(same `plan_hash` as the session's previous plan) are not indexed, so counts of
+plans reflect distinct itineraries.
+"""
+
+import hashlib
+import json
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max
+
+from travel_planner.core.slots import apply_user_message, normalize_city
+from travel_planner.core.validation import parse_time_range
+
+from .models import PlanActivity
+
+
+def _text(value, max_length):
+    if value is None or isinstance(value, (dict, list)):
+        return ""
+    return str(value).strip()[:max_length]
+
+
+def _coordinate(value, limit):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if -limit <= number <= limit else None
+
+
+def _day_date(value):
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _days(itinerary):
+    """(date string or None, day) pairs of a list- or date-keyed itinerary."""
+    days = itinerary.get("itinerary") if isinstance(itinerary, dict) else None
+    if isinstance(days, dict):
+        return [(day.get("date") or key if isinstance(day, dict) else key, day) for key, day in days.items()]
+    if isinstance(days, list):
+        return [(day.get("date") if isinstance(day, dict) else None, day) for day in days]
+    return []
+
+
+def plan_hash(itinerary):
+    """Stable digest of an itinerary's JSON, for spotting unchanged copies."""
+    return hashlib.sha1(json.dumps(itinerary, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def activity_rows(plan, city=""):
+    """Unsaved PlanActivity rows for a plan; malformed days and activities are skipped."""
+    city = normalize_city(city)[:100]
+    rows = []
+    for day_index, (day_date, day) in enumerate(_days(plan.itinerary)):
+        activities = day.get("activities") if isinstance(day, dict) else None
+        if not isinstance(activities, list):
+            continue
+        for order, activity in enumerate(activities):
+            name = _text(activity.get("name"), 255) if isinstance(activity, dict) else ""
+            if not name:
+                continue
+            location = activity.get("location") if isinstance(activity.get("location"), dict) else {}
+            place_id = _text(activity.get("place_id") or location.get("place_id"), 255)
+            time_text = _text(activity.get("time"), 100)
+            rows.append(PlanActivity(
+                plan=plan,
+                city=city,
+                planned_at=plan.created_at,
+                day_index=day_index,
+                day_date=_day_date(day_date),
+                order=order,
+                place_key=place_id or f"name:{normalize_city(name)}"[:255],
+                place_id=place_id,
+                name=name,
+                latitude=_coordinate(location.get("latitude"), 90),
+                longitude=_coordinate(location.get("longitude"), 180),
+                time=time_text,
+                start_minute=parse_time_range(time_text)[0],
+                budget=_text(activity.get("budget"), 100),
+            ))
+    return rows
+
+
+def index_plan(plan, city=""):
+    """Replaces the plan's activity rows; returns how many were written."""
+    rows = activity_rows(plan, city)
+    with transaction.atomic():
+        PlanActivity.objects.filter(plan=plan).delete()
+        PlanActivity.objects.bulk_create(rows)
+    return len(rows)
+
+
+def session_city(session):
+    """The trip city stated in a session's user messages (rule-based, as the planner's slot extraction)."""
+    slots = {}
+    for content in session.messages.filter(message_type='user').order_by('timestamp').values_list('content', flat=True).iterator():
+        slots = apply_user_message(slots, content)
+    return slots.get("target_city") or ""
+
+
+def activities_between(since=None, until=None, city=None):
+    """PlanActivity queryset filtered by planned_at date range and normalized city."""
+    queryset = PlanActivity.objects.all()
+    if city:
+        queryset = queryset.filter(city=normalize_city(city))
+    if since:
+        queryset = queryset.filter(planned_at__date__gte=since)
+    if until:
+        queryset = queryset.filter(planned_at__date__lte=until)
+    return queryset
+
+
+def top_places(queryset, limit=20):
+    """Most planned places: number of plans including each, with a representative name and mean coordinates."""
+    return list(
+        queryset.values('place_key')
+        .annotate(plans=Count('plan', distinct=True), activities=Count('id'), place_name=Max('name'),
+                  lat=Avg('latitude'), lon=Avg('longitude'))
+        .order_by('-plans', '-activities', 'place_key')[:limit]
+    )
+
+
+def city_counts(queryset, limit=50):
+    """Cities by number of plans and activities."""
+    return list(
+        queryset.exclude(city="").values('city')
+        .annotate(plans=Count('plan', distinct=True), activities=Count('id'))
+        .order_by('-plans', 'city')[:limit]
+    )
+
+
+def start_hour_counts(queryset):
+    """Activities per starting hour of the day."""
+    counts = [0] * 24
+    for row in queryset.exclude(start_minute=None).values('start_minute').annotate(count=Count('id')):
+        counts[row['start_minute'] // 60] += row['count']
+    return [{'hour': hour, 'activities': count} for hour, count in enumerate(counts)]
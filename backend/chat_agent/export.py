@@ -0,0 +1,108 @@
+"""
+Streaming NDJSON export of chat sessions with their messages and plans.
+
+One line per session: the session fields plus its `messages` and `plans`. Sessions,
+messages and plans are read by three queries ordered by session and streamed with
+`.iterator(chunk_size=...)` (server-side cursors on PostgreSQL), then merged one
+session at a time. Memory use therefore depends on the largest session, not on the
+table sizes.
+
+With `since`, the export is incremental. A session is included if it was created or
+touched since then, or if it has new messages or changed plans. Only those new
+messages and plans are included. Pass the previous export's start time as `since`
+to pick up where it left off.
+"""
+
+import json
+import zlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ChatSession, Message, TravelPlan
+
+SESSION_FIELDS = ('session_id', 'created_at', 'is_active', 'last_interaction')
+MESSAGE_FIELDS = ('session_id', 'id', 'message_type', 'content', 'timestamp')
+PLAN_FIELDS = ('session_id', 'id', 'itinerary', 'created_at', 'updated_at', 'is_final')
+
+
+def parse_since(value):
+    """ISO datetime or date (midnight UTC) -> aware datetime; None if empty. Raises ValueError if invalid."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid since value: {value!r}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _querysets(since):
+    sessions = ChatSession.objects.all()
+    messages = Message.objects.all()
+    plans = TravelPlan.objects.all()
+    if since is not None:
+        messages = messages.filter(timestamp__gte=since)
+        plans = plans.filter(updated_at__gte=since)
+        sessions = sessions.filter(
+            Q(created_at__gte=since) | Q(last_interaction__gte=since)
+            | Exists(messages.filter(session=OuterRef('pk')))
+            | Exists(plans.filter(session=OuterRef('pk')))
+        )
+    return (
+        sessions.order_by('session_id').values(*SESSION_FIELDS),
+        messages.order_by('session_id', 'timestamp', 'id').values(*MESSAGE_FIELDS),
+        plans.order_by('session_id', 'created_at', 'id').values(*PLAN_FIELDS),
+    )
+
+
+def _take(rows, pending, session_id):
+    """Rows of `rows` (ordered by session) belonging to `session_id`; `pending` holds the look-ahead row."""
+    taken = []
+    while True:
+        row = pending[0] if pending else next(rows, None)
+        pending.clear()
+        if row is None:
+            return taken
+        if row['session_id'] < session_id:
+            continue  # its session is not in the export
+        if row['session_id'] > session_id:
+            pending.append(row)
+            return taken
+        del row['session_id']
+        taken.append(row)
+
+
+def export_sessions(since=None, chunk_size=1000):
+    """Yields one dict per exported session with its messages and plans."""
+    sessions, messages, plans = _querysets(since)
+    message_rows = messages.iterator(chunk_size=chunk_size)
+    plan_rows = plans.iterator(chunk_size=chunk_size)
+    pending_message, pending_plan = [], []
+    for session in sessions.iterator(chunk_size=chunk_size):
+        session['messages'] = _take(message_rows, pending_message, session['session_id'])
+        session['plans'] = _take(plan_rows, pending_plan, session['session_id'])
+        yield session
+
+
+def ndjson_lines(records):
+    """Encodes each record as one JSON line (bytes)."""
+    for record in records:
+        yield (json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """Compresses a byte stream into gzip format incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from chat_agent import analytics
+from chat_agent.models import ChatSession, PlanActivity, TravelPlan
+
+
+class Command(BaseCommand):
+    help = ("Extracts PlanActivity rows from saved plans. Plans are streamed in chunks, "
+            "so memory stays constant however many plans there are. A plan identical to the "
+            "session's previous one gets no rows (use --rebuild to drop rows of such copies).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Plans fetched and written per batch")
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Re-extract every plan (default: only plans without activity rows)")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        plans = TravelPlan.objects.only("id", "session_id", "itinerary", "created_at")
+        if not options["rebuild"]:
+            plans = plans.filter(~Exists(PlanActivity.objects.filter(plan=OuterRef("pk"))))
+        # Ordered by session so each session's city is worked out once and then dropped
+        plans = plans.order_by("session_id", "created_at", "id")
+
+        city_session, city, previous_hash = None, "", None
+        batch, rows, plan_count, row_count = [], [], 0, 0
+        for plan in plans.iterator(chunk_size=chunk_size):
+            if plan.session_id != city_session:
+                city_session, previous_hash = plan.session_id, None
+                city = analytics.session_city(ChatSession(session_id=city_session))
+            batch.append(plan.id)
+            # Older turns saved a copy of the unchanged plan after every chat-only reply
+            digest = analytics.plan_hash(plan.itinerary)
+            if digest != previous_hash:
+                rows.extend(analytics.activity_rows(plan, city))
+            previous_hash = digest
+            if len(batch) >= chunk_size:
+                row_count += self._write(batch, rows)
+                plan_count += len(batch)
+                batch, rows = [], []
+                self.stdout.write(f"{plan_count} plans, {row_count} activities")
+        if batch:
+            row_count += self._write(batch, rows)
+            plan_count += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {row_count} activities from {plan_count} plans."))
+
+    def _write(self, plan_ids, rows):
+        with transaction.atomic():
+            PlanActivity.objects.filter(plan_id__in=plan_ids).delete()
+            PlanActivity.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from chat_agent import export
+
+
+class Command(BaseCommand):
+    help = ("Writes all chat sessions with their messages and plans as NDJSON, streamed "
+            "with constant memory. Optionally gzip-compressed and incremental (--since).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", default="-", help="Output file, or - for stdout (a .gz name implies --gzip)")
+        parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip")
+        parser.add_argument("--since", help="Only export what changed since this ISO date or datetime")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows fetched per database round trip")
+
+    def handle(self, *args, **options):
+        try:
+            since = export.parse_since(options["since"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Anything changed after this is picked up by the next incremental export
+        started_at = timezone.now()
+        chunks = export.ndjson_lines(export.export_sessions(since, options["chunk_size"]))
+        if options["gzip"] or options["output"].endswith(".gz"):
+            chunks = export.gzip_chunks(chunks)
+
+        out = sys.stdout.buffer if options["output"] == "-" else open(options["output"], "wb")
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+            else:
+                out.flush()
+        self.stderr.write(f"Export complete. Next incremental export: --since {started_at.isoformat()}")
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from travel_planner.warmup import add_warmup_arguments, format_report, warm_from_args
+
+
+class Command(BaseCommand):
+    help = "Pre-populates the geocode, weather, Places and travel-time caches for popular destinations."
+
+    def add_arguments(self, parser):
+        add_warmup_arguments(parser)
+
+    def handle(self, *args, **options):
+        if not (options["cities"] or options["spec"]):
+            raise CommandError("Give --cities or a --spec file.")
+        report = warm_from_args(_Args(options))
+        self.stdout.write(json.dumps(report, indent=2) if options["json"] else format_report(report))
+
+
+class _Args:
+    """Attribute access to the parsed options, as warm_from_args expects."""
+
+    def __init__(self, options):
+        self.__dict__.update(options)
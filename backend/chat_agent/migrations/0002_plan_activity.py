@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_agent', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('planned_at', models.DateTimeField()),
+                ('day_index', models.PositiveSmallIntegerField()),
+                ('day_date', models.DateField(blank=True, null=True)),
+                ('order', models.PositiveSmallIntegerField()),
+                ('place_key', models.CharField(max_length=255)),
+                ('place_id', models.CharField(blank=True, max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('time', models.CharField(blank=True, max_length=100)),
+                ('start_minute', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('budget', models.CharField(blank=True, max_length=100)),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='chat_agent.travelplan')),
+            ],
+            options={
+                'ordering': ['plan', 'day_index', 'order'],
+                'indexes': [models.Index(fields=['city', 'planned_at'], name='chat_agent__city_5a3b79_idx'), models.Index(fields=['place_key', 'planned_at'], name='chat_agent__place_k_ae5460_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_agent', '0002_plan_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='transcript',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='transcript_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
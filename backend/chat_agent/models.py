@@ -6,6 +6,10 @@ class ChatSession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     last_interaction = models.DateTimeField(auto_now=True)
+    # Full graph message history including tool calls and results, encoded with
+    # travel_planner.utils.transcript_codec; user messages sent later are in `messages`.
+    transcript = models.BinaryField(null=True, blank=True, editable=False)
+    transcript_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
 
 class Message(models.Model):
     MESSAGE_TYPES = (
@@ -27,3 +31,29 @@ class TravelPlan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_final = models.BooleanField(default=False)
+
+class PlanActivity(models.Model):
+    """One activity of a saved plan, extracted from its itinerary JSON for analytics (see analytics.py)."""
+    plan = models.ForeignKey(TravelPlan, on_delete=models.CASCADE, related_name='activities')
+    # Copies of plan-level values so aggregates need no join
+    city = models.CharField(max_length=100, blank=True)  # normalized (lowercase) trip city
+    planned_at = models.DateTimeField()  # the plan's created_at
+    day_index = models.PositiveSmallIntegerField()
+    day_date = models.DateField(null=True, blank=True)
+    order = models.PositiveSmallIntegerField()
+    # place_id when the plan has one, otherwise "name:" + the normalized name
+    place_key = models.CharField(max_length=255)
+    place_id = models.CharField(max_length=255, blank=True)
+    name = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    time = models.CharField(max_length=100, blank=True)
+    start_minute = models.PositiveSmallIntegerField(null=True, blank=True)  # minutes after midnight
+    budget = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['plan', 'day_index', 'order']
+        indexes = [
+            models.Index(fields=['city', 'planned_at']),
+            models.Index(fields=['place_key', 'planned_at']),
+        ]
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ChatSessionViewSet
+from .views import ChatSessionViewSet, PlanAnalyticsViewSet
 
 router = DefaultRouter()
 router.register(r'sessions', ChatSessionViewSet)
+router.register(r'analytics', PlanAnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,16 +1,118 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.http import StreamingHttpResponse
 from .models import ChatSession, Message, TravelPlan
+from . import analytics, export
 from .serializers import ChatSessionSerializer, MessageSerializer, TravelPlanSerializer
 from travel_planner.__main__ import compile_graph  # Import the main entry point
-from travel_planner.config.settings import SYSTEM_PROMPT
+from travel_planner.core.graph import stream_turn_events
+from travel_planner.config.settings import SYSTEM_PROMPT, GRAPH_RECURSION_LIMIT, SESSION_LOCK_TTL_S, SESSION_LOCK_WAIT_S
+from travel_planner.utils.shared_state import LockTimeout, state as shared_state
+from travel_planner.utils.transcript_codec import TranscriptDecodeError, decode_messages, encode_messages
+from django.utils import timezone
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from datetime import date
 import json
 import logging
 
+def _transcript_messages(session):
+    """The stored graph transcript plus the user messages sent after it, or None if there is none."""
+    if session.transcript is None:
+        return None
+    try:
+        messages = decode_messages(session.transcript)
+    except TranscriptDecodeError as e:
+        logging.warning(f"Ignoring unreadable transcript of session {session.session_id}: {e}")
+        return None
+    newer = session.messages.filter(message_type='user', timestamp__gt=session.transcript_updated_at).order_by('timestamp')
+    return messages + [HumanMessage(content=msg.content) for msg in newer]
+
+def _conversation_state(session):
+    """Rebuilds the graph input from the stored transcript (or session messages) and latest plan."""
+    # Initialize conversation state as used in travel_planner
+    messages = _transcript_messages(session)
+    if messages is None:
+        messages = []
+        for msg in session.messages.all().order_by('timestamp'):
+            if msg.message_type == 'user':
+                messages.append(HumanMessage(content=msg.content))
+            elif msg.message_type == 'agent':
+                messages.append(AIMessage(content=msg.content))
+            elif msg.message_type == 'system':
+                messages.append(SystemMessage(content=msg.content))
+
+    conversation_state = {
+        "messages": messages,
+        "current_plan": None,
+        "error_message": None
+    }
+
+    # Get latest plan if exists
+    latest_plan = session.travel_plans.filter(is_final=True).order_by('-created_at').first()
+    if latest_plan is not None:
+        conversation_state["current_plan"] = latest_plan.itinerary
+    return conversation_state
+
+def _save_turn(session, conversation_state, graph_output_state):
+    """Stores the turn's AI reply and plan; returns (agent_message or None, has_plan)."""
+    previous_plan = conversation_state["current_plan"]
+    # Update conversation state
+    conversation_state["messages"] = graph_output_state.get("messages", conversation_state["messages"])
+    conversation_state["current_plan"] = graph_output_state.get("current_plan", conversation_state["current_plan"])
+    conversation_state["error_message"] = graph_output_state.get("error_message")
+
+    # Get the latest AI message
+    last_ai_message = next((msg for msg in reversed(conversation_state["messages"]) 
+                         if isinstance(msg, AIMessage)), None)
+    if not last_ai_message:
+        return None, False
+
+    # Store the AI message
+    agent_message = Message.objects.create(
+        session=session,
+        message_type='agent',
+        content=last_ai_message.content
+    )
+
+    # Store the plan if one was generated
+    has_plan = False
+    # Keep the whole history, tool results included, for the next turn
+    session.transcript = encode_messages(conversation_state["messages"])
+    session.transcript_updated_at = timezone.now()
+    session.save(update_fields=['transcript', 'transcript_updated_at', 'last_interaction'])
+
+    if conversation_state["current_plan"]:
+        has_plan = True
+        if previous_plan and analytics.plan_hash(previous_plan) == analytics.plan_hash(conversation_state["current_plan"]):
+            return agent_message, has_plan  # a chat-only turn; the latest saved plan is still current
+        plan = TravelPlan.objects.create(
+            session=session,
+            itinerary=conversation_state["current_plan"],
+            is_final=True
+        )
+        try:
+            analytics.index_plan(plan, graph_output_state.get("target_city") or "")
+        except Exception as e:
+            # Analytics rows can be rebuilt with backfill_plan_activities; never fail the turn over them
+            logging.error(f"Indexing activities of plan {plan.id} failed: {e}", exc_info=True)
+    return agent_message, has_plan
+
+def _session_lock(session):
+    """Serializes the turns of one session across threads and workers (see utils/shared_state.py)."""
+    return shared_state.lock(f"session:{session.session_id}", ttl_s=SESSION_LOCK_TTL_S, wait_s=SESSION_LOCK_WAIT_S)
+
+_BUSY_ERROR = 'The previous message of this session is still being processed'
+
+def _save_error(session, error):
+    Message.objects.create(
+        session=session,
+        message_type='system',
+        content=f"Error: {str(error)}"
+    )
+
 class ChatSessionViewSet(viewsets.ModelViewSet):
-    queryset = ChatSession.objects.all()
+    queryset = ChatSession.objects.defer('transcript')  # loaded only when a turn needs it
     serializer_class = ChatSessionSerializer
 
     @action(detail=False, methods=['post'])
@@ -47,6 +149,15 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            with _session_lock(session):
+                # Another turn may have finished while this one waited
+                session.refresh_from_db()
+                return self._run_turn(session, user_message)
+        except LockTimeout:
+            return Response({'error': _BUSY_ERROR}, status=status.HTTP_409_CONFLICT)
+
+    def _run_turn(self, session, user_message):
         # Create user message
         Message.objects.create(
             session=session,
@@ -54,73 +165,26 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
             content=user_message
         )
 
-        # Initialize conversation state as used in travel_planner
-        messages = []
-        for msg in session.messages.all().order_by('timestamp'):
-            if msg.message_type == 'user':
-                messages.append(HumanMessage(content=msg.content))
-            elif msg.message_type == 'agent':
-                messages.append(AIMessage(content=msg.content))
-            elif msg.message_type == 'system':
-                messages.append(SystemMessage(content=msg.content))
-
-        conversation_state = {
-            "messages": messages,
-            "current_plan": None,
-            "error_message": None
-        }
-
-        # Get latest plan if exists
-        if session.travel_plans.filter(is_final=True).exists():
-            conversation_state["current_plan"] = session.travel_plans.filter(is_final=True).first().itinerary
+        conversation_state = _conversation_state(session)
 
         # Initialize the travel planner
         app = compile_graph()
 
         try:
             # Run the travel planner graph
-            config = {"recursion_limit": 25}
+            config = {"recursion_limit": GRAPH_RECURSION_LIMIT}
             graph_output_state = app.invoke(conversation_state, config=config)
 
             if graph_output_state:
-                # Update conversation state
-                conversation_state["messages"] = graph_output_state.get("messages", conversation_state["messages"])
-                conversation_state["current_plan"] = graph_output_state.get("current_plan", conversation_state["current_plan"])
-                conversation_state["error_message"] = graph_output_state.get("error_message")
-
-                # Get the latest AI message
-                last_ai_message = next((msg for msg in reversed(conversation_state["messages"]) 
-                                     if isinstance(msg, AIMessage)), None)
-
-                if last_ai_message:
-                    # Store the AI message
-                    agent_message = Message.objects.create(
-                        session=session,
-                        message_type='agent',
-                        content=last_ai_message.content
-                    )
-
-                    # Store the plan if one was generated
-                    has_plan = False
-                    if conversation_state["current_plan"]:
-                        TravelPlan.objects.create(
-                            session=session,
-                            itinerary=conversation_state["current_plan"],
-                            is_final=True
-                        )
-                        has_plan = True
-
+                agent_message, has_plan = _save_turn(session, conversation_state, graph_output_state)
+                if agent_message:
                     return Response({
                         'message': MessageSerializer(agent_message).data,
                         'has_plan': has_plan
                     })
                 
         except Exception as e:
-            Message.objects.create(
-                session=session,
-                message_type='system',
-                content=f"Error: {str(e)}"
-            )
+            _save_error(session, e)
             return Response(
                 {'error': f'Failed to process message: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -131,11 +195,90 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    @action(detail=True, methods=['post'])
+    def stream_message(self, request, pk=None):
+        """
+        Like send_message, but streams newline-delimited JSON events: a "day" event per
+        itinerary day as soon as it is generated, then a "message" (or "error") event.
+        """
+        session = self.get_object()
+        user_message = request.data.get('message')
+        
+        if not user_message:
+            return Response(
+                {'error': 'Message content is required'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def events():
+            try:
+                with _session_lock(session):
+                    session.refresh_from_db()
+                    yield from turn_events()
+            except LockTimeout:
+                yield json.dumps({'type': 'error', 'error': _BUSY_ERROR}) + "\n"
+
+        def turn_events():
+            Message.objects.create(
+                session=session,
+                message_type='user',
+                content=user_message
+            )
+            conversation_state = _conversation_state(session)
+            app = compile_graph()
+            try:
+                config = {"recursion_limit": GRAPH_RECURSION_LIMIT}
+                graph_output_state = None
+                for kind, payload in stream_turn_events(app, conversation_state, config):
+                    if kind == "day":
+                        yield json.dumps({'type': 'day', 'day': payload}) + "\n"
+                    else:
+                        graph_output_state = payload
+
+                agent_message, has_plan = _save_turn(session, conversation_state, graph_output_state) if graph_output_state else (None, False)
+                if agent_message:
+                    yield json.dumps({
+                        'type': 'message',
+                        'message': MessageSerializer(agent_message).data,
+                        'has_plan': has_plan
+                    }, default=str) + "\n"
+                else:
+                    yield json.dumps({'type': 'error', 'error': 'No response generated'}) + "\n"
+            except Exception as e:
+                logging.error(f"Streaming turn failed: {e}", exc_info=True)
+                _save_error(session, e)
+                yield json.dumps({'type': 'error', 'error': f'Failed to process message: {str(e)}'}) + "\n"
+
+        return StreamingHttpResponse(events(), content_type='application/x-ndjson')
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Streams all sessions with their messages and plans as NDJSON (see export.py).
+        `since` (ISO date or datetime) makes the export incremental, `gzip=1` compresses it.
+        """
+        try:
+            since = export.parse_since(request.query_params.get('since'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        chunks = export.ndjson_lines(export.export_sessions(since))
+        filename = 'sessions.ndjson'
+        if request.query_params.get('gzip') in ('1', 'true'):
+            chunks = export.gzip_chunks(chunks)
+            filename += '.gz'
+        response = StreamingHttpResponse(
+            chunks,
+            content_type='application/gzip' if filename.endswith('.gz') else 'application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     @action(detail=True, methods=['get'])
     def get_latest_plan(self, request, pk=None):
         """Get the latest travel plan for the session"""
         session = self.get_object()
-        plan = session.travel_plans.filter(is_final=True).last()
+        plan = session.travel_plans.filter(is_final=True).order_by('-created_at').first()
         
         if not plan:
             return Response(
@@ -144,3 +287,56 @@ class ChatSessionViewSet(viewsets.ModelViewSet):
             )
             
         return Response(TravelPlanSerializer(plan).data)
+
+
+class PlanAnalyticsViewSet(viewsets.ViewSet):
+    """
+    Aggregates over the activities of saved plans. All actions accept `city`,
+    `since` and `until` (YYYY-MM-DD, by plan creation date) query parameters.
+    """
+
+    def _activities(self, request):
+        params = request.query_params
+        since, until = params.get('since'), params.get('until')
+        try:
+            since = date.fromisoformat(since) if since else None
+            until = date.fromisoformat(until) if until else None
+        except ValueError:
+            return None
+        return analytics.activities_between(since, until, params.get('city'))
+
+    def _limit(self, request, default):
+        try:
+            return max(1, min(int(request.query_params.get('limit', default)), 500))
+        except ValueError:
+            return default
+
+    def _bad_dates(self):
+        return Response(
+            {'error': 'since and until must be dates in YYYY-MM-DD format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=False, methods=['get'])
+    def top_places(self, request):
+        """Most planned places, by number of plans that include them"""
+        activities = self._activities(request)
+        if activities is None:
+            return self._bad_dates()
+        return Response(analytics.top_places(activities, self._limit(request, 20)))
+
+    @action(detail=False, methods=['get'])
+    def cities(self, request):
+        """Cities by number of plans"""
+        activities = self._activities(request)
+        if activities is None:
+            return self._bad_dates()
+        return Response(analytics.city_counts(activities, self._limit(request, 50)))
+
+    @action(detail=False, methods=['get'])
+    def start_hours(self, request):
+        """Number of activities starting in each hour of the day"""
+        activities = self._activities(request)
+        if activities is None:
+            return self._bad_dates()
+        return Response(analytics.start_hour_counts(activities))
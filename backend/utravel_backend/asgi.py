@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'utravel_backend.settings')
 
 application = get_asgi_application()
+
+# Warm this worker's tool caches for popular destinations (CACHE_WARMUP_SPEC, see travel_planner/warmup.py)
+from travel_planner.config.settings import CACHE_WARMUP_SPEC  # noqa: E402
+from travel_planner.warmup import start_background_warmup  # noqa: E402
+
+start_background_warmup(CACHE_WARMUP_SPEC)
@@ -0,0 +1,561 @@
+"""
+Load test of the Django chat API with a stubbed planner graph.
+
+Drives the real backend (routing, DRF views, session locks, transcript
+encoding, plan and analytics writes) through its deployment entry points,
+utravel_backend.wsgi and utravel_backend.asgi, in process and without a
+network hop. The planner graph is replaced by a fake with configurable LLM
+latency and CPU cost per turn. No API keys are needed, and the numbers show
+what one backend instance sustains around slow model calls.
+
+Each virtual user runs session scripts back to back: start_session, then for
+each scripted message send_message (or stream_message with --stream) followed
+by get_latest_plan, with think time in between.
+
+- wsgi: requests run on a pool of --workers threads, like one threaded
+  gunicorn worker. Saturation is pool utilization and queue wait.
+- asgi: requests are ASGI calls on one event loop; Django runs the sync views
+  in a thread per request. Saturation is in-flight requests and event loop lag.
+
+Every SQL statement is timed. Lock errors ("database is locked") and slow
+writes (waits for SQLite's write lock) show database contention.
+
+A fresh SQLite database in a temporary directory is used unless --database
+is given. Scripts (--scripts) are a JSON list of {"messages": [...]}.
+
+Usage:
+    python benchmarks/bench_backend_load.py [--deployment both] [--concurrency 20] [--sessions 100]
+        [--workers 8] [--llm-latency-ms 800] [--llm-calls 2] [--graph-cpu-ms 5] [--stream] [--json]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "backend"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "utravel_backend.settings")
+os.environ.setdefault("PREFETCH_ENABLED", "false")
+os.environ["CACHE_WARMUP_SPEC"] = ""
+
+import django
+from django.conf import settings
+from django.db import OperationalError
+from django.db.backends.signals import connection_created
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+DEFAULT_SCRIPTS = [
+    {"messages": ["I'd like a 3-day trip to Paris from 2026-11-03 to 2026-11-05, museums and cafes, "
+                  "mid-range budget, moderate pace, public transport.",
+                  "Make the second day more relaxed and add a food market."]},
+    {"messages": ["Plan 2 days in Rome, 2026-12-10 to 2026-12-11, ancient history and food, walking.",
+                  "Swap the first dinner for somewhere cheaper.",
+                  "Looks good, thanks!"]},
+]
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class FakePlannerGraph:
+    """
+    Stands in for the compiled planner graph. A turn makes `llm_calls` model calls
+    (a places tool round per extra call, then the plan reply) and spends `cpu_s`
+    of CPU time holding the GIL, like plan parsing, validation and routing.
+    """
+
+    def __init__(self, llm_latency_s, llm_jitter, llm_calls, cpu_s, plan_days, seed=0):
+        self.llm_latency_s = llm_latency_s
+        self.llm_jitter = llm_jitter
+        self.llm_calls = max(1, llm_calls)
+        self.cpu_s = cpu_s
+        self.plan_days = plan_days
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _latency(self):
+        with self._rng_lock:
+            factor = self._rng.lognormvariate(0, self.llm_jitter) if self.llm_jitter else 1.0
+        return self.llm_latency_s * factor
+
+    def _burn_cpu(self):
+        end = time.thread_time() + self.cpu_s
+        while time.thread_time() < end:
+            pass
+
+    def _city(self, messages):
+        from travel_planner.core.slots import apply_user_message
+        slots = {}
+        for message in messages:
+            if isinstance(message, HumanMessage) and isinstance(message.content, str):
+                slots = apply_user_message(slots, message.content)
+        return slots.get("target_city") or "Paris"
+
+    def _plan(self, city, turn):
+        rng = random.Random(f"{city}:{turn}")
+        lat, lon = 40 + rng.random() * 10, rng.random() * 15
+        return {"itinerary": [{"date": f"2026-11-{3 + d:02d}", "activities": [
+            {"name": f"{city} stop {d}-{i}", "time": f"{9 + 2 * i:02d}:00 - {10 + 2 * i:02d}:30",
+             "description": "A visit.", "location": {"latitude": round(lat + rng.random() / 50, 5),
+                                                      "longitude": round(lon + rng.random() / 50, 5)},
+             "address": f"{rng.randint(1, 200)} Example Street, {city}", "budget": "$$", "notes": ""}
+            for i in range(4)]} for d in range(self.plan_days)]}
+
+    def _tool_round(self, city, turn, call):
+        call_id = f"call_{turn}_{call}"
+        places = [{"n": f"{city} place {i}", "a": f"{i} Example Street, {city}", "r": 4.5, "i": i} for i in range(10)]
+        return [AIMessage(content="", tool_calls=[{"name": "find_places_nearby", "args": {"city": city, "interests": ["museums"]}, "id": call_id}]),
+                ToolMessage(content=json.dumps({"ref": call_id, "places": places}), tool_call_id=call_id, name="find_places_nearby")]
+
+    def _turn(self, graph_input):
+        """Runs a turn, yielding pieces of the plan reply as they arrive and then the final state."""
+        messages = list(graph_input["messages"])
+        turn = sum(isinstance(message, HumanMessage) for message in messages)
+        city = self._city(messages)
+        for call in range(self.llm_calls - 1):
+            time.sleep(self._latency())
+            messages.extend(self._tool_round(city, turn, call))
+        plan = self._plan(city, turn)
+        reply = json.dumps(plan, indent=2)
+        # The reply streams in over the model call
+        pieces = [reply[i:i + 400] for i in range(0, len(reply), 400)]
+        latency = self._latency()
+        for piece in pieces:
+            time.sleep(latency / len(pieces))
+            yield piece
+        self._burn_cpu()
+        messages.append(AIMessage(content=reply))
+        yield {**graph_input, "messages": messages, "current_plan": plan, "error_message": None, "target_city": city}
+
+    def invoke(self, graph_input, config=None):
+        for item in self._turn(graph_input):
+            pass
+        return item
+
+    def stream(self, graph_input, config=None, stream_mode=None):
+        message_id = f"fake-{id(graph_input)}"
+        for item in self._turn(graph_input):
+            if isinstance(item, str):
+                yield "messages", (AIMessageChunk(content=item, id=message_id), {"langgraph_node": "planner_agent"})
+            else:
+                yield "values", item
+
+
+class DatabaseProbe:
+    """Times every SQL statement on every connection (installed through the connection_created signal)."""
+
+    def __init__(self, slow_write_s):
+        self.slow_write_s = slow_write_s
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries, self.lock_errors, self.db_time = 0, 0, 0.0
+            self.write_times = []
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        locked = False
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            locked = "locked" in str(e) or "busy" in str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.queries += 1
+                self.db_time += elapsed
+                self.lock_errors += locked
+                if sql.lstrip()[:7].upper().startswith(_WRITE_PREFIXES):
+                    self.write_times.append(elapsed)
+
+    def summary(self):
+        with self._lock:
+            writes = list(self.write_times)
+            return {"queries": self.queries, "writes": len(writes), "lock_errors": self.lock_errors,
+                    "slow_writes": sum(t >= self.slow_write_s for t in writes),
+                    "write_p50_ms": _ms(_percentile(writes, 50)), "write_p99_ms": _ms(_percentile(writes, 99)),
+                    "write_max_ms": _ms(max(writes, default=None)), "db_time_s": round(self.db_time, 2)}
+
+
+class Recorder:
+    """Collects per-endpoint latencies and outcomes from all virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.sessions = 0
+        self.turns = 0
+
+    def record(self, endpoint, latency_s, outcome):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((latency_s, outcome))
+            if endpoint in ("send_message", "stream_message") and outcome == "ok":
+                self.turns += 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+    def endpoints(self, duration_s):
+        report = {}
+        for endpoint, samples in self.samples.items():
+            latencies = [latency for latency, _ in samples]
+            outcomes = {}
+            for _, outcome in samples:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            errors = len(samples) - outcomes.get("ok", 0)
+            report[endpoint] = {"requests": len(samples), "rps": round(len(samples) / duration_s, 2),
+                                "errors": errors, "error_rate": round(errors / len(samples), 4),
+                                "outcomes": outcomes, "p50_ms": _ms(_percentile(latencies, 50)),
+                                "p90_ms": _ms(_percentile(latencies, 90)), "p99_ms": _ms(_percentile(latencies, 99)),
+                                "max_ms": _ms(max(latencies))}
+        return report
+
+
+def _outcome(endpoint, status, body):
+    if status >= 400:
+        return f"http_{status}"
+    if endpoint == "stream_message":
+        events = [json.loads(line) for line in body.splitlines() if line.strip()]
+        if not events or events[-1].get("type") != "message":
+            return "stream_error"
+    return "ok"
+
+
+def session_steps(script, stream):
+    """
+    One scripted session as a generator of requests: yields (endpoint, method, path, body)
+    and receives (status, body); yields None for think time. Returns whether the session started.
+    """
+    status, body = yield "start_session", "POST", "/api/v1/sessions/start_session/", None
+    if status != 201:
+        return False
+    session_path = f"/api/v1/sessions/{json.loads(body)['session_id']}"
+    endpoint = "stream_message" if stream else "send_message"
+    for message in script["messages"]:
+        yield None
+        yield endpoint, "POST", f"{session_path}/{endpoint}/", json.dumps({"message": message}).encode()
+        yield "get_latest_plan", "GET", f"{session_path}/get_latest_plan/", None
+    return True
+
+
+class _Schedule:
+    """Hands out session scripts until --sessions are started or --duration has passed."""
+
+    def __init__(self, scripts, sessions, duration_s):
+        self.scripts, self.sessions, self.deadline = scripts, sessions, time.perf_counter() + duration_s if duration_s else None
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self._next >= self.sessions or (self.deadline and time.perf_counter() >= self.deadline):
+                return None
+            self._next += 1
+            return self.scripts[(self._next - 1) % len(self.scripts)]
+
+
+class WSGIDriver:
+    """Calls the WSGI application on a fixed pool of worker threads and samples the pool's saturation."""
+
+    def __init__(self, application, workers):
+        self.application = application
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wsgi-worker")
+        self._lock = threading.Lock()
+        self.busy, self.queued = 0, 0
+        self.queue_waits, self.busy_samples, self.queued_samples = [], [], []
+
+    def _call(self, method, path, body):
+        environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": "", "SERVER_NAME": "localhost",
+                   "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "HTTP_HOST": "localhost",
+                   "REMOTE_ADDR": "127.0.0.1", "wsgi.version": (1, 0), "wsgi.url_scheme": "http",
+                   "wsgi.input": io.BytesIO(body or b""), "wsgi.errors": sys.stderr, "wsgi.multithread": True,
+                   "wsgi.multiprocess": False, "wsgi.run_once": False}
+        if body is not None:
+            environ.update({"CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(body))})
+        status = []
+        result = self.application(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return int(status[0].split()[0]), content
+
+    def request(self, method, path, body=None):
+        submitted = time.perf_counter()
+
+        def handle():
+            with self._lock:
+                self.queued -= 1
+                self.busy += 1
+                self.queue_waits.append(time.perf_counter() - submitted)
+            try:
+                return self._call(method, path, body)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+
+        with self._lock:
+            self.queued += 1
+        return self._pool.submit(handle).result()
+
+    def sample(self):
+        with self._lock:
+            self.busy_samples.append(self.busy)
+            self.queued_samples.append(self.queued)
+
+    def saturation(self):
+        samples = self.busy_samples or [0]
+        return {"workers": self.workers, "utilization": round(sum(samples) / len(samples) / self.workers, 3),
+                "all_busy_fraction": round(sum(b >= self.workers for b in samples) / len(samples), 3),
+                "max_queued": max(self.queued_samples, default=0),
+                "queue_wait_p50_ms": _ms(_percentile(self.queue_waits, 50)),
+                "queue_wait_p99_ms": _ms(_percentile(self.queue_waits, 99))}
+
+
+def run_wsgi(application, args, scripts, recorder):
+    driver = WSGIDriver(application, args.workers)
+    schedule = _Schedule(scripts, args.sessions, args.duration)
+    done = threading.Event()
+
+    def user(seed):
+        rng = random.Random(seed)
+        while (script := schedule.take()) is not None:
+            steps = session_steps(script, args.stream)
+            response = None
+            try:
+                while True:
+                    step = steps.send(response)
+                    if step is None:
+                        time.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+                        response = None
+                        continue
+                    endpoint, method, path, body = step
+                    start = time.perf_counter()
+                    try:
+                        response = driver.request(method, path, body)
+                        outcome = _outcome(endpoint, *response)
+                    except Exception as e:
+                        response, outcome = (599, b""), f"exception:{type(e).__name__}"
+                    recorder.record(endpoint, time.perf_counter() - start, outcome)
+            except StopIteration as finished:
+                if finished.value:
+                    recorder.session_done()
+
+    def sampler():
+        while not done.wait(0.02):
+            driver.sample()
+
+    started = time.perf_counter()
+    threading.Thread(target=sampler, daemon=True).start()
+    users = [threading.Thread(target=user, args=(i,)) for i in range(args.concurrency)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    done.set()
+    driver._pool.shutdown()
+    return time.perf_counter() - started, driver.saturation()
+
+
+async def _asgi_request(application, method, path, body):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 0), "server": ("localhost", 80)}
+    if body is not None:
+        scope["headers"] += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    finished = asyncio.Event()
+    request_sent = False
+    status, chunks = [], []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body or b"", "more_body": False}
+        # Django listens for a disconnect while the view runs; the client stays until the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                finished.set()
+
+    try:
+        await application(scope, receive, send)
+    finally:
+        finished.set()
+    return status[0], b"".join(chunks)
+
+
+def run_asgi(application, args, scripts, recorder):
+    schedule = _Schedule(scripts, args.sessions, args.duration)
+    in_flight_samples, lags = [], []
+    in_flight = 0
+
+    async def user(seed):
+        nonlocal in_flight
+        rng = random.Random(seed)
+        while (script := schedule.take()) is not None:
+            steps = session_steps(script, args.stream)
+            response = None
+            try:
+                while True:
+                    step = steps.send(response)
+                    if step is None:
+                        await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+                        response = None
+                        continue
+                    endpoint, method, path, body = step
+                    start = time.perf_counter()
+                    in_flight += 1
+                    try:
+                        response = await _asgi_request(application, method, path, body)
+                        outcome = _outcome(endpoint, *response)
+                    except Exception as e:
+                        response, outcome = (599, b""), f"exception:{type(e).__name__}"
+                    finally:
+                        in_flight -= 1
+                    recorder.record(endpoint, time.perf_counter() - start, outcome)
+            except StopIteration as finished:
+                if finished.value:
+                    recorder.session_done()
+
+    async def sampler():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.02)
+            lags.append(time.perf_counter() - start - 0.02)
+            in_flight_samples.append(in_flight)
+
+    async def main():
+        sampling = asyncio.create_task(sampler())
+        await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+        sampling.cancel()
+
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        # StreamingHttpResponse warns that it consumes the sync stream_message iterator under ASGI
+        warnings.simplefilter("ignore")
+        asyncio.run(main())
+    return time.perf_counter() - started, {
+        "max_in_flight": max(in_flight_samples, default=0),
+        "mean_in_flight": round(sum(in_flight_samples) / len(in_flight_samples), 2) if in_flight_samples else 0,
+        "loop_lag_p99_ms": _ms(_percentile(lags, 99)), "loop_lag_max_ms": _ms(max(lags, default=None))}
+
+
+def format_report(report):
+    lines = [f"{report['deployment'].upper()}: {report['sessions']} sessions, {report['turns']} turns in "
+             f"{report['duration_s']}s ({report['throughput_rps']} req/s, {report['turns_per_s']} turns/s)",
+             f"  {'endpoint':<17}{'requests':>9}{'rps':>8}{'errors':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"]
+    for endpoint, stats in report["endpoints"].items():
+        lines.append(f"  {endpoint:<17}{stats['requests']:>9}{stats['rps']:>8}{stats['errors']:>8}"
+                     f"{stats['p50_ms']:>9}{stats['p90_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}")
+        failures = {k: v for k, v in stats["outcomes"].items() if k != "ok"}
+        if failures:
+            lines.append(f"    failures: {failures}")
+    lines.append("  db: " + ", ".join(f"{k}={v}" for k, v in report["db"].items()))
+    lines.append("  saturation: " + ", ".join(f"{k}={v}" for k, v in report["saturation"].items()))
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployment", choices=["wsgi", "asgi", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=20, help="Simultaneous virtual users")
+    parser.add_argument("--sessions", type=int, default=100, help="Sessions to run in total")
+    parser.add_argument("--duration", type=float, default=0, help="Stop starting sessions after this many seconds")
+    parser.add_argument("--workers", type=int, default=8, help="WSGI worker threads")
+    parser.add_argument("--scripts", help="JSON file of session scripts")
+    parser.add_argument("--stream", action="store_true", help="Use stream_message instead of send_message")
+    parser.add_argument("--think-ms", type=float, default=200, help="Mean pause before each user message")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Median latency per fake LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="Log-normal sigma of the LLM latency")
+    parser.add_argument("--llm-calls", type=int, default=2, help="LLM calls per turn (tool rounds + reply)")
+    parser.add_argument("--graph-cpu-ms", type=float, default=5, help="CPU time per turn spent holding the GIL")
+    parser.add_argument("--plan-days", type=int, default=3)
+    parser.add_argument("--slow-write-ms", type=float, default=100, help="Writes slower than this count as lock waits")
+    parser.add_argument("--database", help="SQLite file to use (default: a fresh temporary database)")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    args = parser.parse_args()
+    scripts = json.loads(Path(args.scripts).read_text()) if args.scripts else DEFAULT_SCRIPTS
+
+    temp_dir = None
+    if not args.database:
+        temp_dir = tempfile.TemporaryDirectory(prefix="utravel-load-")
+        args.database = os.path.join(temp_dir.name, "load.sqlite3")
+    settings.DATABASES["default"]["NAME"] = args.database
+    settings.DEBUG = False  # DEBUG keeps every query in memory
+    django.setup()
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+    # Failed requests are counted in the report; their tracebacks would drown it
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    probe = DatabaseProbe(args.slow_write_ms / 1000)
+    connection_created.connect(probe.install, weak=False)
+    from chat_agent import views
+    graph = FakePlannerGraph(args.llm_latency_ms / 1000, args.llm_jitter, args.llm_calls, args.graph_cpu_ms / 1000, args.plan_days)
+    views.compile_graph = lambda: graph
+
+    reports = []
+    for deployment in (["wsgi", "asgi"] if args.deployment == "both" else [args.deployment]):
+        if temp_dir is not None:
+            call_command("flush", interactive=False, verbosity=0)
+        probe.reset()
+        recorder = Recorder()
+        if deployment == "wsgi":
+            from utravel_backend.wsgi import application
+            duration, saturation = run_wsgi(application, args, scripts, recorder)
+        else:
+            from utravel_backend.asgi import application
+            duration, saturation = run_asgi(application, args, scripts, recorder)
+        endpoints = recorder.endpoints(duration)
+        reports.append({"deployment": deployment, "duration_s": round(duration, 2), "sessions": recorder.sessions,
+                        "turns": recorder.turns,
+                        "throughput_rps": round(sum(e["requests"] for e in endpoints.values()) / duration, 2),
+                        "turns_per_s": round(recorder.turns / duration, 2), "endpoints": endpoints,
+                        "db": probe.summary(), "saturation": saturation})
+
+    print(json.dumps(reports, indent=2) if args.json else "\n\n".join(format_report(r) for r in reports))
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
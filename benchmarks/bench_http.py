@@ -0,0 +1,82 @@
+"""
+Compares per-call `requests.get` against the shared pooled session from
+`travel_planner.utils.clients`.
+
+By default both paths hit a local keep-alive HTTP server, which isolates the
+per-call connection setup cost. Pass --url to measure against a real endpoint
+(e.g. https://api.openweathermap.org/data/3.0/onecall?...) where the TLS
+handshake dominates.
+
+Usage:
+    python benchmarks/bench_http.py [--requests 200] [--url URL]
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import requests
+
+from travel_planner.utils.clients import get_http_session
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"daily": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _measure(label, get, url, n):
+    latencies = []
+    for _ in range(n):
+        started = time.perf_counter()
+        get(url).raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(f"{label:<16} mean {statistics.mean(latencies):7.2f} ms   "
+          f"p50 {latencies[len(latencies) // 2]:7.2f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms")
+    return statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--url", help="Real endpoint to measure instead of the local server")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/onecall"
+
+    session = get_http_session()
+    print(f"{args.requests} GETs against {url}")
+    per_call = _measure("requests.get", lambda u: requests.get(u, timeout=10), url, args.requests)
+    pooled = _measure("shared session", lambda u: session.get(u, timeout=10), url, args.requests)
+    print(f"speedup: {per_call / pooled:.2f}x")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
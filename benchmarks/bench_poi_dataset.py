@@ -0,0 +1,91 @@
+"""
+Measures offline POI dataset lookups (utils/poi_dataset.py) on a synthetic
+dataset: category searches, name keyword searches and both combined, around
+random points in a handful of dense cities.
+
+Usage:
+    python benchmarks/bench_poi_dataset.py [--places 2000000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("PREFETCH_ENABLED", "false")
+
+from travel_planner.utils.poi_dataset import POIDataset
+
+_CITIES = {"paris": (48.8566, 2.3522), "rome": (41.9028, 12.4964), "tokyo": (35.6762, 139.6503),
+           "new york": (40.7128, -74.0060), "london": (51.5074, -0.1278)}
+_CATEGORIES = ["restaurant", "cafe", "bar", "museum", "park", "bakery", "store", "church", "lodging",
+               "art_gallery", "night_club", "market"] + [f"amenity=kind_{i}" for i in range(40)]
+_WORDS = ["le", "petit", "grand", "blue", "golden", "sushi", "pizza", "vegan", "corner", "garden", "royal",
+          "little", "old", "central", "river", "market", "house", "kitchen", "noodle", "tapas"]
+
+
+def _columns(n: int, rng: random.Random):
+    cities = list(_CITIES)
+    columns = {c: [] for c in ("id", "name", "category", "lat", "lon", "rating", "city")}
+    for i in range(n):
+        city = cities[i % len(cities)]
+        lat, lon = _CITIES[city]
+        columns["id"].append(f"poi_{i}")
+        # Some rows have no name, as in OSM extracts
+        columns["name"].append(None if i % 97 == 0 else " ".join(rng.sample(_WORDS, 3)) + f" {i}")
+        columns["category"].append(rng.choice(_CATEGORIES))
+        columns["lat"].append(lat + rng.gauss(0, 0.08))
+        columns["lon"].append(lon + rng.gauss(0, 0.08))
+        columns["rating"].append(round(rng.uniform(2.5, 5.0), 1) if i % 5 else "")
+        columns["city"].append(city)
+    for optional in ("user_ratings_total", "price", "address"):
+        columns[optional] = None
+    return columns
+
+
+def _timed(dataset: POIDataset, points, radius_m: float, categories, keyword):
+    latencies, found = [], 0
+    for lat, lon in points:
+        start = time.perf_counter()
+        rows = dataset.search(lat, lon, radius_m, categories, keyword=keyword)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += len(rows)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)], found / len(points)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=2_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--radius-m", type=float, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    columns = _columns(args.places, rng)
+    start = time.perf_counter()
+    dataset = POIDataset(columns)
+    print(f"Indexed {len(dataset)} places, {len(dataset.categories)} categories, "
+          f"{len(dataset.name_vocab)} name tokens in {time.perf_counter() - start:.1f} s")
+
+    points = [(lat + rng.gauss(0, 0.03), lon + rng.gauss(0, 0.03))
+              for lat, lon in (rng.choice(list(_CITIES.values())) for _ in range(args.queries))]
+    cases = [
+        ("category: cafe", ["cafe"], None),
+        ("categories: museum, art_gallery", ["museum", "art_gallery"], None),
+        ("keyword: sushi", [], "sushi"),
+        ("keyword: golden garden", [], "golden garden"),
+        ("category + keyword: restaurant vegan", ["restaurant"], "vegan"),
+    ]
+    print(f"\n{'query':<40}{'p50 ms':>9}{'p95 ms':>9}{'results':>9}")
+    for label, categories, keyword in cases:
+        p50, p95, found = _timed(dataset, points, args.radius_m, categories, keyword)
+        print(f"{label:<40}{p50:>9.3f}{p95:>9.3f}{found:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
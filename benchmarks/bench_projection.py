@@ -0,0 +1,103 @@
+"""
+Measures the prompt tokens saved by projecting tool outputs (core/projection.py)
+instead of sending the raw `json.dumps` of each result.
+
+Simulates the tool traffic of a typical planning turn: per trip day one weather
+lookup, one places search (15 results) and a few travel-time lookups, with one
+planner call after each tool round. Every planner call resends all earlier tool
+messages, so the savings compound over the turn.
+
+Usage:
+    python benchmarks/bench_projection.py [--days 3] [--travel-per-day 4]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("PREFETCH_ENABLED", "false")
+
+from travel_planner.core.projection import project_tool_output, estimate_text_tokens
+
+_TYPES = ["museum", "tourist_attraction", "point_of_interest", "establishment"]
+
+
+def _places(rng: random.Random, day: int):
+    return [{
+        "place_id": f"ChIJ{rng.getrandbits(96):024x}",
+        "name": f"Example Museum of Things {day}-{i}",
+        "address": f"{rng.randint(1, 200)} Example Street, 7500{rng.randint(1, 9)} Paris, France",
+        "latitude": 48.85 + rng.random() / 50,
+        "longitude": 2.35 + rng.random() / 50,
+        "rating": round(rng.uniform(3.5, 4.9), 1),
+        "user_ratings_total": rng.randint(10, 40000),
+        "price_level_str": rng.choice(["Inexpensive", "Moderate", "Unknown"]),
+        "types": list(_TYPES),
+        "status": "OPERATIONAL",
+    } for i in range(15)]
+
+
+def _weather(day: int):
+    return {
+        "date": f"2026-06-{10 + day:02d}", "location": "Paris", "latitude": 48.8566, "longitude": 2.3522,
+        "temp_high_c": 24.3, "temp_low_c": 15.1, "conditions_main": "Clouds", "conditions_desc": "scattered clouds",
+        "precip_prob_percent": 20.0,
+        "summary": "Expect a day of partly cloudy with clear spells",
+    }
+
+
+def _travel(rng: random.Random):
+    return {
+        "origin": f"({48.85 + rng.random() / 50},{2.35 + rng.random() / 50})",
+        "destination": f"({48.85 + rng.random() / 50},{2.35 + rng.random() / 50})",
+        "mode": "walking", "duration_text": "17 mins", "duration_seconds": 1020,
+        "distance_text": "1.4 km", "distance_meters": 1400, "status": "OK",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--travel-per-day", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    rounds = []
+    for day in range(args.days):
+        rounds.append([("get_weather_forecast", _weather(day)), ("find_places_nearby", _places(rng, day))])
+        rounds.append([("get_travel_info", _travel(rng)) for _ in range(args.travel_per_day)])
+
+    raw_history = projected_history = 0
+    raw_prompt = projected_prompt = 0
+    per_tool = {}
+    start = time.perf_counter()
+    for calls in rounds:
+        for name, output in calls:
+            raw = estimate_text_tokens(json.dumps(output))
+            projected = estimate_text_tokens(project_tool_output(name, output))
+            stats = per_tool.setdefault(name, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += raw
+            stats[2] += projected
+            raw_history += raw
+            projected_history += projected
+        # The next planner call resends every tool message so far
+        raw_prompt += raw_history
+        projected_prompt += projected_history
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{'tool':<24}{'calls':>6}{'raw tok':>10}{'projected':>11}{'saved':>8}")
+    for name, (calls, raw, projected) in per_tool.items():
+        print(f"{name:<24}{calls:>6}{raw:>10}{projected:>11}{1 - projected / raw:>8.0%}")
+    print(f"\nTool-output tokens resent over {len(rounds)} planner calls: "
+          f"raw {raw_prompt}, projected {projected_prompt} ({1 - projected_prompt / raw_prompt:.0%} saved)")
+    print(f"Projection time: {elapsed_ms:.2f} ms total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compares stored transcript size and decode time of the binary transcript codec
+(utils/transcript_codec.py) against plain JSON of `messages_to_dict`.
+
+Builds a synthetic multi-turn session shaped like the planner's traffic: per
+turn a user message, tool-call rounds for weather, places and travel times with
+their tool results, and a JSON itinerary reply. Revision turns re-run some of
+the same searches, so tool payloads repeat as they do in real sessions.
+
+Usage:
+    python benchmarks/bench_transcript.py [--turns 6] [--repeat 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("PREFETCH_ENABLED", "false")
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, messages_from_dict, messages_to_dict
+
+from travel_planner.config.settings import SYSTEM_PROMPT
+from travel_planner.utils import transcript_codec
+
+
+def _places_payload(rng: random.Random, query: str) -> str:
+    places = [{"n": f"{query.title()} spot {i}", "a": f"{rng.randint(1, 200)} Example Street, Paris",
+               "lat": round(48.85 + rng.random() / 50, 5), "lon": round(2.35 + rng.random() / 50, 5),
+               "r": round(rng.uniform(3.5, 4.9), 1), "p": rng.choice(["$", "$$"]), "i": i} for i in range(10)]
+    return json.dumps({"ref": f"r{rng.getrandbits(32):08x}", "places": places})
+
+
+def build_transcript(turns: int, seed: int = 7):
+    rng = random.Random(seed)
+    queries = ["museums in Paris", "cafes in Paris", "parks in Paris", "restaurants in Paris"]
+    payloads = {query: _places_payload(rng, query) for query in queries}
+    messages = [SystemMessage(content=SYSTEM_PROMPT)]
+    call = 0
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"Turn {turn}: plan 3 days in Paris, museums and cafes, moderate pace."))
+        for query in rng.sample(queries, 3):
+            call += 1
+            call_id = f"call_{call:04d}_{rng.getrandbits(64):016x}"
+            messages.append(AIMessage(content="", tool_calls=[{"name": "find_places_nearby", "args": {"query": query}, "id": call_id}],
+                                      response_metadata={"finish_reason": "STOP", "model_name": "gemini"},
+                                      usage_metadata={"input_tokens": 4000 + call * 300, "output_tokens": 40, "total_tokens": 4040 + call * 300}))
+            messages.append(ToolMessage(content=payloads[query], tool_call_id=call_id, name="find_places_nearby"))
+        itinerary = {"itinerary": [{"date": f"2026-06-{10 + d}", "activities": [
+            {"name": f"Museums Spot {i}", "time": f"{9 + 2 * i}:00 - {10 + 2 * i}:30", "description": "A visit.",
+             "location": {"latitude": 48.86, "longitude": 2.34}, "address": "1 Example Street, Paris",
+             "budget": "$$", "notes": ""} for i in range(4)]} for d in range(3)]}
+        messages.append(AIMessage(content=json.dumps(itinerary, indent=2), response_metadata={"finish_reason": "STOP"}))
+    return messages
+
+
+def _time_ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    messages = build_transcript(args.turns)
+    as_json = json.dumps(messages_to_dict(messages)).encode("utf-8")
+    as_json_zlib = zlib.compress(as_json, transcript_codec.COMPRESSION_LEVEL)
+
+    rows = [
+        ("json", len(as_json), lambda: messages_from_dict(json.loads(as_json))),
+        ("json + zlib", len(as_json_zlib), lambda: messages_from_dict(json.loads(zlib.decompress(as_json_zlib)))),
+    ]
+    msgpack_module = transcript_codec.ormsgpack
+    for label, module in (("codec, msgpack body", msgpack_module), ("codec, json body", None)):
+        if label.endswith("msgpack body") and module is None:
+            print("ormsgpack is not installed; skipping the msgpack body.")
+            continue
+        transcript_codec.ormsgpack = module
+        blob = transcript_codec.encode_messages(messages)
+        assert transcript_codec.decode_messages(blob) == messages
+        rows.append((label, len(blob), lambda blob=blob, module=module: _decode_with(module, blob)))
+    transcript_codec.ormsgpack = msgpack_module
+
+    print(f"{len(messages)} messages over {args.turns} turns\n")
+    print(f"{'format':<22}{'bytes':>10}{'vs json':>9}{'decode ms':>11}")
+    for label, size, decode in rows:
+        print(f"{label:<22}{size:>10}{size / len(as_json):>9.0%}{_time_ms(decode, args.repeat):>11.3f}")
+
+
+def _decode_with(module, blob: bytes):
+    transcript_codec.ormsgpack = module
+    return transcript_codec.decode_messages(blob)
+
+
+if __name__ == "__main__":
+    main()
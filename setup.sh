@@ -22,9 +22,25 @@ source "$VENV_DIR/bin/activate"
 echo "Installing required packages..."
 pip install -q -r requirements.txt || {
     echo "Failed to install from requirements.txt, installing packages individually."
-    pip install -q langgraph langchain googlemaps requests pandas ipython langchain-google-genai google-generativeai
+    pip install -q langgraph langchain googlemaps requests pandas ipython langchain-google-genai google-generativeai numpy ormsgpack
 }
 
+# Climate normals for weather beyond the forecast window: CRU CL 2.0 (1961-1990, 10' land grid),
+# gridded at 1 degree into src/travel_planner/data/climate_normals.npz (see utils/climatology.py)
+CRU_DIR="data/cru"
+CRU_URL="https://crudata.uea.ac.uk/cru/data/hrg/tmc"
+NORMALS_FILE="src/travel_planner/data/climate_normals.npz"
+if [ ! -f "$NORMALS_FILE" ]; then
+    echo "Building climate normals..."
+    mkdir -p "$CRU_DIR"
+    for variable in tmp dtr pre rd0; do
+        file="grid_10min_${variable}.dat.gz"
+        [ -f "$CRU_DIR/$file" ] || curl -fsSL -o "$CRU_DIR/$file" "$CRU_URL/$file" || rm -f "$CRU_DIR/$file"
+    done
+    PYTHONPATH=src python -m travel_planner climate-normals "$CRU_DIR" --format cru --cell-deg 1 \
+        --source "CRU CL 2.0 (1961-1990)" || echo "Could not build climate normals; dates beyond the forecast get no weather."
+fi
+
 # Deactivate the virtual environment after setup
 deactivate
 
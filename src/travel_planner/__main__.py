@@ -1,11 +1,12 @@
 
-from travel_planner.core.graph import compile_graph
+from travel_planner.core.graph import compile_graph, stream_turn_events
+from travel_planner.core.slots import TRIP_SLOT_KEYS
+from travel_planner.config.settings import GRAPH_RECURSION_LIMIT
 from langchain_core.messages import HumanMessage, AIMessage
+import argparse
 import json
 import logging
-
-# Initialize the graph
-app = compile_graph()
+import sys
 
 # --- Helper Function to Display Plan ---
 def display_readable_plan(plan_json):
@@ -52,11 +53,25 @@ def display_readable_plan(plan_json):
         else:
             print("   No activities found or 'activities' is not a list for this day.")
 
+def stream_turn(app, graph_input, config):
+    """Runs one graph turn, announcing each itinerary day as soon as the planner finishes writing it."""
+    final_state = None
+    for kind, payload in stream_turn_events(app, graph_input, config):
+        if kind == "final":
+            final_state = payload
+            continue
+        activities = payload.get("activities") or []
+        names = ", ".join(a.get("name", "?") for a in activities if isinstance(a, dict))
+        print(f"  [{payload.get('date', 'Unknown Date')}] {names}")
+    return final_state
+
 def main():
     print("--- Welcome to uTravel: Your Friendly AI Travel Companion! ---")  
     print("Tell me about your travel wishes! For example, 'I'd like a 3-day adventure in Paris focusing on museums and cafes.'")  
     print("Whenever you're ready to end our chat, just type 'exit' or 'quit.'")  
   
+    # Compiled here rather than at import, so batch, warm and climate-normals don't pay for it
+    app = compile_graph()
     if not app:  
         print("\nOops! It seems there's a hiccup with our planning system. Please try again later.")  
     else:  
@@ -64,7 +79,8 @@ def main():
         conversation_state = {  
             "messages": [],  
             "current_plan": None,  
-            "error_message": None  
+            "error_message": None,  
+            **{key: None for key in TRIP_SLOT_KEYS}  
         }  
   
         while True:  
@@ -78,8 +94,6 @@ def main():
                 conversation_state["messages"].append(HumanMessage(content=user_input))  
                 conversation_state["error_message"] = None  
   
-                # Optional initial info extraction logic here...  
-  
                 # --- Run the Graph for one turn ---  
                 print("uTravel is crafting your journey...")  
                 graph_output_state = None  
@@ -87,10 +101,11 @@ def main():
                     current_graph_input = {  
                         "messages": conversation_state["messages"],  
                         "current_plan": conversation_state["current_plan"],  
-                        "error_message": conversation_state["error_message"]  
+                        "error_message": conversation_state["error_message"],  
+                        **{key: conversation_state[key] for key in TRIP_SLOT_KEYS}  
                     }  
-                    config = {"recursion_limit": 25}  
-                    graph_output_state = app.invoke(current_graph_input, config=config)  
+                    config = {"recursion_limit": GRAPH_RECURSION_LIMIT}  
+                    graph_output_state = stream_turn(app, current_graph_input, config)  
   
                 except Exception as graph_run_error:  
                     logging.error(f"uTravel ran into an issue: {graph_run_error}", exc_info=True)  
@@ -102,6 +117,8 @@ def main():
                     conversation_state["messages"] = graph_output_state.get("messages", conversation_state["messages"])  
                     conversation_state["current_plan"] = graph_output_state.get("current_plan", conversation_state["current_plan"])  
                     conversation_state["error_message"] = graph_output_state.get("error_message", conversation_state["error_message"])  
+                    for key in TRIP_SLOT_KEYS:  
+                        conversation_state[key] = graph_output_state.get(key, conversation_state[key])  
   
                     last_ai_message = next((msg for msg in reversed(conversation_state["messages"]) if isinstance(msg, AIMessage)), None)  
                     ai_printed_response = False  
@@ -111,12 +128,12 @@ def main():
                         if isinstance(ai_content, list):  
                             for item in ai_content:  
                                 if isinstance(item, str):  
-                                    if not (item.strip().startswith('{') or item.strip().startswith('```json')) or '"itinerary"' not in item:  
+                                    if not (item.strip().startswith('{') or item.strip().startswith('```json')) or ('"itinerary"' not in item and '"plan_patch"' not in item):  
                                         print(f" {item}", end="")  
                             print()  
                             ai_printed_response = True  
                         elif isinstance(ai_content, str):  
-                             if not ((ai_content.strip().startswith('{') or ai_content.strip().startswith('```json')) and '"itinerary"' in ai_content):  
+                             if not ((ai_content.strip().startswith('{') or ai_content.strip().startswith('```json')) and ('"itinerary"' in ai_content or '"plan_patch"' in ai_content)):  
                                  print(f" {ai_content}")  
                                  ai_printed_response = True  
                              else:  
@@ -127,7 +144,7 @@ def main():
                          print(" (I couldn't generate a response this time. Let's give it another try!)")  
   
                     if conversation_state["current_plan"]:  
-                         if last_ai_message and isinstance(last_ai_message.content, str) and '"itinerary"' in last_ai_message.content:  
+                         if last_ai_message and isinstance(last_ai_message.content, str) and ('"itinerary"' in last_ai_message.content or '"plan_patch"' in last_ai_message.content):  
                               display_readable_plan(conversation_state["current_plan"])  
                          elif not last_ai_message.tool_calls:  
                              display_readable_plan(conversation_state["current_plan"])  
@@ -147,5 +164,51 @@ def main():
   
     print("\n--- Thank you for using uTravel. Until next time! ---") 
     
-if __name__ == "__main__":
+def cli(argv=None):
+    """
+    Interactive chat by default; `batch` plans many trips from JSONL (see travel_planner/batch.py)
+    and `warm` pre-populates the tool caches for popular destinations (see travel_planner/warmup.py).
+    `climate-normals` builds the climatology file used for dates beyond the forecast window
+    (see travel_planner/utils/climatology.py).
+    """
+    parser = argparse.ArgumentParser(prog="python -m travel_planner")
+    subcommands = parser.add_subparsers(dest="command")
+    batch_parser = subcommands.add_parser("batch", help="Plan trip requests from a JSONL file concurrently")
+    batch_parser.add_argument("input", help="JSONL file of trip requests, or - for stdin")
+    batch_parser.add_argument("-o", "--output", help="JSONL results file (default: stdout)")
+    batch_parser.add_argument("-w", "--workers", type=int, default=4, help="Concurrent requests (default: 4)")
+    batch_parser.add_argument("-t", "--timeout", type=float, default=300.0, help="Seconds allowed per request (default: 300)")
+    batch_parser.add_argument("-c", "--checkpoint", help="File of finished ids; finished items are skipped on restart")
+    batch_parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    warm_parser = subcommands.add_parser("warm", help="Pre-populate the tool caches for popular destinations")
+    from travel_planner.warmup import add_warmup_arguments
+    add_warmup_arguments(warm_parser)
+    normals_parser = subcommands.add_parser("climate-normals", help="Build the climate normals file from monthly normals")
+    normals_parser.add_argument("input", help="CSV with lat, lon, month, tmax_c, tmin_c, precip_mm and optionally wet_days, "
+                                              "or with --format cru a directory of CRU CL 2.0 grid_10min_*.dat.gz files")
+    normals_parser.add_argument("--format", choices=["csv", "cru"], default="csv", help="Input format (default: csv)")
+    normals_parser.add_argument("-o", "--output", help="Output .npz file (default: CLIMATOLOGY_PATH)")
+    normals_parser.add_argument("--cell-deg", type=float, default=0.5, help="Grid cell size in degrees (default: 0.5)")
+    normals_parser.add_argument("--source", default="", help="Dataset name and period stored with the normals")
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        from travel_planner import batch
+        sys.exit(batch.main(args))
+    if args.command == "warm":
+        from travel_planner.warmup import warm_from_args, format_report
+        if not (args.cities or args.spec):
+            warm_parser.error("give --cities or a --spec file")
+        report = warm_from_args(args)
+        print(json.dumps(report, indent=2) if args.json else format_report(report))
+        sys.exit(0 if report["totals"].get("failed", 0) == 0 else 1)
+    if args.command == "climate-normals":
+        from travel_planner.config.settings import CLIMATOLOGY_PATH
+        from travel_planner.utils.climatology import build_normals_file
+        print(json.dumps(build_normals_file(args.input, args.output or CLIMATOLOGY_PATH, args.cell_deg, args.source,
+                                            source_format=args.format), indent=2))
+        sys.exit(0)
     main()
+
+if __name__ == "__main__":
+    cli()
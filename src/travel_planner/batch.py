@@ -0,0 +1,221 @@
+"""
+Batch planning: runs many trip requests through the graph concurrently.
+
+    python -m travel_planner batch requests.jsonl --workers 8 --output plans.jsonl --checkpoint done.txt
+
+Each input line is a JSON object such as
+`{"id": "rome-3d", "request": "3 days in Rome from 2026-05-01 to 2026-05-03, food"}`;
+`"messages": [...]` runs a scripted multi-turn conversation instead, and
+`"turn_budget_s"` overrides the per-turn latency budget. A bare JSON string is
+a request without an id (the line number is used).
+
+Results are written as JSONL in completion order, one
+`{"id", "status", "plan", "reply", "error", "latency_s", "turns"}` per item.
+`status` is "ok", "error" or "timeout". Ids of successful items are appended
+to the checkpoint file and skipped when the run is restarted, so an
+interrupted batch resumes where it stopped and retries its failures. A
+throughput and latency summary goes to stderr.
+"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from .config.settings import GRAPH_RECURSION_LIMIT, logging
+from .core.plan_parser import message_text
+from .core.slots import TRIP_SLOT_KEYS
+
+# Graph finalization is asked to finish this long before the hard per-item timeout
+_TIMEOUT_MARGIN_S = 5.0
+
+_worker_app = None
+_worker_lock = threading.Lock()
+
+
+def read_items(stream: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Parses request lines; malformed lines become items carrying an error."""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield {"id": f"line-{line_number}", "error": f"Invalid JSON: {e}"}
+            continue
+        if isinstance(item, str):
+            item = {"request": item}
+        if not isinstance(item, dict) or not (item.get("request") or item.get("messages")):
+            item_id = item.get("id") if isinstance(item, dict) and item.get("id") is not None else f"line-{line_number}"
+            yield {"id": str(item_id), "error": "Item needs a 'request' or 'messages'."}
+            continue
+        item.setdefault("id", f"line-{line_number}")
+        item["id"] = str(item["id"])
+        yield item
+
+
+def _graph() -> Any:
+    """The compiled graph of this process (thread workers share it)."""
+    global _worker_app
+    with _worker_lock:
+        if _worker_app is None:
+            from .core.graph import compile_graph
+            _worker_app = compile_graph()
+        return _worker_app
+
+
+def run_item(item: Dict[str, Any], timeout_s: float) -> Dict[str, Any]:
+    """Plans one item: one graph turn per user message. Never raises."""
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"id": item["id"], "status": "ok", "plan": None, "reply": None, "error": None, "turns": 0}
+    if item.get("error"):
+        return dict(result, status="error", error=item["error"], latency_s=0.0)
+    app = _graph()
+    turns = item.get("messages") or [item["request"]]
+    budget_s = float(item.get("turn_budget_s") or max(1.0, timeout_s / len(turns) - _TIMEOUT_MARGIN_S))
+    state: Dict[str, Any] = {"messages": [], "current_plan": None, "error_message": None,
+                             **{key: None for key in TRIP_SLOT_KEYS}}
+    config = {"recursion_limit": GRAPH_RECURSION_LIMIT, "configurable": {"turn_budget_s": budget_s}}
+    try:
+        if app is None:
+            raise RuntimeError("Graph failed to compile.")
+        for text in turns:
+            state["messages"] = list(state["messages"]) + [HumanMessage(content=str(text))]
+            state = app.invoke(state, config=config)
+            result["turns"] += 1
+        last_ai = next((m for m in reversed(state["messages"]) if isinstance(m, AIMessage)), None)
+        result["reply"] = message_text(last_ai.content) if last_ai else None
+        result["plan"] = state.get("current_plan")
+        if state.get("error_message"):
+            result["error"] = state["error_message"]
+        if result["plan"] is None:
+            result["status"] = "error"
+            result["error"] = result["error"] or "No itinerary was produced."
+    except Exception as e:
+        logging.error(f"Batch item {item['id']} failed: {e}", exc_info=True)
+        result["status"], result["error"] = "error", f"{type(e).__name__}: {e}"
+    result["latency_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def load_checkpoint(path: Optional[str]) -> Set[str]:
+    """Ids finished successfully in an earlier run."""
+    if not path:
+        return set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def summarize(results: List[Dict[str, Any]], wall_s: float, skipped: int) -> Dict[str, Any]:
+    """Counts per status, throughput and latency percentiles of a run."""
+    latencies = [r["latency_s"] for r in results if r["status"] != "timeout"]
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("ok", "error", "timeout")}
+    return {
+        "items": len(results),
+        "skipped": skipped,
+        **counts,
+        "wall_s": round(wall_s, 2),
+        "items_per_min": round(len(results) / wall_s * 60, 2) if wall_s > 0 else 0.0,
+        "latency_s": {
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "max": max(latencies, default=0.0),
+        },
+    }
+
+
+def run_batch(items: Iterable[Dict[str, Any]], out: IO[str], workers: int = 4, timeout_s: float = 300.0,
+              checkpoint: Optional[str] = None, processes: bool = False) -> Dict[str, Any]:
+    """
+    Plans all items on a bounded pool and writes each result line as soon as it finishes.
+    Items over `timeout_s` are reported as timeouts; their workers finish in the background
+    (the per-turn budget makes the graph wrap up shortly after).
+    """
+    done_ids = load_checkpoint(checkpoint)
+    checkpoint_file = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+    if processes:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+    results: List[Dict[str, Any]] = []
+    pending: Dict[Future, Tuple[str, float]] = {}
+    abandoned: Set[Future] = set()  # timed out but still occupying a worker
+    skipped = 0
+    started = time.perf_counter()
+
+    def emit(result: Dict[str, Any]) -> None:
+        results.append(result)
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+        if checkpoint_file and result["status"] == "ok":
+            checkpoint_file.write(result["id"] + "\n")
+            checkpoint_file.flush()
+
+    def collect() -> None:
+        done, _ = wait(list(pending) + list(abandoned), timeout=1.0, return_when=FIRST_COMPLETED)
+        abandoned.difference_update(done)
+        done = [future for future in done if future in pending]
+        for future in done:
+            item_id, _ = pending.pop(future)
+            try:
+                emit(future.result())
+            except Exception as e:  # e.g. a crashed worker process
+                emit({"id": item_id, "status": "error", "plan": None, "reply": None,
+                      "error": f"{type(e).__name__}: {e}", "turns": 0, "latency_s": 0.0})
+        now = time.perf_counter()
+        for future, (item_id, submitted_at) in list(pending.items()):
+            # Submission is throttled to free workers, so this is close to the run time
+            if now - submitted_at > timeout_s:
+                del pending[future]
+                abandoned.add(future)
+                emit({"id": item_id, "status": "timeout", "plan": None, "reply": None,
+                      "error": f"No result after {timeout_s:.0f}s.", "turns": 0, "latency_s": round(now - submitted_at, 3)})
+
+    try:
+        for item in items:
+            if item["id"] in done_ids:
+                skipped += 1
+                continue
+            while len(pending) + len(abandoned) >= workers:
+                collect()
+            pending[executor.submit(run_item, item, timeout_s)] = (item["id"], time.perf_counter())
+        while pending:
+            collect()
+        if abandoned:
+            logging.warning(f"{len(abandoned)} timed-out items are still running; their results are discarded.")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if checkpoint_file:
+            checkpoint_file.close()
+    return summarize(results, time.perf_counter() - started, skipped)
+
+
+def main(args: Any) -> int:
+    """Entry point for `python -m travel_planner batch`."""
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    # Resuming appends to the earlier output instead of overwriting it
+    out = sys.stdout if args.output in (None, "-") else open(args.output, "a" if args.checkpoint else "w", encoding="utf-8")
+    try:
+        summary = run_batch(read_items(source), out, workers=args.workers, timeout_s=args.timeout,
+                            checkpoint=args.checkpoint, processes=args.processes)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 0 if summary["error"] == 0 and summary["timeout"] == 0 else 1
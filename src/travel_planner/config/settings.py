@@ -6,7 +6,6 @@ import os
 import logging
 from typing import Optional
 from langchain_google_genai import HarmBlockThreshold, HarmCategory
-import googlemaps
 from google.api_core import exceptions as google_exceptions
 
 try:
@@ -29,6 +28,186 @@ WEATHER_API_KEY = os.environ.get("WEATHER_API_KEY")
 
 # API Endpoints
 OWM_ONECALL_ENDPOINT = "https://api.openweathermap.org/data/3.0/onecall"
+# One Call daily forecasts cover today plus the next 7 days
+OWM_DAILY_FORECAST_DAYS = 8
+
+# --- Per-Turn Latency Budget ---
+# Wall-clock budget for one user turn across all graph nodes.
+TURN_LATENCY_BUDGET_S = float(os.environ.get("TURN_LATENCY_BUDGET_S", "90"))
+# Planner -> tool executor round trips allowed per turn.
+TURN_MAX_TOOL_ROUNDS = int(os.environ.get("TURN_MAX_TOOL_ROUNDS", "8"))
+# When less than this is left, the planner stops calling tools and finalizes with what it has.
+TURN_FINALIZE_MARGIN_S = float(os.environ.get("TURN_FINALIZE_MARGIN_S", "20"))
+# Hard LangGraph step limit; must leave room for TURN_MAX_TOOL_ROUNDS round trips
+# plus PLAN_MAX_VALIDATION_ROUNDS plan revisions.
+GRAPH_RECURSION_LIMIT = int(os.environ.get("GRAPH_RECURSION_LIMIT", "35"))
+
+# --- Planner Topology (see core/graph.py) ---
+# "sequential": one planner/tool loop per turn. "fanout": first plans of long trips are
+# split into legs planned concurrently (see core/fanout.py).
+PLANNER_TOPOLOGY = os.environ.get("PLANNER_TOPOLOGY", "sequential").lower()
+FANOUT_MIN_DAYS = int(os.environ.get("FANOUT_MIN_DAYS", "4"))
+FANOUT_DAYS_PER_LEG = int(os.environ.get("FANOUT_DAYS_PER_LEG", "2"))
+FANOUT_MAX_LEGS = int(os.environ.get("FANOUT_MAX_LEGS", "6"))
+
+# --- LLM Quotas and Retry Policy ---
+# Process-wide limits matching the Gemini project quota (requests / tokens per minute).
+GEMINI_RPM = int(os.environ.get("GEMINI_RPM", "150"))
+GEMINI_TPM = int(os.environ.get("GEMINI_TPM", "2000000"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_S = float(os.environ.get("LLM_BACKOFF_BASE_S", "1.0"))
+LLM_BACKOFF_MAX_S = float(os.environ.get("LLM_BACKOFF_MAX_S", "20"))
+# Longest a call may queue on the local rate limiter before failing
+LLM_MAX_QUEUE_WAIT_S = float(os.environ.get("LLM_MAX_QUEUE_WAIT_S", "30"))
+# Output tokens pre-charged against the TPM bucket per call (corrected from usage afterwards)
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.environ.get("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+# Send a duplicate request if the first has not answered after this many seconds (0 = off)
+LLM_HEDGE_DELAY_S = float(os.environ.get("LLM_HEDGE_DELAY_S", "0"))
+
+# --- Context Caching (see core/context_cache.py) ---
+# Stores SYSTEM_PROMPT and the tool declarations as a Gemini cached content
+CONTEXT_CACHE_ENABLED = os.environ.get("CONTEXT_CACHE_ENABLED", "false").lower() == "true"
+CONTEXT_CACHE_TTL_S = int(os.environ.get("CONTEXT_CACHE_TTL_S", "3600"))
+# Extend the cache TTL when less than this is left
+CONTEXT_CACHE_REFRESH_MARGIN_S = int(os.environ.get("CONTEXT_CACHE_REFRESH_MARGIN_S", "300"))
+# After a failure, send the full prompt for this long before trying again
+CONTEXT_CACHE_RETRY_S = int(os.environ.get("CONTEXT_CACHE_RETRY_S", "600"))
+# Models reject cached contents below a minimum size (check the model's docs)
+CONTEXT_CACHE_MIN_TOKENS = int(os.environ.get("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+
+# --- Shared HTTP Client ---
+# Pooled keep-alive connections shared by all tools (see utils/clients.py).
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "8"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "32"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BACKOFF_S = float(os.environ.get("HTTP_RETRY_BACKOFF_S", "0.3"))
+# (connect, read) timeouts in seconds per upstream host
+HTTP_DEFAULT_TIMEOUT = (3.05, 10)
+HTTP_HOST_TIMEOUTS = {
+    "api.openweathermap.org": (3.05, 8),
+    "maps.googleapis.com": (3.05, 10),
+}
+# Total time the googlemaps client keeps retrying a request
+MAPS_RETRY_TIMEOUT_S = int(os.environ.get("MAPS_RETRY_TIMEOUT_S", "20"))
+
+# --- Tool Result Caches ---
+GEOCODE_CACHE_TTL_S = int(os.environ.get("GEOCODE_CACHE_TTL_S", str(7 * 24 * 3600)))
+WEATHER_CACHE_TTL_S = int(os.environ.get("WEATHER_CACHE_TTL_S", "1800"))
+PLACES_CACHE_TTL_S = int(os.environ.get("PLACES_CACHE_TTL_S", str(24 * 3600)))
+# Walking/driving/bicycling times between two points (transit depends on departure time and is not cached)
+TRAVEL_CACHE_TTL_S = int(os.environ.get("TRAVEL_CACHE_TTL_S", str(24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "2048"))
+
+# --- Shared State (see utils/shared_state.py) ---
+# Where tool caches, rate-limit buckets and session locks live when several workers run:
+# "local" (per process), "sqlite" (the file SHARED_STATE_PATH, workers on one host)
+# or "resp" (a Redis-protocol server at SHARED_STATE_URL).
+SHARED_STATE_BACKEND = os.environ.get("SHARED_STATE_BACKEND", "local").lower()
+SHARED_STATE_PATH = os.environ.get("SHARED_STATE_PATH", "utravel_state.sqlite3")
+SHARED_STATE_URL = os.environ.get("SHARED_STATE_URL", "redis://127.0.0.1:6379/0")
+SHARED_STATE_PREFIX = os.environ.get("SHARED_STATE_PREFIX", "utravel")
+# A session's turns run one at a time; the lock is released after SESSION_LOCK_TTL_S even if its worker died
+SESSION_LOCK_TTL_S = float(os.environ.get("SESSION_LOCK_TTL_S", str(2 * TURN_LATENCY_BUDGET_S)))
+SESSION_LOCK_WAIT_S = float(os.environ.get("SESSION_LOCK_WAIT_S", str(TURN_LATENCY_BUDGET_S + 30)))
+
+# --- Tool Output Projection (see core/projection.py) ---
+# Tool results are shown to the LLM in a compact form within these token budgets;
+# full payloads stay in the result store and can be fetched with lookup_tool_result.
+TOOL_OUTPUT_PROJECTION = os.environ.get("TOOL_OUTPUT_PROJECTION", "true").lower() == "true"
+TOOL_OUTPUT_TOKEN_BUDGETS = {
+    "find_places_nearby": int(os.environ.get("PLACES_OUTPUT_TOKEN_BUDGET", "450")),
+    "get_weather_forecast": int(os.environ.get("WEATHER_OUTPUT_TOKEN_BUDGET", "80")),
+    "get_travel_info": int(os.environ.get("TRAVEL_OUTPUT_TOKEN_BUDGET", "40")),
+}
+TOOL_OUTPUT_DEFAULT_BUDGET = int(os.environ.get("TOOL_OUTPUT_DEFAULT_BUDGET", "300"))
+PLACES_PROJECTION_TOP_K = int(os.environ.get("PLACES_PROJECTION_TOP_K", "10"))
+TOOL_RESULT_TTL_S = int(os.environ.get("TOOL_RESULT_TTL_S", str(6 * 3600)))
+
+# --- Planner Response Cache (see core/response_cache.py) ---
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL_S = int(os.environ.get("RESPONSE_CACHE_TTL_S", str(6 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+
+# --- Places Backend ---
+# "google" uses the Places API; "offline" answers find_places_nearby from a local POI
+# file (CSV or Parquet, see utils/poi_dataset.py) given by POI_DATASET_PATH.
+PLACES_BACKEND = os.environ.get("PLACES_BACKEND", "google").lower()
+POI_DATASET_PATH = os.environ.get("POI_DATASET_PATH", "")
+
+# --- Local Place Store (see utils/place_store.py) ---
+# Directory for the persisted place index; empty keeps the store in memory only.
+PLACE_STORE_PATH = os.environ.get("PLACE_STORE_PATH", "")
+# Grid cell size for the spatial index (~1.1 km of latitude)
+PLACE_STORE_CELL_DEG = float(os.environ.get("PLACE_STORE_CELL_DEG", "0.01"))
+# Radius around a query's city center searched for overlapping queries
+PLACE_STORE_RADIUS_M = float(os.environ.get("PLACE_STORE_RADIUS_M", "5000"))
+# Minimum number of matching fresh places needed to answer a new query locally
+PLACE_STORE_MIN_RESULTS = int(os.environ.get("PLACE_STORE_MIN_RESULTS", "8"))
+# Temporarily closed places go stale much sooner than operational ones
+PLACE_STORE_TEMP_CLOSED_TTL_S = int(os.environ.get("PLACE_STORE_TEMP_CLOSED_TTL_S", "3600"))
+# Persist after this many new query results
+PLACE_STORE_FLUSH_EVERY = int(os.environ.get("PLACE_STORE_FLUSH_EVERY", "20"))
+
+# --- Speculative Prefetch ---
+# Warms the caches in the background as soon as the trip city/dates/interests are known.
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_MAX_WORKERS = int(os.environ.get("PREFETCH_MAX_WORKERS", "4"))
+# Upper bound on Places text searches issued per trip (combined query + one per interest)
+PREFETCH_MAX_PLACE_QUERIES = int(os.environ.get("PREFETCH_MAX_PLACE_QUERIES", "4"))
+# Prefetches are dropped (not queued) once this many are pending
+PREFETCH_MAX_PENDING = int(os.environ.get("PREFETCH_MAX_PENDING", "32"))
+
+# --- Cache Warm-up (see warmup.py) ---
+# JSON spec of popular destinations warmed in the background when a backend worker starts; empty disables.
+CACHE_WARMUP_SPEC = os.environ.get("CACHE_WARMUP_SPEC", "")
+WARMUP_MAX_WORKERS = int(os.environ.get("WARMUP_MAX_WORKERS", "8"))
+# Cap on billable upstream units per run (1 per geocode/weather/Places request, 1 per Distance Matrix element)
+WARMUP_MAX_SPEND = int(os.environ.get("WARMUP_MAX_SPEND", "2000"))
+# Travel times are warmed between this many top places per city and interest set
+WARMUP_MATRIX_PLACES = int(os.environ.get("WARMUP_MATRIX_PLACES", "8"))
+
+# --- Climatology Fallback (see utils/climatology.py) ---
+# Monthly climate normals answer get_weather_forecast for dates outside the forecast window.
+# Build the file with `python -m travel_planner climate-normals`; a missing file disables the fallback.
+CLIMATOLOGY_PATH = os.environ.get(
+    "CLIMATOLOGY_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "climate_normals.npz"))
+# Points on cells without data (e.g. coastal cities on a sea cell) use the nearest cell up to this many cells away
+CLIMATOLOGY_SEARCH_CELLS = int(os.environ.get("CLIMATOLOGY_SEARCH_CELLS", "2"))
+
+# --- Route Optimization (see utils/routing.py) ---
+# Reorder each day's non-meal activities of a parsed plan to minimize travel time, recomputing
+# their times. Off by default: estimates are straight-line and most activities carry no opening hours.
+ROUTE_OPTIMIZE_PLAN = os.environ.get("ROUTE_OPTIMIZE_PLAN", "false").lower() == "true"
+# Days with at most this many stops are solved exactly (Held-Karp); larger ones heuristically
+ROUTE_EXACT_MAX_STOPS = int(os.environ.get("ROUTE_EXACT_MAX_STOPS", "10"))
+# Keep the planner's order unless reordering saves at least this many minutes
+ROUTE_MIN_SAVING_MIN = float(os.environ.get("ROUTE_MIN_SAVING_MIN", "3"))
+# The Distance Matrix API allows 100 elements per request (10 x 10 stops)
+ROUTE_MATRIX_MAX_STOPS = int(os.environ.get("ROUTE_MATRIX_MAX_STOPS", "10"))
+
+# --- Day Clustering (see utils/clustering.py) ---
+CLUSTER_MAX_PLACES_PER_DAY = int(os.environ.get("CLUSTER_MAX_PLACES_PER_DAY", "5"))
+CLUSTER_MAX_ITERATIONS = int(os.environ.get("CLUSTER_MAX_ITERATIONS", "25"))
+
+# --- Plan Validation (see core/validation.py) ---
+# Plans with schema or feasibility errors go back to the planner within the same turn.
+PLAN_VALIDATION_ENABLED = os.environ.get("PLAN_VALIDATION_ENABLED", "true").lower() == "true"
+# Revision attempts per turn; after that the plan is saved with its violations
+PLAN_MAX_VALIDATION_ROUNDS = int(os.environ.get("PLAN_MAX_VALIDATION_ROUNDS", "2"))
+PLAN_MAX_REPORTED_VIOLATIONS = int(os.environ.get("PLAN_MAX_REPORTED_VIOLATIONS", "12"))
+# Tolerance when comparing the gap between activities with the estimated travel time
+VALIDATION_TRANSFER_SLACK_MIN = float(os.environ.get("VALIDATION_TRANSFER_SLACK_MIN", "5"))
+
+# --- Plan Revisions (see core/plan_patch.py) ---
+# With a current plan, the planner may answer feedback with a compact patch instead of the full itinerary.
+PLAN_PATCH_ENABLED = os.environ.get("PLAN_PATCH_ENABLED", "true").lower() == "true"
+
+# --- Trip Slot Extraction ---
+# Regex rules always run; the LLM fallback only fires when core slots (city, dates) are still missing.
+SLOT_LLM_FALLBACK = os.environ.get("SLOT_LLM_FALLBACK", "true").lower() == "true"
+# Number of most recent user turns (and everything after them) sent to the planner once
+# the core slots are known. Older turns are represented by the slot summary instead.
+PLANNER_HISTORY_TURNS = int(os.environ.get("PLANNER_HISTORY_TURNS", "4"))
 
 # System Prompt
 SYSTEM_PROMPT = """You are a helpful and conversational travel planning assistant. Your goal is to collaboratively create a personalized itinerary with the user.
@@ -37,11 +216,14 @@ SYSTEM_PROMPT = """You are a helpful and conversational travel planning assistan
 
 1.  **Engage in Conversation:** Chat naturally with the user.
 2.  **Gather Information:** If the user hasn't provided necessary details (target city, travel dates, interests, budget preference, preferred pace, travel mode), politely ask for them one by one until you have enough information to start planning.
-3.  **Generate Initial Plan:** Once you have the core details, create a first draft of the itinerary in JSON format. Use the available tools (`get_weather_forecast`, `find_places_nearby`, `get_travel_info`) during this process to get required data (weather, place details including coordinates and address, travel times).
+3.  **Generate Initial Plan:** Once you have the core details, create a first draft of the itinerary in JSON format. Use the available tools (`get_weather_forecast`, `find_places_nearby`, `optimize_day_route`, `get_travel_info`) during this process to get required data (weather, place details including coordinates and address, travel times).
 4.  **Use Tools Effectively:**
     *   Call `get_weather_forecast` for each day of the trip using the city name and date.
     *   Call `find_places_nearby` to find attractions, restaurants, etc., based on user interests or specific requests. Ensure you retrieve coordinates and address.
     *   Call `get_travel_info` using latitude and longitude coordinates from `find_places_nearby` results to calculate travel times between planned activities using the user's specified travel mode. Check feasibility based on pace.
+    *   For multi-day trips, after gathering places call `group_places_by_day` once with the candidate places (the `find_places_nearby` entries you are considering, as returned) and the number of days. It returns neighborhood-grouped day buckets; build each day from its bucket.
+    *   To order a day's activities, call `optimize_day_route` once with that day's chosen places (and the user's travel mode) rather than checking every pair with `get_travel_info`. It returns the visit order with travel minutes between stops.
+    *   Tool results are compact: places use `n` (name), `a` (address), `lat`/`lon`, `r` (rating), `p` (price), `i` (index); weather uses `d` (date), `hi`/`lo` (°C), `c` (conditions), `pop` (precipitation %), and `is_climatology: true` marks long-term monthly averages for dates beyond the forecast range (use them as typical conditions; do not retry); travel uses `min` and `km`. Results carry a `ref`; call `lookup_tool_result` with the `ref` (and a place's `i`) only if you need the full details; if a `ref` is reported as no longer available, repeat the original tool call instead.
 5.  **Structure and Output JSON Plan:**
     *   When you have gathered enough information and are ready to present the initial plan OR present a revised plan based on feedback, **your primary output MUST be the complete itinerary formatted as a single JSON object.**
     *   This JSON object must have a root key "itinerary". The value can be a **list** of daily plan objects OR a **dictionary** where keys are "YYYY-MM-DD" dates and values are daily plan objects.
@@ -83,28 +265,23 @@ def validate_api_keys() -> bool:
         
     return True
 
-# --- Google Maps Client Setup ---
-try:
-    gmaps = googlemaps.Client(key=MAPS_API_KEY)
-    if "YOUR_MAPS_API_KEY" in MAPS_API_KEY:
-         logging.warning("Using placeholder Google Maps API key. Maps calls will fail.")
-         gmaps_active = False
-    else:
-         gmaps_active = True
-         logging.info("Google Maps client initialized successfully.")
-except Exception as e:
-    logging.error(f"Failed to initialize Google Maps client: {e}")
-    gmaps = None
-    gmaps_active = False
-
 # --- LLM Configuration ---
 GEMINI_MODEL_CONFIG = {
     "model": "gemini-2.5-pro",
     "temperature": 0.7,
+    # Retries are handled by core/llm_client.py
+    "max_retries": 1,
     "safety_settings": {
         HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
         HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
         HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
         HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
     }
-}
\ No newline at end of file
+}
+
+SLOT_EXTRACTION_MODEL_CONFIG = {
+    "model": "gemini-2.5-flash",
+    "temperature": 0.0,
+    "max_retries": 1,
+    "safety_settings": GEMINI_MODEL_CONFIG["safety_settings"]
+}
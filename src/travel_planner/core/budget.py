@@ -0,0 +1,70 @@
+"""Per-turn latency budget for the travel planning graph."""
+
+import time
+from typing import Dict, Any, Optional
+
+from ..config.settings import (
+    TURN_LATENCY_BUDGET_S,
+    TURN_MAX_TOOL_ROUNDS,
+    TURN_FINALIZE_MARGIN_S
+)
+
+FINALIZE_INSTRUCTION = """
+**Time budget reached:** Do NOT call any more tools. Using only the information already gathered in this
+conversation, respond now. If you were building an itinerary, output the best complete JSON plan you can;
+mark anything you could not verify in the activity `notes`."""
+
+
+class TurnBudget:
+    """Tracks elapsed time and tool rounds for the current turn, as recorded in graph state."""
+
+    def __init__(self, started_at: float, deadline: float, tool_rounds: int = 0,
+                 max_tool_rounds: int = TURN_MAX_TOOL_ROUNDS,
+                 finalize_margin_s: float = TURN_FINALIZE_MARGIN_S):
+        self.started_at = started_at
+        self.deadline = deadline
+        self.tool_rounds = tool_rounds
+        self.max_tool_rounds = max_tool_rounds
+        self.finalize_margin_s = finalize_margin_s
+
+    @classmethod
+    def start(cls, budget_s: Optional[float] = None) -> "TurnBudget":
+        """Starts a fresh budget for a new turn."""
+        now = time.time()
+        return cls(now, now + (TURN_LATENCY_BUDGET_S if budget_s is None else budget_s))
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "TurnBudget":
+        """Reads the budget from state; a state without one gets a fresh budget."""
+        if not state.get("turn_deadline"):
+            return cls.start()
+        return cls(state.get("turn_started_at") or time.time(), state["turn_deadline"],
+                   state.get("tool_rounds") or 0)
+
+    def to_state(self) -> Dict[str, Any]:
+        """State update fields for this budget."""
+        return {
+            "turn_started_at": self.started_at,
+            "turn_deadline": self.deadline,
+            "tool_rounds": self.tool_rounds,
+        }
+
+    @property
+    def elapsed_s(self) -> float:
+        return time.time() - self.started_at
+
+    @property
+    def remaining_s(self) -> float:
+        return self.deadline - time.time()
+
+    @property
+    def rounds_left(self) -> int:
+        return self.max_tool_rounds - self.tool_rounds
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining_s <= 0
+
+    def should_finalize(self) -> bool:
+        """True once the planner must stop calling tools and answer with what it has."""
+        return self.rounds_left <= 0 or self.remaining_s <= self.finalize_margin_s
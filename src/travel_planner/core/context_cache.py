@@ -0,0 +1,238 @@
+"""
+Provider-side context caching of the planner's static prefix.
+
+SYSTEM_PROMPT and the tool declarations are identical for every planner call,
+yet they are billed as fresh input tokens several times per turn. With
+CONTEXT_CACHE_ENABLED the prefix is stored once as a Gemini cached content and
+planner calls reference it by name:
+
+- the handle is keyed by a fingerprint of model, prompt and tool schemas and is
+  shared by every session in the process; on startup an existing cache with
+  the same fingerprint (e.g. created by another worker) is reused,
+- the cache TTL is extended shortly before it expires, and a handle the
+  provider no longer knows is recreated,
+- when caching is unavailable (prefix below the model's minimum, API errors)
+  planner calls fall back to sending the full prefix and caching is retried
+  after CONTEXT_CACHE_RETRY_S.
+
+Cached requests cannot carry a system instruction, tools or a tool config, so
+the per-turn part of the system prompt is sent as a leading context message
+and forced finalization (tool_choice="none") always goes uncached.
+
+`LocalContextCacheBackend` is an in-memory stand-in for the Gemini caches API.
+"""
+
+import hashlib
+import itertools
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from ..config.settings import (
+    CONTEXT_CACHE_ENABLED,
+    CONTEXT_CACHE_TTL_S,
+    CONTEXT_CACHE_REFRESH_MARGIN_S,
+    CONTEXT_CACHE_RETRY_S,
+    CONTEXT_CACHE_MIN_TOKENS,
+    logging
+)
+from ..utils.metrics import metrics
+from .projection import estimate_text_tokens
+
+_DISPLAY_PREFIX = "travel-planner-"
+
+
+class ContextCacheUnavailable(Exception):
+    """The provider refused to create or extend a cached content."""
+
+
+class GeminiContextCacheBackend:
+    """Cached contents through the google-genai client of a ChatGoogleGenerativeAI model."""
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    def find(self, model: str, display_name: str) -> Optional[Tuple[str, float]]:
+        for cache in self.client.caches.list():
+            if cache.display_name == display_name and (cache.model or "").endswith(model) and cache.expire_time:
+                return cache.name, cache.expire_time.timestamp()
+        return None
+
+    def create(self, model: str, display_name: str, system_instruction: str, tools: Sequence[Any], ttl_s: int) -> Tuple[str, float]:
+        from google.genai import types
+        from langchain_google_genai._function_utils import convert_to_genai_function_declarations
+
+        try:
+            cache = self.client.caches.create(model=model, config=types.CreateCachedContentConfig(
+                display_name=display_name,
+                system_instruction=system_instruction,
+                tools=[convert_to_genai_function_declarations(list(tools))] if tools else None,
+                ttl=f"{ttl_s}s",
+            ))
+        except Exception as e:
+            raise ContextCacheUnavailable(str(e)) from e
+        return cache.name, cache.expire_time.timestamp()
+
+    def refresh(self, name: str, ttl_s: int) -> float:
+        from google.genai import types
+
+        try:
+            cache = self.client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{ttl_s}s"))
+        except Exception as e:
+            raise ContextCacheUnavailable(str(e)) from e
+        return cache.expire_time.timestamp()
+
+
+class LocalContextCacheBackend:
+    """In-memory stand-in for the caches API: same contract, with expiry and call counts."""
+
+    def __init__(self, clock=time.time, fail: bool = False):
+        self.clock = clock
+        self.fail = fail
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.calls = {"find": 0, "create": 0, "refresh": 0}
+        self._ids = itertools.count(1)
+
+    def find(self, model: str, display_name: str) -> Optional[Tuple[str, float]]:
+        self.calls["find"] += 1
+        for name, entry in self.entries.items():
+            if entry["display_name"] == display_name and entry["model"] == model and entry["expires_at"] > self.clock():
+                return name, entry["expires_at"]
+        return None
+
+    def create(self, model: str, display_name: str, system_instruction: str, tools: Sequence[Any], ttl_s: int) -> Tuple[str, float]:
+        self.calls["create"] += 1
+        if self.fail:
+            raise ContextCacheUnavailable("caching disabled in the local backend")
+        name = f"cachedContents/local-{next(self._ids)}"
+        self.entries[name] = {"model": model, "display_name": display_name, "system_instruction": system_instruction,
+                              "tools": list(tools), "expires_at": self.clock() + ttl_s}
+        return name, self.entries[name]["expires_at"]
+
+    def refresh(self, name: str, ttl_s: int) -> float:
+        self.calls["refresh"] += 1
+        entry = self.entries.get(name)
+        if entry is None or entry["expires_at"] <= self.clock():
+            self.entries.pop(name, None)
+            raise ContextCacheUnavailable(f"{name} not found")
+        entry["expires_at"] = self.clock() + ttl_s
+        return entry["expires_at"]
+
+
+def prefix_fingerprint(model: str, system_prompt: str, tools: Sequence[Any]) -> str:
+    """Stable hash of everything that goes into the cached prefix."""
+    schemas = [convert_to_openai_tool(tool) for tool in tools]
+    blob = json.dumps({"model": model, "system": system_prompt, "tools": schemas}, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+class ContextCache:
+    """Process-wide handle manager for the cached planner prefix."""
+
+    def __init__(self, backend: Any = None, ttl_s: int = CONTEXT_CACHE_TTL_S,
+                 refresh_margin_s: int = CONTEXT_CACHE_REFRESH_MARGIN_S,
+                 retry_s: int = CONTEXT_CACHE_RETRY_S, min_tokens: int = CONTEXT_CACHE_MIN_TOKENS,
+                 clock=time.time):
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = refresh_margin_s
+        self.retry_s = retry_s
+        self.min_tokens = min_tokens
+        self.clock = clock
+        self._handles: Dict[str, Tuple[str, float]] = {}  # fingerprint -> (name, expires_at)
+        self._unavailable_until: Dict[str, float] = {}
+        self._rejected: set = set()
+        self._lock = threading.Lock()
+
+    def _backend_for(self, llm: Any) -> Any:
+        if self.backend is None:
+            self.backend = GeminiContextCacheBackend(llm.client)
+        return self.backend
+
+    def handle_for(self, llm: Any, system_prompt: str, tools: Sequence[Any]) -> Optional[str]:
+        """Name of a live cached content holding the prefix, or None to send it uncached."""
+        model = getattr(llm, "model", "")
+        fingerprint = prefix_fingerprint(model, system_prompt, tools)
+        now = self.clock()
+        with self._lock:
+            if self._unavailable_until.get(fingerprint, 0) > now:
+                return None
+            handle = self._handles.get(fingerprint)
+            if handle and handle[1] - now > self.refresh_margin_s:
+                return handle[0]
+            try:
+                backend = self._backend_for(llm)
+                if handle and handle[1] > now:
+                    expires_at = backend.refresh(handle[0], self.ttl_s)
+                    metrics.incr("context_cache.refreshed")
+                    handle = (handle[0], expires_at)
+                else:
+                    handle = self._create(backend, model, fingerprint, system_prompt, tools)
+            except ContextCacheUnavailable as e:
+                if handle and handle[1] > now:
+                    # Refresh failed: the handle may still be valid; recreate once it lapses
+                    logging.warning(f"Could not extend context cache {handle[0]}: {e}")
+                    return handle[0]
+                return self._mark_unavailable(fingerprint, now, e)
+            except Exception as e:
+                return self._mark_unavailable(fingerprint, now, e)
+            self._handles[fingerprint] = handle
+            return handle[0]
+
+    def _create(self, backend: Any, model: str, fingerprint: str, system_prompt: str, tools: Sequence[Any]) -> Tuple[str, float]:
+        display_name = _DISPLAY_PREFIX + fingerprint[:16]
+        existing = backend.find(model, display_name) if not self._handles.get(fingerprint) else None
+        if existing and existing[0] not in self._rejected and existing[1] - self.clock() > self.refresh_margin_s:
+            logging.info(f"Reusing context cache {existing[0]}.")
+            metrics.incr("context_cache.reused")
+            return existing
+        prefix_tokens = estimate_text_tokens(system_prompt) + estimate_text_tokens(
+            json.dumps([convert_to_openai_tool(tool) for tool in tools], default=str))
+        if prefix_tokens < self.min_tokens:
+            raise ContextCacheUnavailable(f"prefix of ~{prefix_tokens} tokens is below the {self.min_tokens}-token minimum")
+        name, expires_at = backend.create(model, display_name, system_prompt, tools, self.ttl_s)
+        logging.info(f"Created context cache {name} (~{prefix_tokens} tokens, expires in {expires_at - self.clock():.0f}s).")
+        metrics.incr("context_cache.created")
+        return name, expires_at
+
+    def _mark_unavailable(self, fingerprint: str, now: float, error: Exception) -> None:
+        logging.warning(f"Context caching unavailable, sending the full prompt for {self.retry_s}s: {error}")
+        metrics.incr("context_cache.unavailable")
+        self._handles.pop(fingerprint, None)
+        self._unavailable_until[fingerprint] = now + self.retry_s
+        return None
+
+    def invalidate(self, name: str) -> None:
+        """Forgets a handle the provider rejected; the next call recreates it."""
+        with self._lock:
+            self._rejected.add(name)
+            for fingerprint, handle in list(self._handles.items()):
+                if handle[0] == name:
+                    del self._handles[fingerprint]
+        metrics.incr("context_cache.invalidated")
+
+
+def split_cached_prefix(messages: List[BaseMessage], system_prompt: str) -> List[BaseMessage]:
+    """
+    Drops the cached static prompt from planner messages. The per-turn remainder of the
+    system message (slot summary, current plan, ...) is kept as a leading context message.
+    """
+    if not messages or not isinstance(messages[0], SystemMessage):
+        return messages
+    content = messages[0].content if isinstance(messages[0].content, str) else ""
+    dynamic = content[len(system_prompt):].strip() if content.startswith(system_prompt) else content.strip()
+    rest = list(messages[1:])
+    return ([HumanMessage(content=dynamic, name="trip_context")] if dynamic else []) + rest
+
+
+def input_usage(response: Any) -> Tuple[int, int]:
+    """(input_tokens, cached_input_tokens) reported for a model response."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens") or 0, (usage.get("input_token_details") or {}).get("cache_read") or 0
+
+
+context_cache = ContextCache() if CONTEXT_CACHE_ENABLED else None
@@ -0,0 +1,226 @@
+"""
+Fan-out planning of long trips (PLANNER_TOPOLOGY = "fanout", see core/graph.py).
+
+Instead of one long planner/tool loop, a first itinerary for a trip of at least
+FANOUT_MIN_DAYS days is planned in legs:
+
+1. `outline_node` splits the trip into legs of consecutive days (one city each),
+   asking the model for a leg outline and falling back to plain day chunks,
+2. `route_after_outline` dispatches one `plan_leg_node` per leg with the Send
+   API; legs run concurrently, each with its own tool loop and the turn's
+   shared deadline,
+3. `merge_legs_node` assembles the leg itineraries into one plan message, which
+   then goes through the usual parse/validate node (and revision loop).
+
+Clarifying questions, revisions of an existing plan and short trips take the
+sequential planner path. If any leg fails, the turn also falls back to it.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langgraph.types import Send
+
+from ..config.settings import (
+    SYSTEM_PROMPT,
+    FANOUT_MIN_DAYS,
+    FANOUT_DAYS_PER_LEG,
+    FANOUT_MAX_LEGS,
+    logging
+)
+from ..utils.metrics import metrics
+from . import nodes
+from .budget import TurnBudget, FINALIZE_INSTRUCTION
+from .llm_client import llm_client
+from .plan_parser import fast_loads, repair_json, parse_plan_text, message_text
+from .slots import get_trip_slots, missing_core_slots, trip_days, user_texts, format_slot_summary
+from .state import InteractivePlanState
+
+Leg = Dict[str, Any]
+
+OUTLINE_PROMPT = """Split the trip below into legs of at most {per_leg} consecutive days so each leg can be planned separately.
+
+{summary}
+All trip dates: {dates}
+Traveler's requests:
+{requests}
+
+Answer with JSON only: {{"legs": [{{"city": "...", "start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD", "focus": "..."}}]}}
+Legs must be in date order and cover every trip date exactly once. Use the city the traveler is in on those dates, and give each leg a distinct focus (themes or neighborhoods) so legs do not repeat the same attractions."""
+
+LEG_INSTRUCTION = """
+**Planning one leg of a longer trip:** Plan ONLY {start} to {end} in {city}. The other dates ({others}) are planned separately at the same time, so do not plan them and do not ask the user anything. Focus for this leg: {focus}
+Use the tools as usual, then output only the JSON itinerary for these dates."""
+
+
+def should_fan_out(state: InteractivePlanState) -> bool:
+    """True for a first plan of a long trip whose core details are known."""
+    messages = state.get("messages") or []
+    if state.get("current_plan") or not messages:
+        return False
+    last = messages[-1]
+    if not isinstance(last, HumanMessage) or last.name:
+        return False
+    slots = get_trip_slots(state)
+    return not missing_core_slots(slots) and len(trip_days(slots)) >= FANOUT_MIN_DAYS
+
+
+def default_legs(days: List[str], city: str) -> List[Leg]:
+    """Consecutive day chunks of FANOUT_DAYS_PER_LEG days, at most FANOUT_MAX_LEGS of them."""
+    leg_count = min(FANOUT_MAX_LEGS, -(-len(days) // FANOUT_DAYS_PER_LEG))
+    size, extra = divmod(len(days), leg_count)
+    legs, start = [], 0
+    for i in range(leg_count):
+        end = start + size + (1 if i < extra else 0)
+        legs.append({"city": city, "start_date": days[start], "end_date": days[end - 1], "focus": ""})
+        start = end
+    return legs
+
+
+def _parse_outline(text: str, days: List[str], city: str) -> Optional[List[Leg]]:
+    """Legs from an outline answer, or None unless they cover the trip dates in order."""
+    try:
+        payload = fast_loads(repair_json(text))
+    except ValueError:
+        return None
+    legs = payload.get("legs") if isinstance(payload, dict) else None
+    if not isinstance(legs, list) or not legs or len(legs) > FANOUT_MAX_LEGS:
+        return None
+    covered: List[str] = []
+    result = []
+    for leg in legs:
+        if not isinstance(leg, dict) or leg.get("start_date") not in days or leg.get("end_date") not in days:
+            return None
+        first, last = days.index(leg["start_date"]), days.index(leg["end_date"])
+        if last < first:
+            return None
+        covered.extend(days[first:last + 1])
+        result.append({"city": str(leg.get("city") or city), "start_date": leg["start_date"],
+                       "end_date": leg["end_date"], "focus": str(leg.get("focus") or "")})
+    return result if covered == days else None
+
+
+def outline_node(state: InteractivePlanState) -> Dict[str, Any]:
+    """Splits a long trip into legs; leaves `trip_legs` empty when the turn is planned sequentially."""
+    logging.info("--- Running Node: outline_node ---")
+    if not should_fan_out(state):
+        return {"trip_legs": None}
+    slots = get_trip_slots(state)
+    days = trip_days(slots)
+    legs = None
+    if nodes.llm is not None:
+        prompt = OUTLINE_PROMPT.format(per_leg=FANOUT_DAYS_PER_LEG, summary=format_slot_summary(slots),
+                                       dates=", ".join(days), requests="\n".join(user_texts(state["messages"])))
+        try:
+            response = llm_client.invoke(nodes.llm, [HumanMessage(content=prompt)],
+                                         deadline=TurnBudget.from_state(state).deadline)
+            legs = _parse_outline(message_text(response.content), days, slots["target_city"])
+        except Exception as e:
+            logging.warning(f"Trip outline failed ({e}); splitting by days.")
+    if not legs:
+        legs = default_legs(days, slots["target_city"])
+    if len(legs) < 2:
+        return {"trip_legs": None}
+    logging.info(f"Planning {len(days)} days in {len(legs)} parallel legs.")
+    metrics.observe("fanout.legs", len(legs))
+    return {"trip_legs": [dict(leg, index=i) for i, leg in enumerate(legs)]}
+
+
+def route_after_outline(state: InteractivePlanState) -> Union[str, List[Send]]:
+    """One Send per leg, or the sequential planner."""
+    legs = state.get("trip_legs")
+    if not legs:
+        return "planner_agent"
+    logging.info(f"Conditional Edge: Fanning out to {len(legs)} leg planners.")
+    payload = {
+        "slots": get_trip_slots(state),
+        "requests": user_texts(state["messages"]),
+        "legs": legs,
+        "turn_started_at": state.get("turn_started_at"),
+        "turn_deadline": state.get("turn_deadline"),
+    }
+    return [Send("plan_leg", dict(payload, leg=leg)) for leg in legs]
+
+
+def _leg_messages(payload: Dict[str, Any], leg: Leg, slots: Dict[str, Any], finalize: bool) -> List[Any]:
+    others = [f"{other['start_date']} to {other['end_date']} in {other['city']}"
+              for other in payload["legs"] if other["index"] != leg["index"]]
+    system_prompt = (f"{SYSTEM_PROMPT}\n{format_slot_summary(slots)}\n"
+                     + LEG_INSTRUCTION.format(start=leg["start_date"], end=leg["end_date"], city=leg["city"],
+                                              others="; ".join(others), focus=leg["focus"] or "anything that fits the interests"))
+    if finalize:
+        system_prompt += FINALIZE_INSTRUCTION
+    return [SystemMessage(content=system_prompt), HumanMessage(content="\n\n".join(payload["requests"]))]
+
+
+def plan_leg_node(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Sub-planner for one leg: its own planner/tool loop, returning the leg's days."""
+    leg = payload["leg"]
+    logging.info(f"--- Running Node: plan_leg_node (leg {leg['index']}: {leg['start_date']} to {leg['end_date']}) ---")
+    slots = dict(payload["slots"], target_city=leg["city"], start_date_str=leg["start_date"], end_date_str=leg["end_date"])
+    budget = TurnBudget.from_state(payload)
+    from ..utils.tools import tools  # Import here to avoid circular dependency
+    conversation: List[Any] = []
+    result: Dict[str, Any] = {"index": leg["index"], "days": [], "error": None}
+    try:
+        while True:
+            finalize = budget.should_finalize()
+            runnable = nodes.llm.bind_tools(tools, tool_choice="none") if finalize else nodes.llm.bind_tools(tools)
+            messages = _leg_messages(payload, leg, slots, finalize) + conversation
+            response = llm_client.invoke(runnable, messages, deadline=budget.deadline)
+            if not response.tool_calls or finalize:
+                break
+            budget.tool_rounds += 1
+            conversation += [response] + nodes.execute_tool_calls(response.tool_calls, slots, budget)
+        plan, error = parse_plan_text(message_text(response.content))
+        if plan is None:
+            result["error"] = error or "Leg planner returned no itinerary."
+        else:
+            itinerary = plan["itinerary"]
+            days = list(itinerary.values()) if isinstance(itinerary, dict) else list(itinerary)
+            if isinstance(itinerary, dict):
+                for date, day in zip(itinerary, days):
+                    if isinstance(day, dict):
+                        day.setdefault("date", date)
+            result["days"] = [day for day in days if isinstance(day, dict)
+                              and leg["start_date"] <= str(day.get("date")) <= leg["end_date"]]
+            if not result["days"]:
+                result["error"] = "Leg itinerary has no days within the leg dates."
+    except Exception as e:
+        logging.error(f"Leg {leg['index']} planner failed: {e}", exc_info=True)
+        result["error"] = str(e)
+    metrics.observe("fanout.leg_tool_rounds", budget.tool_rounds)
+    return {"leg_plans": [result]}
+
+
+def merge_legs_node(state: InteractivePlanState) -> Dict[str, Any]:
+    """Joins the leg itineraries into one plan message for the parse/validate node."""
+    logging.info("--- Running Node: merge_legs_node ---")
+    legs = state.get("trip_legs") or []
+    results = {result["index"]: result for result in state.get("leg_plans") or []}
+    failed = [leg["index"] for leg in legs if leg["index"] not in results or results[leg["index"]]["error"]]
+    if failed:
+        logging.warning(f"Legs {failed} failed ({[results.get(i, {}).get('error') for i in failed]}); planning the trip sequentially.")
+        metrics.incr("fanout.fallbacks")
+        return {"trip_legs": None}
+    days = [day for leg in legs for day in results[leg["index"]]["days"]]
+    days.sort(key=lambda day: datetime.strptime(day["date"], "%Y-%m-%d") if _is_date(day.get("date")) else datetime.max)
+    plan = {"itinerary": days}
+    return {"messages": [AIMessage(content=json.dumps(plan, ensure_ascii=False, indent=2))]}
+
+
+def _is_date(value: Any) -> bool:
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def route_after_merge(state: InteractivePlanState) -> str:
+    """Merged plans go to parse/validate; failed fan-outs to the sequential planner."""
+    if state.get("trip_legs"):
+        return "parse_plan"
+    return "planner_agent"
@@ -1,12 +1,14 @@
 """LangGraph workflow definition for the travel planning system."""
 
 from langgraph.graph import StateGraph, END
-from typing import Dict, Any
-from langchain_core.messages import AIMessage
+from typing import Dict, Any, Iterator, Tuple
+from langchain_core.messages import AIMessage, AIMessageChunk
 
-from ..config.settings import logging
+from ..config.settings import PLANNER_TOPOLOGY, logging
 from .state import InteractivePlanState
-from .nodes import planner_agent_node, tool_executor_node, parse_and_save_plan_node
+from .plan_parser import StreamingPlanParser, message_text
+from .nodes import start_turn_node, extract_slots_node, prefetch_node, planner_agent_node, tool_executor_node, parse_and_save_plan_node
+from .fanout import outline_node, route_after_outline, plan_leg_node, merge_legs_node, route_after_merge
 
 def route_after_planner(state: InteractivePlanState) -> str:
     """Routes from the planner based on the AI's response."""
@@ -24,17 +26,18 @@ def route_after_planner(state: InteractivePlanState) -> str:
         logging.warning(f"Conditional Edge: Unexpected message type after planner ({type(last_message)}). Routing to END.")
         return "error_end"
 
-def create_graph() -> StateGraph:
-    """Creates and returns the LangGraph workflow."""
-    workflow = StateGraph(InteractivePlanState)
+def route_after_parse(state: InteractivePlanState) -> str:
+    """Sends a plan that failed validation back to the planner; otherwise ends the turn."""
+    if state.get("validation_feedback_at") is not None:
+        logging.info("Conditional Edge: Plan failed validation, routing back to planner.")
+        return "revise_plan"
+    return "end"
 
-    # Add nodes
+def _add_planner_loop(workflow: StateGraph) -> None:
+    """Adds the planner/tool loop and the parse/validate step shared by both topologies."""
     workflow.add_node("planner_agent", planner_agent_node)
     workflow.add_node("tool_executor", tool_executor_node)
     workflow.add_node("parse_and_save_plan", parse_and_save_plan_node)
-
-    # Define edges
-    workflow.set_entry_point("planner_agent")
     workflow.add_edge("tool_executor", "planner_agent")
 
     # Conditional edge from planner
@@ -48,14 +51,70 @@ def create_graph() -> StateGraph:
         }
     )
 
-    # Edge from parsing node to END
-    workflow.add_edge("parse_and_save_plan", END)
+    # Validated plans end the turn; rejected ones go back to the planner
+    workflow.add_conditional_edges(
+        "parse_and_save_plan",
+        route_after_parse,
+        {
+            "revise_plan": "planner_agent",
+            "end": END
+        }
+    )
+
+def create_graph() -> StateGraph:
+    """Creates and returns the LangGraph workflow."""
+    workflow = StateGraph(InteractivePlanState)
+
+    # Add nodes
+    workflow.add_node("start_turn", start_turn_node)
+    workflow.add_node("extract_slots", extract_slots_node)
+    workflow.add_node("prefetch", prefetch_node)
+    _add_planner_loop(workflow)
+
+    # Define edges
+    workflow.set_entry_point("start_turn")
+    workflow.add_edge("start_turn", "extract_slots")
+    workflow.add_edge("extract_slots", "prefetch")
+    workflow.add_edge("prefetch", "planner_agent")
 
     return workflow
 
-def compile_graph() -> Any:
-    """Compiles and returns the LangGraph application."""
-    workflow = create_graph()
+def create_fanout_graph() -> StateGraph:
+    """
+    Variant that plans long trips as parallel legs: outline -> one plan_leg per leg
+    (Send) -> merge_legs -> parse/validate. Other turns use the sequential loop.
+    """
+    workflow = StateGraph(InteractivePlanState)
+
+    workflow.add_node("start_turn", start_turn_node)
+    workflow.add_node("extract_slots", extract_slots_node)
+    workflow.add_node("prefetch", prefetch_node)
+    workflow.add_node("outline", outline_node)
+    workflow.add_node("plan_leg", plan_leg_node)
+    workflow.add_node("merge_legs", merge_legs_node)
+    _add_planner_loop(workflow)
+
+    workflow.set_entry_point("start_turn")
+    workflow.add_edge("start_turn", "extract_slots")
+    workflow.add_edge("extract_slots", "prefetch")
+    workflow.add_edge("prefetch", "outline")
+    workflow.add_conditional_edges("outline", route_after_outline, ["plan_leg", "planner_agent"])
+    # merge_legs runs once all legs of the superstep have finished
+    workflow.add_edge("plan_leg", "merge_legs")
+    workflow.add_conditional_edges(
+        "merge_legs",
+        route_after_merge,
+        {
+            "parse_plan": "parse_and_save_plan",
+            "planner_agent": "planner_agent"
+        }
+    )
+
+    return workflow
+
+def compile_graph(topology: str = PLANNER_TOPOLOGY) -> Any:
+    """Compiles and returns the LangGraph application ("sequential" or "fanout" topology)."""
+    workflow = create_fanout_graph() if topology == "fanout" else create_graph()
     try:
         app = workflow.compile()
         logging.info("Interactive LangGraph compiled successfully.")
@@ -63,3 +122,30 @@ def compile_graph() -> Any:
     except Exception as compile_error:
         logging.error(f"Failed to compile LangGraph: {compile_error}", exc_info=True)
         return None
+
+def stream_turn_events(app: Any, graph_input: Dict[str, Any], config: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    Runs one turn with streaming. Yields ("day", day_plan) for each itinerary day as soon as
+    the planner has finished writing it, then ("final", state) with the final graph state.
+    """
+    parsers: Dict[Any, StreamingPlanParser] = {}
+    leg_dates = set()
+    final_state = None
+    for mode, payload in app.stream(graph_input, config=config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            final_state = payload
+            continue
+        chunk, metadata = payload
+        if metadata.get("langgraph_node") not in ("planner_agent", "plan_leg") or not isinstance(chunk, AIMessageChunk):
+            continue
+        # One parser per planner response: a revision starts a new plan, and leg
+        # planners stream concurrently
+        parser = parsers.setdefault(chunk.id, StreamingPlanParser())
+        for day_plan in parser.feed(message_text(chunk.content)):
+            if metadata["langgraph_node"] == "plan_leg":
+                # Legs plan disjoint dates; only the first day seen for a date is final
+                if day_plan.get("date") in leg_dates:
+                    continue
+                leg_dates.add(day_plan.get("date"))
+            yield "day", day_plan
+    yield "final", final_state
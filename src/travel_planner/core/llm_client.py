@@ -0,0 +1,223 @@
+"""
+Resilient invocation of the Gemini chat models.
+
+Wraps any LangChain runnable (e.g. `llm.bind_tools(tools)`) with:
+- a process-wide token-bucket limiter sized from the configured RPM/TPM quotas,
+- jittered exponential retry for transient errors (429/5xx), classified by the
+  langchain-core model error types, the status code, or a gRPC status name,
+- optional hedged requests: a second identical request is sent if the first is slow.
+
+Waiting on the limiter or between retries is reported as metrics rather than
+surfacing as errors; only the final failure is raised to the caller.
+"""
+
+import contextvars
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+
+from ..config.settings import (
+    GEMINI_RPM,
+    GEMINI_TPM,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE_S,
+    LLM_BACKOFF_MAX_S,
+    LLM_HEDGE_DELAY_S,
+    LLM_MAX_QUEUE_WAIT_S,
+    LLM_EXPECTED_OUTPUT_TOKENS,
+    logging,
+    google_exceptions
+)
+from ..utils.metrics import metrics
+from ..utils.rate_limit import TokenBucket, RateLimitTimeout
+
+try:  # langchain-core >= 1.1 classifies provider errors; langchain-google-genai 4.x raises these
+    from langchain_core.exceptions import (
+        ModelAPIError, ModelConnectionError, ModelError, ModelRateLimitError, ModelTimeoutError
+    )
+except ImportError:
+    ModelError = ModelAPIError = ModelConnectionError = ModelRateLimitError = ModelTimeoutError = None
+
+RATE_LIMIT_EXCEPTIONS = tuple(e for e in (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    ModelRateLimitError,
+) if e is not None)
+RETRYABLE_EXCEPTIONS = RATE_LIMIT_EXCEPTIONS + tuple(e for e in (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    ModelAPIError,
+    ModelConnectionError,
+    ModelTimeoutError,
+) if e is not None)
+_RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Unclassified errors: a gRPC status name, or an HTTP status where the message reports one
+_RETRYABLE_MESSAGE = re.compile(
+    r"\b(?:RESOURCE_EXHAUSTED|UNAVAILABLE|DEADLINE_EXCEEDED)\b"
+    r"|^\s*(?:429|500|502|503|504)\b|\b(?:status|code|error|HTTP)[\s:=(]*(?:429|500|502|503|504)\b",
+    re.IGNORECASE,
+)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """The numeric status of an error or of the SDK error it wraps, if any."""
+    seen = 0
+    while error is not None and seen < 5:
+        for attribute in ("code", "status_code"):
+            value = getattr(error, attribute, None)
+            value = value() if callable(value) else value  # google.api_core exposes code as a property
+            if isinstance(value, int):
+                return value
+        error, seen = error.__cause__, seen + 1
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for quota and transient server errors worth retrying."""
+    if isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    if ModelError is not None and isinstance(error, ModelError):
+        return bool(error.is_retryable)
+    status = _status_code(error)
+    if status is not None:
+        return status in _RETRYABLE_STATUS_CODES
+    return bool(_RETRYABLE_MESSAGE.search(str(error)))
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Rough input token count (~4 characters per token)."""
+    chars = 0
+    for message in messages:
+        content = message.content
+        chars += len(content) if isinstance(content, str) else len(str(content))
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            chars += len(str(tool_call.get("args", "")))
+    return chars // 4 + 1
+
+
+class ResilientLLMClient:
+    """Shared retry, rate-limit and hedging policy for all LLM calls in the process."""
+
+    def __init__(self, rpm: int = GEMINI_RPM, tpm: int = GEMINI_TPM,
+                 max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base_s: float = LLM_BACKOFF_BASE_S,
+                 backoff_max_s: float = LLM_BACKOFF_MAX_S,
+                 hedge_delay_s: float = LLM_HEDGE_DELAY_S,
+                 max_queue_wait_s: float = LLM_MAX_QUEUE_WAIT_S):
+        self.requests_bucket = TokenBucket.per_minute("gemini_rpm", rpm)
+        self.tokens_bucket = TokenBucket.per_minute("gemini_tpm", tpm)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.hedge_delay_s = hedge_delay_s
+        self.max_queue_wait_s = max_queue_wait_s
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge") if hedge_delay_s > 0 else None
+
+    def _backoff_s(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt)))
+
+    def _throttle(self, estimated_tokens: int, deadline: Optional[float]) -> None:
+        """Waits for request and token allowance; bounded by the queue limit and the deadline."""
+        max_wait = self.max_queue_wait_s
+        if deadline is not None:
+            max_wait = max(0.0, min(max_wait, deadline - time.time()))
+        waited = self.requests_bucket.acquire(1, max_wait)
+        waited += self.tokens_bucket.acquire(estimated_tokens, max(0.0, max_wait - waited))
+        if waited > 0:
+            metrics.incr("llm.throttled")
+            metrics.observe("llm.queue_wait_s", waited)
+
+    def _call(self, runnable: Any, messages: Sequence[BaseMessage]) -> Any:
+        """Single request, hedged with a duplicate if it has not answered within the hedge delay."""
+        if self._hedge_pool is None:
+            return runnable.invoke(messages)
+
+        # Only the primary keeps the caller's context (and so its streaming callbacks);
+        # a hedge streaming into the same client would interleave two responses
+        primary = self._hedge_pool.submit(contextvars.copy_context().run, runnable.invoke, messages)
+        done, _ = wait([primary], timeout=self.hedge_delay_s)
+        # Only hedge if quota allows it right now; a hedge must never cause throttling
+        if done or not self.requests_bucket.try_acquire(1):
+            return primary.result()
+
+        metrics.incr("llm.hedged")
+        hedge = self._hedge_pool.submit(runnable.invoke, messages)
+        pending = {primary, hedge}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.incr("llm.hedge_won")
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def invoke(self, runnable: Any, messages: Sequence[BaseMessage], deadline: Optional[float] = None) -> Any:
+        """
+        Invokes the runnable with retries. `deadline` (epoch seconds) stops retrying
+        once the next backoff would overrun it.
+        """
+        estimated = estimate_tokens(messages) + LLM_EXPECTED_OUTPUT_TOKENS
+        attempt = 0
+        while True:
+            try:
+                self._throttle(estimated, deadline)
+            except RateLimitTimeout as e:
+                metrics.incr("llm.throttle_timeouts")
+                raise google_exceptions.ResourceExhausted(f"Local rate limit: {e}")
+
+            started = time.perf_counter()
+            try:
+                response = self._call(runnable, messages)
+            except Exception as e:
+                metrics.incr(f"llm.errors.{type(e).__name__}")
+                backoff = self._backoff_s(attempt)
+                out_of_time = deadline is not None and time.time() + backoff >= deadline
+                if not is_retryable(e) or attempt >= self.max_retries or out_of_time:
+                    raise
+                attempt += 1
+                metrics.incr("llm.retries")
+                metrics.observe("llm.backoff_s", backoff)
+                logging.warning(f"Retryable LLM error ({type(e).__name__}: {e}); retry {attempt}/{self.max_retries} in {backoff:.1f}s.")
+                time.sleep(backoff)
+                continue
+
+            metrics.incr("llm.calls")
+            metrics.observe("llm.latency_s", time.perf_counter() - started)
+            usage = getattr(response, "usage_metadata", None) or {}
+            if usage.get("total_tokens"):
+                # Correct the pre-charged estimate with the real usage
+                self.tokens_bucket.adjust(estimated - usage["total_tokens"])
+            if usage.get("input_tokens"):
+                cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+                metrics.incr("llm.input_tokens.cached", cached)
+                metrics.incr("llm.input_tokens.uncached", usage["input_tokens"] - cached)
+            return response
+
+    def wrap(self, runnable: Any, deadline: Optional[float] = None) -> "ResilientRunnable":
+        """Returns an object with `.invoke(messages)` that goes through this client."""
+        return ResilientRunnable(self, runnable, deadline)
+
+
+class ResilientRunnable:
+    """Minimal runnable adapter around ResilientLLMClient.invoke."""
+
+    def __init__(self, client: ResilientLLMClient, runnable: Any, deadline: Optional[float] = None):
+        self.client = client
+        self.runnable = runnable
+        self.deadline = deadline
+
+    def invoke(self, messages: Sequence[BaseMessage]) -> Any:
+        return self.client.invoke(self.runnable, messages, self.deadline)
+
+
+# Process-wide client: all sessions share the same quota buckets
+llm_client = ResilientLLMClient()
@@ -1,17 +1,49 @@
 """Node definitions for the LangGraph workflow."""
 
 import json
-from typing import Dict, Any
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, AIMessage
+from typing import Dict, Any, List, Optional, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
 
 from ..config.settings import (
     SYSTEM_PROMPT,
     GEMINI_API_KEY,
     GEMINI_MODEL_CONFIG,
-    logging,
-    google_exceptions
+    SLOT_EXTRACTION_MODEL_CONFIG,
+    SLOT_LLM_FALLBACK,
+    PLANNER_HISTORY_TURNS,
+    TOOL_OUTPUT_PROJECTION,
+    ROUTE_OPTIMIZE_PLAN,
+    PLAN_VALIDATION_ENABLED,
+    PLAN_MAX_VALIDATION_ROUNDS,
+    PLAN_MAX_REPORTED_VIOLATIONS,
+    PLAN_PATCH_ENABLED,
+    RESPONSE_CACHE_ENABLED,
+    logging
 )
 from .state import InteractivePlanState
+from .prefetch import prefetcher
+from .budget import TurnBudget, FINALIZE_INSTRUCTION
+from .llm_client import llm_client, is_retryable, RATE_LIMIT_EXCEPTIONS
+from .context_cache import context_cache, split_cached_prefix, input_usage
+from .projection import project_tool_output, estimate_text_tokens
+from .validation import validate_plan, has_errors, format_feedback
+from .plan_parser import parse_plan_text, parse_patch_text, message_text
+from .plan_patch import apply_patch, PatchError, PATCH_INSTRUCTION
+from .response_cache import response_cache_key, lookup_response, store_response
+from ..utils.metrics import metrics
+from ..utils.result_store import restore_result
+from ..utils.routing import optimize_plan_routes
+from .slots import (
+    TRIP_SLOT_KEYS,
+    apply_user_message,
+    extract_slots_with_llm,
+    merge_slots,
+    user_texts,
+    get_trip_slots,
+    missing_core_slots,
+    format_slot_summary
+)
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 # Initialize LLM
@@ -28,6 +60,118 @@ else:
     except Exception as e:
         logging.error(f"Failed to initialize ChatGoogleGenerativeAI: {e}", exc_info=True)
 
+# Small, cheap model used only as a fallback for trip-slot extraction
+slot_llm = None
+if GEMINI_API_KEY and SLOT_LLM_FALLBACK:
+    try:
+        slot_llm = ChatGoogleGenerativeAI(
+            google_api_key=GEMINI_API_KEY,
+            **SLOT_EXTRACTION_MODEL_CONFIG
+        )
+    except Exception as e:
+        logging.error(f"Failed to initialize slot extraction model: {e}", exc_info=True)
+
+def _trim_history(messages: List[BaseMessage], keep_turns: int) -> List[BaseMessage]:
+    """
+    Keeps the last `keep_turns` user turns and everything after them.
+    Cuts only at user-message boundaries so tool calls stay paired with their results.
+    """
+    turn_starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage) and not m.name]
+    if keep_turns <= 0 or len(turn_starts) <= keep_turns:
+        return messages
+    return messages[turn_starts[-keep_turns]:]
+
+def build_planner_messages(state: InteractivePlanState) -> List[BaseMessage]:
+    """
+    Builds the planner input: system prompt plus a compact slot summary, followed by
+    the conversation. Once the core slots are known, older turns are dropped since the
+    summary carries what they established.
+    """
+    slots = get_trip_slots(state)
+    messages = list(state['messages'])
+    feedback_at = state.get("validation_feedback_at")
+    if feedback_at is not None and state.get("plan_violations"):
+        # Ephemeral: shown right after the rejected plan, never stored in the history
+        feedback = format_feedback(state["plan_violations"], PLAN_MAX_REPORTED_VIOLATIONS)
+        messages.insert(feedback_at, HumanMessage(content=feedback, name="plan_validator"))
+    history = [m for m in messages if not isinstance(m, SystemMessage)]
+    if slots and not missing_core_slots(slots):
+        history = _trim_history(history, PLANNER_HISTORY_TURNS)
+
+    system_prompt = SYSTEM_PROMPT
+    summary = format_slot_summary(slots)
+    if summary:
+        system_prompt = f"{SYSTEM_PROMPT}\n{summary}\n"
+    if PLAN_PATCH_ENABLED and state.get("current_plan"):
+        # Patches index into this exact itinerary, so it is always shown in full
+        current = json.dumps(state["current_plan"], separators=(",", ":"), ensure_ascii=False)
+        system_prompt = f"{system_prompt}{PATCH_INSTRUCTION}\nCurrent itinerary:\n{current}\n"
+    return [SystemMessage(content=system_prompt)] + history
+
+def start_turn_node(state: InteractivePlanState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Stamps the latency budget for this turn. The budget can be overridden per run
+    with `config["configurable"]["turn_budget_s"]`.
+    """
+    logging.info("--- Running Node: start_turn_node ---")
+    budget_s = (config or {}).get("configurable", {}).get("turn_budget_s")
+    return {**TurnBudget.start(budget_s).to_state(), "plan_violations": None, "validation_rounds": 0, "validation_feedback_at": None,
+            "response_cache_key": None, "turn_input_tokens": 0, "turn_cached_input_tokens": 0,
+            "trip_legs": None, "leg_plans": None}
+
+def extract_slots_node(state: InteractivePlanState) -> Dict[str, Any]:
+    """
+    Fills trip slots from the conversation. Rules run over the new user messages
+    (or the whole history when no slots are known yet, e.g. after a reload);
+    the LLM fallback runs on the latest message only if core slots are still missing.
+    """
+    logging.info("--- Running Node: extract_slots_node ---")
+    messages = list(state.get('messages', []))
+    slots = get_trip_slots(state)
+
+    if slots:
+        # Only the user messages since the last assistant reply are new this turn
+        last_ai_index = max((i for i, m in enumerate(messages) if isinstance(m, AIMessage)), default=-1)
+        texts = user_texts(messages[last_ai_index + 1:])
+    else:
+        texts = user_texts(messages)
+
+    for text in texts:
+        slots = apply_user_message(slots, text)
+
+    if texts and missing_core_slots(slots) and slot_llm is not None:
+        deadline = TurnBudget.from_state(state).deadline
+        slots = merge_slots(slots, extract_slots_with_llm(llm_client.wrap(slot_llm, deadline), texts[-1]))
+
+    logging.info(f"Trip slots: {slots}")
+    return {key: slots[key] for key in TRIP_SLOT_KEYS if key in slots}
+
+def prefetch_node(state: InteractivePlanState) -> Dict[str, Any]:
+    """
+    Kicks off background warming of the weather and places caches for the known
+    trip slots. Never waits for the results.
+    """
+    logging.info("--- Running Node: prefetch_node ---")
+    if prefetcher is not None:
+        prefetcher.prefetch_trip(get_trip_slots(state))
+    return {}
+
+def _invoke_planner(runnable: Any, messages: List[BaseMessage], cache_handle: Optional[str], deadline: float) -> AIMessage:
+    """
+    Invokes the planner. With a context cache handle the static prompt and tool declarations
+    are referenced by name instead of sent; if the provider rejects the handle, the call is
+    repeated with the full prompt.
+    """
+    if cache_handle:
+        try:
+            return llm_client.invoke(llm.bind(cached_content=cache_handle), split_cached_prefix(messages, SYSTEM_PROMPT), deadline=deadline)
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            logging.warning(f"Planner call with context cache {cache_handle} failed ({e}); retrying with the full prompt.")
+            context_cache.invalidate(cache_handle)
+    return llm_client.invoke(runnable, messages, deadline=deadline)
+
 def planner_agent_node(state: InteractivePlanState) -> Dict[str, Any]:
     """
     Conversational planner node. Invokes LLM with history and tools.
@@ -40,27 +184,58 @@ def planner_agent_node(state: InteractivePlanState) -> Dict[str, Any]:
     messages = state['messages']
     logging.info(f"Planner received {len(messages)} messages. Last: {type(messages[-1])} - {str(messages[-1].content)[:100]}...")
 
-    # Add the system prompt if it's not already the first message
-    current_messages = list(messages)
-    if not current_messages or not isinstance(current_messages[0], SystemMessage):
-        current_messages.insert(0, SystemMessage(content=SYSTEM_PROMPT))
+    # First planner call of the turn: answer from the response cache when the same request was planned before
+    cache_key = None
+    if RESPONSE_CACHE_ENABLED and isinstance(messages[-1], HumanMessage) and not messages[-1].name:
+        cache_key = response_cache_key(state)
+        cached = lookup_response(cache_key)
+        if cached is not None:
+            return {"messages": [AIMessage(content=cached["content"], response_metadata={"response_cache": "hit"})],
+                    "error_message": None}
+
+    # System prompt + slot summary, then the (possibly trimmed) conversation
+    current_messages = build_planner_messages(state)
 
+    # Past the tool-round or time budget: tools stay declared but calling them is disabled
+    budget = TurnBudget.from_state(state)
+    finalize = budget.should_finalize()
     from ..utils.tools import tools  # Import here to avoid circular dependency
-    llm_with_tools = llm.bind_tools(tools)
+    if finalize:
+        logging.warning(f"Turn budget nearly spent ({budget.remaining_s:.1f}s left, {budget.rounds_left} tool rounds left). Forcing finalization.")
+        metrics.incr("turn.forced_finalize")
+        current_messages[0] = SystemMessage(content=current_messages[0].content + FINALIZE_INSTRUCTION)
+        llm_with_tools = llm.bind_tools(tools, tool_choice="none")
+        cache_handle = None  # a tool config cannot be combined with cached content
+    else:
+        llm_with_tools = llm.bind_tools(tools)
+        cache_handle = context_cache.handle_for(llm, SYSTEM_PROMPT, tools) if context_cache is not None else None
 
     try:
-        # Invoke LLM with the full conversation history + system prompt
-        ai_response = llm_with_tools.invoke(current_messages)
+        # Invoke LLM with the conversation history + system prompt (retried and rate limited)
+        ai_response = _invoke_planner(llm_with_tools, current_messages, cache_handle, budget.deadline)
         logging.info(f"LLM Response: Type: {type(ai_response)}")
         if isinstance(ai_response.content, str):
             logging.info(f"LLM Response content snippet: {ai_response.content[:200]}...")
         if ai_response.tool_calls:
             logging.info(f"LLM Response tool calls: {ai_response.tool_calls}")
+            if finalize:
+                # Unanswered tool calls would break the next turn, so drop them
+                logging.warning("Dropping tool calls requested after the turn budget was spent.")
+                ai_response = AIMessage(content=ai_response.content or "I ran out of time gathering details for this turn. Let me know if you'd like me to continue planning.")
 
-        return {"messages": [ai_response], "error_message": None}
+        input_tokens, cached_tokens = input_usage(ai_response)
+        update = {
+            "messages": [ai_response],
+            "error_message": None,
+            "turn_input_tokens": (state.get("turn_input_tokens") or 0) + input_tokens,
+            "turn_cached_input_tokens": (state.get("turn_cached_input_tokens") or 0) + cached_tokens,
+        }
+        if cache_key:
+            update["response_cache_key"] = cache_key
+        return update
 
-    except google_exceptions.ResourceExhausted as e:
-         logging.error(f"LLM API quota exceeded: {e}")
+    except RATE_LIMIT_EXCEPTIONS as e:
+         logging.error(f"LLM API quota exceeded after retries: {e}")
          return {
              "messages": [AIMessage(content="Sorry, I encountered an API limit. Please try again later.")],
              "error_message": "Gemini API quota likely exceeded."
@@ -72,26 +247,31 @@ def planner_agent_node(state: InteractivePlanState) -> Dict[str, Any]:
             "error_message": f"LLM Error: {e}"
         }
 
-def tool_executor_node(state: InteractivePlanState) -> Dict[str, Any]:
-    """Executes tools called by the Planner Agent."""
-    logging.info("--- Running Node: tool_executor_node ---")
-    messages = list(state['messages'])
-    last_message = messages[-1]
-
-    if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
-        logging.warning("Tool executor called, but last message has no tool calls.")
-        return {}
-
-    tool_calls = last_message.tool_calls
-    logging.info(f"Executing {len(tool_calls)} tool calls: {[tc.get('name') for tc in tool_calls]}")
+def _apply_slot_defaults(tool_name: str, tool_args: Dict[str, Any], slots: Dict[str, Any]) -> Dict[str, Any]:
+    """Fills tool arguments the model left out from the known trip slots."""
+    args = dict(tool_args)
+    if tool_name == "find_places_nearby":
+        if not args.get("city") and slots.get("target_city"):
+            args["city"] = slots["target_city"]
+        if "interests" not in args and slots.get("interests"):
+            args["interests"] = slots["interests"]
+    elif tool_name == "get_weather_forecast":
+        if not args.get("location") and slots.get("target_city"):
+            args["location"] = slots["target_city"]
+    elif tool_name == "get_travel_info":
+        if not args.get("mode") and slots.get("travel_mode"):
+            args["mode"] = slots["travel_mode"]
+    return args
 
+def execute_tool_calls(tool_calls: List[Dict[str, Any]], slots: Dict[str, Any], budget: TurnBudget) -> List[ToolMessage]:
+    """Runs the tool calls of one planner response and returns a ToolMessage for each."""
     from ..utils.tools import tools  # Import here to avoid circular dependency
     tool_messages = []
     available_tools_map = {t.name: t for t in tools}
 
     for tool_call in tool_calls:
         tool_name = tool_call.get('name')
-        tool_args = tool_call.get('args', {})
+        tool_args = _apply_slot_defaults(tool_name, tool_call.get('args', {}), slots)
         tool_call_id = tool_call.get('id')
 
         if not tool_call_id:
@@ -102,13 +282,29 @@ def tool_executor_node(state: InteractivePlanState) -> Dict[str, Any]:
              ))
              continue
 
+        if budget.expired:
+            # Every tool call still needs a response, but we no longer wait on upstream APIs
+            metrics.incr("turn.tool_calls_skipped")
+            tool_messages.append(ToolMessage(
+                content=json.dumps({"error": "Skipped: turn time budget exhausted. Finalize with the data already gathered."}),
+                tool_call_id=tool_call_id
+            ))
+            continue
+
         if tool_name in available_tools_map:
             selected_tool = available_tools_map[tool_name]
             try:
                 logging.info(f"Invoking tool: {tool_name} with args: {tool_args}")
                 output = selected_tool.invoke(tool_args)
+                artifact = None
                 try:
                     output_content = json.dumps(output)
+                    if TOOL_OUTPUT_PROJECTION and tool_name != "lookup_tool_result":
+                        artifact = output  # The full payload behind the projection's `ref`
+                        raw_tokens = estimate_text_tokens(output_content)
+                        output_content = project_tool_output(tool_name, output)
+                        metrics.observe("tool_output.raw_tokens", raw_tokens)
+                        metrics.observe("tool_output.projected_tokens", estimate_text_tokens(output_content))
                     logging.info(f"Tool '{tool_name}' executed successfully. Output snippet: {output_content[:200]}...")
                 except TypeError as e:
                      logging.error(f"Tool '{tool_name}' output is not JSON serializable: {e}. Output: {output}")
@@ -116,7 +312,8 @@ def tool_executor_node(state: InteractivePlanState) -> Dict[str, Any]:
                          "error": f"Tool output serialization failed: {e}",
                          "output_type": str(type(output))
                      })
-                tool_messages.append(ToolMessage(content=output_content, tool_call_id=tool_call_id))
+                tool_messages.append(ToolMessage(content=output_content, tool_call_id=tool_call_id, name=tool_name,
+                                                 artifact=artifact))
             except Exception as e:
                 logging.error(f"Error executing tool '{tool_name}': {e}", exc_info=True)
                 tool_messages.append(ToolMessage(
@@ -130,7 +327,80 @@ def tool_executor_node(state: InteractivePlanState) -> Dict[str, Any]:
                 tool_call_id=tool_call_id
             ))
 
-    return {"messages": tool_messages, "error_message": None}
+    return tool_messages
+
+_REF_CONSUMERS = {"lookup_tool_result", "group_places_by_day"}
+
+def _restore_tool_results(messages: List[BaseMessage]) -> None:
+    """Puts the payloads kept with the transcript back into the result store so their refs resolve."""
+    restored = 0
+    for message in messages:
+        if isinstance(message, ToolMessage) and message.artifact is not None and message.name:
+            restore_result(message.name, message.artifact)
+            restored += 1
+    metrics.observe("tool_results.restored", restored)
+
+def tool_executor_node(state: InteractivePlanState) -> Dict[str, Any]:
+    """Executes tools called by the Planner Agent."""
+    logging.info("--- Running Node: tool_executor_node ---")
+    messages = list(state['messages'])
+    last_message = messages[-1]
+
+    if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
+        logging.warning("Tool executor called, but last message has no tool calls.")
+        return {}
+
+    tool_calls = last_message.tool_calls
+    logging.info(f"Executing {len(tool_calls)} tool calls: {[tc.get('name') for tc in tool_calls]}")
+
+    if any(tc.get('name') in _REF_CONSUMERS for tc in tool_calls):
+        _restore_tool_results(messages)
+
+    budget = TurnBudget.from_state(state)
+    budget.tool_rounds += 1
+    tool_messages = execute_tool_calls(tool_calls, get_trip_slots(state), budget)
+
+    return {"messages": tool_messages, "error_message": None, "tool_rounds": budget.tool_rounds}
+
+def record_turn_metrics(state: InteractivePlanState) -> None:
+    """Reports the turn's latency, tool rounds and any budget overrun."""
+    if not state.get("turn_deadline"):
+        return
+    budget = TurnBudget.from_state(state)
+    metrics.observe("turn.latency_s", budget.elapsed_s)
+    metrics.observe("turn.tool_rounds", budget.tool_rounds)
+    if state.get("turn_input_tokens"):
+        cached = state.get("turn_cached_input_tokens") or 0
+        metrics.observe("turn.input_tokens.cached", cached)
+        metrics.observe("turn.input_tokens.uncached", state["turn_input_tokens"] - cached)
+    if budget.expired:
+        metrics.incr("turn.budget_overrun")
+        metrics.observe("turn.overrun_s", -budget.remaining_s)
+        logging.warning(f"Turn exceeded its latency budget by {-budget.remaining_s:.1f}s.")
+
+def _cache_turn_response(state: InteractivePlanState, message: AIMessage) -> None:
+    """Stores the final response of a turn that completed cleanly and was not itself a cache hit."""
+    key = state.get("response_cache_key")
+    if not key or message.response_metadata.get("response_cache") == "hit" or not state.get("turn_deadline"):
+        return
+    budget = TurnBudget.from_state(state)
+    if not budget.expired:
+        store_response(key, message.content, budget.elapsed_s)
+
+def _apply_plan_patch(text: str, current_plan: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Applies a plan_patch message to the current plan. Returns (plan, []) or (None, [violation])."""
+    ops, error = parse_patch_text(text)
+    if ops is not None:
+        try:
+            patched = apply_patch(current_plan, ops)
+            metrics.incr("plan.patch_applied")
+            metrics.observe("plan.patch_ops", len(ops))
+            logging.info(f"Applied plan patch with {len(ops)} ops.")
+            return patched, []
+        except PatchError as e:
+            error = str(e)
+    metrics.incr("plan.patch_failed")
+    return None, [{"code": "patch_failed", "severity": "error", "path": "plan_patch", "message": error}]
 
 def parse_and_save_plan_node(state: InteractivePlanState) -> Dict[str, Any]:
     """
@@ -146,60 +416,74 @@ def parse_and_save_plan_node(state: InteractivePlanState) -> Dict[str, Any]:
 
     if not last_ai_message or last_ai_message.tool_calls:
         logging.info("PARSE_DEBUG: Last message is not AI or has tool calls. No plan to parse.")
-        return {}
+        record_turn_metrics(state)
+        return {"validation_feedback_at": None}
 
     ai_content = last_ai_message.content
     logging.info(f"PARSE_DEBUG: AI Message Content Type: {type(ai_content)}")
 
     # Find the content containing the JSON
-    if isinstance(ai_content, str):
-        if '"itinerary"' in ai_content and (ai_content.strip().startswith('{') or ai_content.strip().startswith('```json')):
-            content_to_parse = ai_content
-    elif isinstance(ai_content, list):
-        for item in ai_content:
-            if isinstance(item, str) and '"itinerary"' in item and (item.strip().startswith('{') or item.strip().startswith('```json')):
-                content_to_parse = item
-                break
+    ai_text = message_text(ai_content)
+    is_patch = PLAN_PATCH_ENABLED and '"plan_patch"' in ai_text
+    if ('"itinerary"' in ai_text or is_patch) and '{' in ai_text:
+        content_to_parse = ai_text
 
     if not content_to_parse:
+        record_turn_metrics(state)
         if state.get("error_message"):
-             return {"error_message": None}
-        return {}
+             return {"error_message": None, "validation_feedback_at": None}
+        _cache_turn_response(state, last_ai_message)
+        return {"validation_feedback_at": None}
 
-    # Try parsing the identified content
+    # Parse the identified content (tolerates fences, trailing commas, truncation, ...)
+    violations = []
     try:
-        json_str = content_to_parse
-        if "```json" in json_str:
-            json_str = json_str.split("```json")[1].split("```")[0].strip()
-        elif not json_str.strip().startswith('{'):
-             start_index = json_str.find('{')
-             end_index = json_str.rfind('}')
-             if start_index != -1 and end_index != -1 and start_index < end_index:
-                 json_str = json_str[start_index:end_index+1]
-             else:
-                 raise json.JSONDecodeError("No clear JSON object boundaries found", json_str, 0)
-
-        parsed_plan_candidate = json.loads(json_str)
-
-        # Basic validation
-        if isinstance(parsed_plan_candidate, dict) and "itinerary" in parsed_plan_candidate and isinstance(parsed_plan_candidate["itinerary"], (dict, list)):
-             parsed_plan = parsed_plan_candidate
+        if is_patch:
+            # Revision patch against the current plan; kept as the planner ordered it
+            parsed_plan, violations = _apply_plan_patch(content_to_parse, state.get("current_plan"))
         else:
-             parsed_plan = None
-             parsing_error = "Parsed JSON has incorrect structure."
-
-    except json.JSONDecodeError as e:
-        parsed_plan = None
-        parsing_error = f"Failed to parse final plan JSON: {e}"
+            parsed_plan, parsing_error = parse_plan_text(content_to_parse)
+            if parsed_plan is not None and ROUTE_OPTIMIZE_PLAN:
+                parsed_plan, saved_min = optimize_plan_routes(parsed_plan, state.get("travel_mode"))
+                metrics.observe("route.minutes_saved", saved_min)
     except Exception as e:
         parsed_plan = None
         parsing_error = f"Unexpected error parsing plan: {e}"
 
+    if violations or (parsed_plan is not None and PLAN_VALIDATION_ENABLED):
+        if parsed_plan is not None and PLAN_VALIDATION_ENABLED:
+            violations = validate_plan(parsed_plan, get_trip_slots(state))
+        rounds = state.get("validation_rounds") or 0
+        metrics.observe("plan.violations", len(violations))
+        if parsed_plan is None:
+            # A patch that cannot be applied: ask for the full itinerary, or keep the current plan
+            if rounds < PLAN_MAX_VALIDATION_ROUNDS and not TurnBudget.from_state(state).should_finalize():
+                logging.warning(f"Plan patch rejected ({violations[0]['message']}); asking the planner for a full itinerary.")
+                return {"plan_violations": violations, "validation_rounds": rounds + 1, "validation_feedback_at": len(messages)}
+            record_turn_metrics(state)
+            return {"plan_violations": violations, "validation_feedback_at": None,
+                    "error_message": f"Plan revision could not be applied: {violations[0]['message']}"}
+        if has_errors(violations) and rounds < PLAN_MAX_VALIDATION_ROUNDS and not TurnBudget.from_state(state).should_finalize():
+            logging.warning(f"Plan failed validation with {len(violations)} violations; sending it back to the planner (round {rounds + 1}).")
+            metrics.incr("plan.validation_revisions")
+            return {
+                "plan_violations": violations,
+                "validation_rounds": rounds + 1,
+                "validation_feedback_at": len(messages),
+            }
+        if has_errors(violations):
+            logging.warning(f"Saving plan with {len(violations)} unresolved violations.")
+        update = {"current_plan": parsed_plan, "plan_violations": violations, "validation_feedback_at": None}
+    else:
+        update = {"current_plan": parsed_plan, "validation_feedback_at": None}
+
+    record_turn_metrics(state)
     # Return update for state
-    update = {"current_plan": parsed_plan}
     if parsing_error:
          update["error_message"] = parsing_error
     elif parsed_plan is not None and state.get("error_message"):
          update["error_message"] = None
+    if parsed_plan is not None and not parsing_error and not has_errors(update.get("plan_violations") or []):
+        _cache_turn_response(state, last_ai_message)
 
     return update
@@ -0,0 +1,303 @@
+"""
+Incremental, tolerant parsing of itinerary JSON produced by the planner.
+
+- `StreamingPlanParser` consumes the model output chunk by chunk and returns
+  each day object of `itinerary` (list or date-keyed object form) as soon as
+  its closing brace arrives, so clients can render day 1 while later days are
+  still being generated. Text before the root object (prose, ```json fences)
+  is skipped.
+- `repair_json` fixes the usual LLM JSON glitches: code fences, comments,
+  trailing commas, Python literals, raw newlines inside strings and output
+  truncated mid-object.
+- `parse_plan_text` parses a complete message: fast path with orjson when it
+  is installed, then repaired JSON, then the days salvaged by the streaming
+  parser. `parse_patch_text` does the same for revision patches.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def fast_loads(text: str) -> Any:
+    """json.loads, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _loads_tolerant(text: str) -> Any:
+    try:
+        return fast_loads(text)
+    except ValueError:
+        return json.loads(repair_json(text))
+
+
+class StreamingPlanParser:
+    """Feeds on text chunks and returns completed itinerary days as they close."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.days: List[Dict[str, Any]] = []
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[Tuple[int, str]] = None  # (depth, raw value)
+        self._after_colon_key: Optional[str] = None  # key whose value comes next at the current depth
+        self._itinerary_depth: Optional[int] = None
+        self._day_start: Optional[int] = None
+        self._day_key: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Adds a chunk; returns the day objects completed by it."""
+        self.buffer += chunk
+        completed = []
+        buf = self.buffer
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = (len(self._stack), buf[self._string_start + 1:i])
+                continue
+            if not self._stack and ch != "{":
+                continue  # preamble before the root object
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                if self._last_string and self._last_string[0] == len(self._stack):
+                    self._after_colon_key = self._last_string[1]
+            elif ch == ",":
+                self._after_colon_key = None
+            elif ch in "{[":
+                depth = len(self._stack)
+                if depth == 1 and self._itinerary_depth is None and self._after_colon_key == "itinerary":
+                    self._itinerary_depth = depth + 1
+                elif ch == "{" and self._itinerary_depth is not None and depth == self._itinerary_depth:
+                    self._day_start = i
+                    self._day_key = self._after_colon_key if self._stack[-1] == "{" else None
+                self._stack.append(ch)
+                self._after_colon_key = None
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                depth = len(self._stack)
+                if ch == "}" and self._day_start is not None and depth == self._itinerary_depth:
+                    day = self._complete_day(buf[self._day_start:i + 1])
+                    if day is not None:
+                        completed.append(day)
+                    self._day_start = None
+                elif self._itinerary_depth is not None and depth < self._itinerary_depth:
+                    self._itinerary_depth = -1  # itinerary closed; ignore later containers
+                self._after_colon_key = None
+        self._pos = len(buf)
+        self.days.extend(completed)
+        return completed
+
+    def _complete_day(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            day = _loads_tolerant(text)
+        except ValueError:
+            return None
+        if not isinstance(day, dict):
+            return None
+        if self._day_key and "date" not in day:
+            day["date"] = self._day_key
+        return day
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_LITERAL_RE = re.compile(r"\b(True|False|None)\b")
+
+
+def extract_json_text(text: str) -> str:
+    """The JSON part of a message: fenced block if present, else from the first '{'."""
+    fenced = _FENCE_RE.search(text)
+    if fenced and "{" in fenced.group(1):
+        text = fenced.group(1)
+    start = text.find("{")
+    if start == -1:
+        return text.strip()
+    end = text.rfind("}")
+    # Keep everything after the last brace when the output looks truncated
+    return text[start:end + 1] if end > start and _balanced(text[start:end + 1]) else text[start:]
+
+
+def _balanced(text: str) -> bool:
+    depth, in_string, escape = 0, False, False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+    return depth == 0 and not in_string
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix of common LLM JSON errors; the result may still be invalid."""
+    text = extract_json_text(text)
+    out: List[str] = []
+    # Open containers: [char, output length just inside it or before its last ',', expecting]
+    stack: List[list] = []
+    in_string, escape = False, False
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+                if stack and stack[-1][0] == "{" and stack[-1][2] == "key":
+                    stack[-1][2] = "colon"
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\t":
+                out.append("\\t")
+            elif ch == "\r":
+                pass
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        if ch == '"':
+            in_string = True
+            if stack and stack[-1][0] == "{" and stack[-1][2] == "value":
+                stack[-1][2] = "done"
+            out.append(ch)
+        elif ch == ",":
+            j = i + 1
+            while j < n and text[j] in " \t\r\n":
+                j += 1
+            if j < n and text[j] not in "}]":
+                if stack:
+                    stack[-1][1] = len(out)
+                    stack[-1][2] = "key" if stack[-1][0] == "{" else "value"
+                out.append(ch)
+        elif ch in "{[":
+            if stack and stack[-1][0] == "{":
+                stack[-1][2] = "done"
+            out.append(ch)
+            stack.append([ch, len(out), "key" if ch == "{" else "value"])
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            out.append(ch)
+        elif ch == ":":
+            if stack and stack[-1][0] == "{":
+                stack[-1][2] = "value"
+            out.append(ch)
+        else:
+            literal = _LITERAL_RE.match(text, i) if ch in "TFN" else None
+            if literal:
+                out.append(_LITERALS[literal.group(1)])
+                i = literal.end()
+                if stack and stack[-1][0] == "{":
+                    stack[-1][2] = "done"
+                continue
+            if stack and stack[-1][0] == "{" and stack[-1][2] == "value" and not ch.isspace():
+                stack[-1][2] = "done"
+            out.append(ch)
+        i += 1
+
+    # Truncated output: close the open string, drop a dangling key, close containers
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+        if stack and stack[-1][0] == "{" and stack[-1][2] == "key":
+            stack[-1][2] = "colon"
+    if stack and stack[-1][0] == "{" and stack[-1][2] in ("colon", "value"):
+        del out[stack[-1][1]:]
+    repaired = "".join(out).rstrip()
+    while repaired.endswith(","):
+        repaired = repaired[:-1].rstrip()
+    for container in reversed(stack):
+        repaired += "}" if container[0] == "{" else "]"
+    return repaired
+
+
+def parse_plan_text(text: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Parses an itinerary message. Returns (plan, None) on success or (None, error).
+    Falls back to the individually parseable days when the whole object is broken.
+    """
+    candidate = extract_json_text(text)
+    error = None
+    try:
+        plan = fast_loads(candidate)
+    except ValueError as e:
+        error = f"Failed to parse final plan JSON: {e}"
+        try:
+            plan = json.loads(repair_json(candidate))
+            error = None
+        except ValueError:
+            plan = None
+
+    if plan is None:
+        parser = StreamingPlanParser()
+        parser.feed(candidate)
+        if parser.days:
+            return {"itinerary": parser.days}, None
+        return None, error
+    if isinstance(plan, dict) and isinstance(plan.get("itinerary"), (dict, list)):
+        return plan, None
+    return None, "Parsed JSON has incorrect structure."
+
+
+def parse_patch_text(text: str) -> Tuple[Optional[List[Any]], Optional[str]]:
+    """Parses a `{"plan_patch": [...]}` message (see core/plan_patch.py). Returns (ops, error)."""
+    candidate = extract_json_text(text)
+    try:
+        payload = _loads_tolerant(candidate)
+    except ValueError as e:
+        return None, f"Failed to parse plan patch JSON: {e}"
+    if not isinstance(payload, dict) or not isinstance(payload.get("plan_patch"), list):
+        return None, "Patch JSON needs a 'plan_patch' list."
+    return payload["plan_patch"], None
+
+
+def message_text(content: Any) -> str:
+    """Text of a message or message chunk (string or list of parts)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") if isinstance(part, dict) else ""
+                       for part in content)
+    return ""
@@ -0,0 +1,227 @@
+"""
+Plan revisions as patches against `current_plan`.
+
+For local changes the planner answers with `{"plan_patch": [ops]}` instead of
+re-emitting the whole itinerary. Two op styles are accepted and may be mixed:
+
+- itinerary ops, where `day` is the 1-based day number or its "YYYY-MM-DD" date
+  and `index` is the 0-based activity position:
+    {"op": "replace_activity", "day": 1, "index": 2, "activity": {...}}
+    {"op": "update_activity", "day": 1, "index": 2, "fields": {"time": "..."}}
+    {"op": "insert_activity", "day": 1, "index": 0, "activity": {...}}  (no index: append)
+    {"op": "remove_activity", "day": 1, "index": 2}
+    {"op": "move_activity", "day": 1, "index": 2, "to_day": 3, "to_index": 0}
+    {"op": "swap_days", "day": 2, "to_day": 3}  (activities swap, dates stay)
+    {"op": "replace_day", "day": 2, "activities": [...]}
+- RFC 6902 JSON Patch ops (add, remove, replace, move, copy, test) with JSON
+  Pointer paths such as "/itinerary/0/activities/-".
+
+`apply_patch` works on a copy and raises PatchError naming the failing op, in
+which case the graph asks the planner for a full itinerary instead.
+"""
+
+import copy
+from typing import Any, Dict, List, Tuple
+
+_ACTIVITY_OPS = ("replace_activity", "update_activity", "insert_activity", "remove_activity",
+                 "move_activity", "swap_days", "replace_day")
+_JSON_PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+
+class PatchError(ValueError):
+    """A patch op could not be applied."""
+
+
+def _days(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    itinerary = plan.get("itinerary")
+    if isinstance(itinerary, dict):
+        days = list(itinerary.values())
+    elif isinstance(itinerary, list):
+        days = itinerary
+    else:
+        raise PatchError("Current plan has no itinerary.")
+    if not all(isinstance(day, dict) for day in days):
+        raise PatchError("Current plan has malformed days.")
+    return days
+
+
+def _resolve_day(plan: Dict[str, Any], ref: Any) -> Dict[str, Any]:
+    days = _days(plan)
+    if isinstance(ref, str) and not ref.isdigit():
+        itinerary = plan["itinerary"]
+        if isinstance(itinerary, dict) and isinstance(itinerary.get(ref), dict):
+            return itinerary[ref]
+        for day in days:
+            if day.get("date") == ref:
+                return day
+        raise PatchError(f"No day dated {ref}.")
+    try:
+        number = int(ref)
+    except (TypeError, ValueError):
+        raise PatchError(f"Invalid day reference {ref!r}.")
+    if not 1 <= number <= len(days):
+        raise PatchError(f"Day {number} does not exist (plan has {len(days)} days).")
+    return days[number - 1]
+
+
+def _activities(day: Dict[str, Any]) -> List[Any]:
+    activities = day.setdefault("activities", [])
+    if not isinstance(activities, list):
+        raise PatchError(f"Day {day.get('date')} has no activity list.")
+    return activities
+
+
+def _index(activities: List[Any], index: Any, allow_end: bool = False) -> int:
+    if not isinstance(index, int) or isinstance(index, bool):
+        raise PatchError(f"Invalid activity index {index!r}.")
+    upper = len(activities) if allow_end else len(activities) - 1
+    if not 0 <= index <= upper:
+        raise PatchError(f"Activity index {index} out of range (day has {len(activities)} activities).")
+    return index
+
+
+def _apply_activity_op(plan: Dict[str, Any], op: Dict[str, Any]) -> None:
+    name = op["op"]
+    day = _resolve_day(plan, op.get("day"))
+    activities = _activities(day)
+
+    if name == "replace_activity":
+        if not isinstance(op.get("activity"), dict):
+            raise PatchError("replace_activity needs an 'activity' object.")
+        activities[_index(activities, op.get("index"))] = op["activity"]
+    elif name == "update_activity":
+        target = activities[_index(activities, op.get("index"))]
+        if not isinstance(op.get("fields"), dict) or not isinstance(target, dict):
+            raise PatchError("update_activity needs a 'fields' object.")
+        target.update(op["fields"])
+    elif name == "insert_activity":
+        if not isinstance(op.get("activity"), dict):
+            raise PatchError("insert_activity needs an 'activity' object.")
+        index = op.get("index", len(activities))
+        activities.insert(_index(activities, index, allow_end=True), op["activity"])
+    elif name == "remove_activity":
+        activities.pop(_index(activities, op.get("index")))
+    elif name == "move_activity":
+        target_activities = _activities(_resolve_day(plan, op.get("to_day", op.get("day"))))
+        activity = activities.pop(_index(activities, op.get("index")))
+        to_index = op.get("to_index", len(target_activities))
+        target_activities.insert(_index(target_activities, to_index, allow_end=True), activity)
+    elif name == "swap_days":
+        other = _resolve_day(plan, op.get("to_day"))
+        if other is not day:
+            dates = day.get("date"), other.get("date")
+            day_contents, other_contents = dict(day), dict(other)
+            day.clear()
+            other.clear()
+            day.update(other_contents)
+            other.update(day_contents)
+            day["date"], other["date"] = dates
+    elif name == "replace_day":
+        if not isinstance(op.get("activities"), list):
+            raise PatchError("replace_day needs an 'activities' list.")
+        day["activities"] = op["activities"]
+
+
+def _pointer(path: Any) -> List[str]:
+    if not isinstance(path, str) or (path and not path.startswith("/")):
+        raise PatchError(f"Invalid JSON pointer {path!r}.")
+    return [part.replace("~1", "/").replace("~0", "~") for part in path.split("/")[1:]]
+
+
+def _walk(doc: Any, parts: List[str]) -> Tuple[Any, str]:
+    """Returns (parent container, last key) for a pointer."""
+    if not parts:
+        raise PatchError("Patching the document root is not supported.")
+    node = doc
+    for part in parts[:-1]:
+        node = _child(node, part)
+    return node, parts[-1]
+
+
+def _child(node: Any, key: str) -> Any:
+    try:
+        if isinstance(node, list):
+            return node[int(key)]
+        return node[key]
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise PatchError(f"Path segment '{key}' not found.")
+
+
+def _list_index(container: List[Any], key: str, allow_end: bool) -> int:
+    if key == "-" and allow_end:
+        return len(container)
+    if not key.isdigit():
+        raise PatchError(f"Invalid list index '{key}'.")
+    return _index(container, int(key), allow_end)
+
+
+def _add(doc: Any, path: str, value: Any) -> None:
+    parent, key = _walk(doc, _pointer(path))
+    if isinstance(parent, list):
+        parent.insert(_list_index(parent, key, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise PatchError(f"Cannot add into {type(parent).__name__} at {path}.")
+
+
+def _remove(doc: Any, path: str) -> Any:
+    parent, key = _walk(doc, _pointer(path))
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, key, allow_end=False))
+    if isinstance(parent, dict) and key in parent:
+        return parent.pop(key)
+    raise PatchError(f"Nothing to remove at {path}.")
+
+
+def _apply_json_patch_op(doc: Dict[str, Any], op: Dict[str, Any]) -> None:
+    name, path = op["op"], op.get("path")
+    if name in ("add", "replace", "test") and "value" not in op:
+        raise PatchError(f"'{name}' needs a 'value'.")
+    if name == "add":
+        _add(doc, path, copy.deepcopy(op["value"]))
+    elif name == "remove":
+        _remove(doc, path)
+    elif name == "replace":
+        _remove(doc, path)
+        _add(doc, path, copy.deepcopy(op["value"]))
+    elif name in ("move", "copy"):
+        source = op.get("from")
+        parent, key = _walk(doc, _pointer(source))
+        value = _child(parent, key)
+        if name == "move":
+            _remove(doc, source)
+        _add(doc, path, copy.deepcopy(value))
+    elif name == "test":
+        parent, key = _walk(doc, _pointer(path))
+        if _child(parent, key) != op["value"]:
+            raise PatchError(f"Test failed at {path}.")
+
+
+def apply_patch(plan: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Applies patch ops to a copy of `plan` and returns it; raises PatchError on the first failing op."""
+    if not isinstance(plan, dict) or "itinerary" not in plan:
+        raise PatchError("There is no current plan to patch.")
+    if not isinstance(ops, list) or not ops:
+        raise PatchError("plan_patch must be a non-empty list of ops.")
+    patched = copy.deepcopy(plan)
+    for i, op in enumerate(ops):
+        try:
+            if not isinstance(op, dict) or "op" not in op:
+                raise PatchError("Each op needs an 'op' field.")
+            if op["op"] in _ACTIVITY_OPS:
+                _apply_activity_op(patched, op)
+            elif op["op"] in _JSON_PATCH_OPS:
+                _apply_json_patch_op(patched, op)
+            else:
+                raise PatchError(f"Unknown op '{op['op']}'.")
+        except PatchError as e:
+            raise PatchError(f"Op {i} ({op.get('op') if isinstance(op, dict) else op!r}): {e}")
+    return patched
+
+
+PATCH_INSTRUCTION = """
+**Revising an existing plan:** The current itinerary is shown below. For local changes (swapping or moving activities or days, adding, removing or editing a few activities), do NOT repeat the whole itinerary. Output only a JSON object `{"plan_patch": [ops]}` where `day` is the 1-based day number and `index` the 0-based activity position in the current itinerary:
+`{"op": "replace_activity", "day": 1, "index": 2, "activity": {...}}`, `{"op": "update_activity", "day": 1, "index": 2, "fields": {...}}`, `{"op": "insert_activity", "day": 1, "index": 0, "activity": {...}}`, `{"op": "remove_activity", "day": 1, "index": 2}`, `{"op": "move_activity", "day": 1, "index": 2, "to_day": 3, "to_index": 0}`, `{"op": "swap_days", "day": 2, "to_day": 3}`, `{"op": "replace_day", "day": 2, "activities": [...]}`.
+Ops apply in order, each to the result of the previous one. New activities need all the usual fields. Output the full itinerary instead when most of the plan changes.
+"""
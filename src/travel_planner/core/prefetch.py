@@ -0,0 +1,122 @@
+"""
+Speculative prefetch of tool data for the travel planning system.
+
+As soon as the trip city and dates (or interests) are known, the geocode, weather
+and places caches are warmed in a background thread pool, so the first
+plan-generation turn finds its tool results already cached. Prefetching never
+blocks the caller; its cost is bounded per trip and by the size of the pending queue.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+from ..config.settings import (
+    PREFETCH_ENABLED,
+    PREFETCH_MAX_WORKERS,
+    PREFETCH_MAX_PLACE_QUERIES,
+    PREFETCH_MAX_PENDING,
+    OWM_DAILY_FORECAST_DAYS,
+    WEATHER_API_KEY,
+    WEATHER_CACHE_TTL_S,
+    PLACES_CACHE_TTL_S,
+    logging
+)
+from ..utils.cache import TTLCache
+from ..utils.metrics import metrics
+from ..utils.clients import gmaps_active
+from ..utils.tools import geocode_location, fetch_daily_forecast, forecast_today, build_places_query, search_places
+from .slots import normalize_city, slots_cache_key
+
+
+def in_forecast_window(start_date_str: str, end_date_str: str) -> bool:
+    """True if any trip day falls inside the daily forecast window."""
+    try:
+        start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date_str or start_date_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return False
+    today = forecast_today()
+    return start <= today + timedelta(days=OWM_DAILY_FORECAST_DAYS - 1) and end >= today
+
+
+def planned_place_queries(city: str, interests: List[str], limit: int = PREFETCH_MAX_PLACE_QUERIES) -> List[str]:
+    """The Places queries the planner is most likely to issue: all interests combined, then each one."""
+    queries = [build_places_query(city, interests)]
+    if len(interests) > 1:
+        queries.extend(build_places_query(city, [interest]) for interest in interests)
+    return list(dict.fromkeys(q for q in queries if q))[:limit]
+
+
+class Prefetcher:
+    """Warms tool caches in the background for trips whose slots are known."""
+
+    def __init__(self, max_workers: int = PREFETCH_MAX_WORKERS, max_pending: int = PREFETCH_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Remembers which (trip, part) combinations were already prefetched, for as long as the data stays cached
+        self._done = TTLCache("prefetch_done", PLACES_CACHE_TTL_S, 4096)
+
+    def _submit(self, fn, *args) -> bool:
+        """Submits a task unless the pending queue is full."""
+        with self._lock:
+            if self._pending >= self._max_pending:
+                metrics.incr("prefetch.dropped")
+                return False
+            self._pending += 1
+
+        def run():
+            try:
+                with metrics.timer("prefetch.task_s"):
+                    fn(*args)
+                metrics.incr("prefetch.completed")
+            except Exception as e:
+                metrics.incr("prefetch.failed")
+                logging.warning(f"Prefetch task failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        self._executor.submit(run)
+        metrics.incr("prefetch.submitted")
+        return True
+
+    @staticmethod
+    def _warm_weather(city: str) -> None:
+        coords = geocode_location(city)
+        if coords:
+            fetch_daily_forecast(coords['lat'], coords['lng'])
+
+    def prefetch_trip(self, slots: Dict[str, Any]) -> int:
+        """Schedules cache warming for the given trip slots. Returns the number of tasks submitted."""
+        city = slots.get("target_city")
+        if not city or not gmaps_active:
+            return 0
+
+        submitted = 0
+        start, end = slots.get("start_date_str"), slots.get("end_date_str")
+        weather_key = ("weather", normalize_city(city))
+        if (start and WEATHER_API_KEY and in_forecast_window(start, end)
+                and weather_key not in self._done):
+            self._done.set(weather_key, True, ttl=WEATHER_CACHE_TTL_S)
+            submitted += self._submit(self._warm_weather, city)
+
+        interests = slots.get("interests") or []
+        if interests:
+            places_key = ("places", slots_cache_key(slots, ("target_city", "interests")))
+            if places_key not in self._done:
+                self._done.set(places_key, True)
+                for query in planned_place_queries(city, interests):
+                    submitted += self._submit(search_places, query)
+
+        if submitted:
+            logging.info(f"Prefetch: scheduled {submitted} warm-up tasks for {city}.")
+        return submitted
+
+
+# Process-wide prefetcher shared by all sessions
+prefetcher = Prefetcher() if PREFETCH_ENABLED else None
+
@@ -0,0 +1,121 @@
+"""
+Token-budgeted projection of tool outputs before they reach the LLM.
+
+Raw tool outputs are verbose (full `types` arrays, business status, 15
+places with unrounded coordinates) and are resent to Gemini on every later
+call in the conversation. Each tool result is instead rendered in a compact
+form that fits a per-tool token budget:
+
+- short keys, coordinates rounded to ~10 m,
+- places ranked by rating weighted by review count, keeping the top k that fit,
+- a `ref` pointing at the full payload in utils/result_store.py.
+"""
+
+import json
+import math
+from typing import Any, Dict, List
+
+from ..config.settings import (
+    TOOL_OUTPUT_TOKEN_BUDGETS,
+    TOOL_OUTPUT_DEFAULT_BUDGET,
+    PLACES_PROJECTION_TOP_K
+)
+from ..utils.result_store import put_result
+
+_COORD_DIGITS = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _round(value: Any) -> Any:
+    return round(value, _COORD_DIGITS) if isinstance(value, float) else value
+
+
+def place_relevance(place: Dict[str, Any]) -> float:
+    """Rating weighted by (log) review count; unrated places rank last."""
+    rating = place.get("rating") or 0
+    return rating * math.log10(1 + (place.get("user_ratings_total") or 0))
+
+
+def _project_places(places: List[Dict[str, Any]], ref: str, budget: int) -> str:
+    if any("error" in p for p in places):
+        return _dumps(places)
+
+    ranked = sorted(
+        ((i, p) for i, p in enumerate(places) if p.get("status") != "CLOSED_PERMANENTLY"),
+        key=lambda item: place_relevance(item[1]), reverse=True
+    )[:PLACES_PROJECTION_TOP_K]
+
+    def render(items, with_address=True):
+        compact = []
+        for index, place in items:
+            entry = {"i": index, "n": place.get("name"), "lat": _round(place.get("latitude")),
+                     "lon": _round(place.get("longitude")), "r": place.get("rating"), "p": place.get("price_level_str")}
+            if with_address:
+                entry["a"] = place.get("address")
+            if place.get("status") and place.get("status") != "OPERATIONAL":
+                entry["s"] = place["status"]
+            compact.append(entry)
+        return _dumps({"ref": ref, "total": len(places), "places": compact})
+
+    # Shrink k first; drop addresses only if even a handful of places does not fit
+    for with_address in (True, False):
+        for k in range(len(ranked), 0, -1):
+            text = render(ranked[:k], with_address)
+            if estimate_text_tokens(text) <= budget or (k <= 3 and not with_address):
+                return text
+            if k <= 3:
+                break
+    return render(ranked[:1], False)
+
+
+def _project_weather(weather: Dict[str, Any], ref: str, budget: int) -> str:
+    if "error" in weather:
+        return _dumps(weather)
+    compact = {"ref": ref, "d": weather.get("date"), "hi": weather.get("temp_high_c"), "lo": weather.get("temp_low_c"),
+               "c": weather.get("conditions_desc") or weather.get("conditions_main"),
+               "pop": weather.get("precip_prob_percent")}
+    for key in ("is_climatology", "source"):
+        if key in weather:
+            compact[key] = weather[key]
+    summary = weather.get("summary")
+    if summary and estimate_text_tokens(_dumps(compact)) + estimate_text_tokens(summary) <= budget:
+        compact["sum"] = summary
+    return _dumps(compact)
+
+
+def _project_travel(travel: Dict[str, Any], ref: str, budget: int) -> str:
+    if "error" in travel or travel.get("duration_seconds") is None:
+        return _dumps(travel)
+    compact = {"ref": ref, "min": round(travel["duration_seconds"] / 60), "km": round((travel.get("distance_meters") or 0) / 1000, 1),
+               "mode": travel.get("mode")}
+    if travel.get("status") not in (None, "OK"):
+        compact["st"] = travel["status"]
+    return _dumps(compact)
+
+
+_PROJECTORS = {
+    "find_places_nearby": _project_places,
+    "get_weather_forecast": _project_weather,
+    "get_travel_info": _project_travel,
+}
+
+
+def project_tool_output(tool_name: str, output: Any) -> str:
+    """
+    Renders a tool output for the LLM within the tool's token budget. The full
+    payload is kept in the result store; the rendering carries its `ref`.
+    """
+    budget = TOOL_OUTPUT_TOKEN_BUDGETS.get(tool_name, TOOL_OUTPUT_DEFAULT_BUDGET)
+    projector = _PROJECTORS.get(tool_name)
+    if projector is None:
+        return json.dumps(output)
+    ref = put_result(tool_name, output)
+    return projector(output, ref, budget)
@@ -0,0 +1,86 @@
+"""
+Response cache for planner turns.
+
+Many sessions open with nearly the same request. The final planner response
+of a turn (a plan or a clarifying question) is cached under a key made of
+
+- the normalized trip slots (see core/slots.py),
+- a hash of the normalized user-message prefix: lowercased, punctuation and
+  filler words dropped, word order ignored, so trivially different phrasings
+  of the same request match,
+- a hash of the current plan, since revisions depend on it, and
+- today's UTC date, the day the weather tool's forecast starts from, when the
+  trip overlaps the daily forecast window, so plans built on forecasts expire
+  as soon as the window moves.
+
+On a hit, the planner node returns the cached message without calling the
+model or any tool, and the usual parse/validate path runs on it.
+"""
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, Optional
+
+from ..config.settings import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_TTL_S,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    logging
+)
+from ..utils.cache import TTLCache
+from ..utils.metrics import metrics
+from ..utils.tools import forecast_today
+from .prefetch import in_forecast_window
+from .slots import get_trip_slots, slots_cache_key, user_texts
+
+_FILLER_WORDS = {
+    "a", "an", "the", "i", "i'd", "id", "im", "i'm", "we", "we'd", "me", "us", "my", "our", "please", "pls",
+    "hi", "hello", "hey", "would", "like", "want", "to", "can", "could", "you", "for", "and", "with", "of",
+    "plan", "trip", "some", "from", "in", "on", "at", "thanks", "thank", "just", "really", "also", "love",
+}
+_WORD_RE = re.compile(r"[\w'-]+")
+
+_responses = TTLCache("responses", RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def normalize_request(text: str) -> str:
+    """Order- and filler-insensitive form of a user message."""
+    words = {w.strip("'-") for w in _WORD_RE.findall(text.lower())}
+    return " ".join(sorted(w for w in words if w and w not in _FILLER_WORDS))
+
+
+def response_cache_key(state: Dict[str, Any]) -> str:
+    """Cache key for the planner response to the conversation in `state`."""
+    slots = get_trip_slots(state)
+    prefix = [normalize_request(text) for text in user_texts(state.get("messages", []))]
+    plan = state.get("current_plan")
+    weather_day = forecast_today().isoformat() if in_forecast_window(slots.get("start_date_str"), slots.get("end_date_str")) else ""
+    blob = json.dumps({
+        "slots": slots_cache_key(slots),
+        "prefix": prefix,
+        "plan": hashlib.sha1(json.dumps(plan, sort_keys=True).encode("utf-8")).hexdigest() if plan else None,
+        "weather_day": weather_day,
+    }, sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def lookup_response(key: str) -> Optional[Dict[str, Any]]:
+    """Cached {"content", "elapsed_s"} for a key; records the latency it saves."""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    entry = _responses.get(key)
+    if entry is not None:
+        metrics.observe("response_cache.latency_saved_s", entry["elapsed_s"])
+        logging.info(f"Response cache hit; skipping a planner turn that took {entry['elapsed_s']:.1f}s.")
+    return entry
+
+
+def store_response(key: str, content: Any, elapsed_s: float) -> None:
+    """Caches a turn's final planner response."""
+    if RESPONSE_CACHE_ENABLED:
+        _responses.set(key, {"content": content, "elapsed_s": elapsed_s})
+
+
+def clear_responses() -> None:
+    _responses.clear()
@@ -0,0 +1,394 @@
+"""Trip-slot extraction for the travel planning system.
+
+Pulls the core trip details (city, dates, interests, budget, pace, travel mode)
+out of the conversation so they can live in state instead of being re-read from
+the raw history every turn. Cheap regex rules run first; an optional LLM
+fallback only fires when the rules leave core slots empty.
+
+Follow-up messages mostly talk about places within the trip ("add lunch at Le
+Comptoir", "go to Montmartre in the afternoon"), so once the city or dates are
+known they only change when the user explicitly changes the trip ("change the
+trip to Lyon", "let's do Rome instead") or restate it in full ("3 days in
+Paris from 2026-11-02 to 2026-11-04"). A city is only read after trip wording,
+never after a bare "in" ("museums in Europe", "a walk in Central Park"). Clauses
+with a negation ("no bars", "I don't like museums") never add preferences;
+negated interests are removed.
+"""
+
+import re
+import json
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from ..config.settings import logging
+
+TRIP_SLOT_KEYS = (
+    "target_city",
+    "start_date_str",
+    "end_date_str",
+    "interests",
+    "budget_preference",
+    "pace",
+    "travel_mode",
+)
+
+# Slots the planner cannot start without; the LLM fallback only runs when one is missing.
+CORE_SLOT_KEYS = ("target_city", "start_date_str", "end_date_str")
+
+_MONTHS = ("january", "february", "march", "april", "may", "june", "july", "august",
+           "september", "october", "november", "december")
+_NON_CITY_WORDS = set(_MONTHS) | {
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "i", "the", "a", "an", "my", "our", "day", "days", "week", "weeks", "spring",
+    "summer", "autumn", "fall", "winter", "public", "museums", "cafes",
+}
+
+# Names of places within a city, never a destination ("Hotel Lutetia", "Central Park")
+_VENUE_WORDS = {
+    "hotel", "hostel", "park", "garden", "gardens", "museum", "gallery", "restaurant", "cafe", "café", "bar",
+    "street", "st", "avenue", "square", "station", "airport", "market", "church", "cathedral", "palace", "tower",
+    "bridge", "beach", "castle", "europe", "asia", "africa", "america", "oceania",
+}
+
+_CITY_NAME = r"((?:[A-Z][\w'.-]*)(?:\s+(?:[A-Z][\w'.-]*|de|del|la|le|am|upon|on)){0,3})"
+# A city follows trip wording ("trip to", "3 days in", "visiting"), not just any "in/at/to X"
+_CITY_PATTERN = re.compile(
+    r"\b(?:(?:trip|travel(?:l?ing)?|vacation|holiday|getaway|weekend|break|stay(?:ing)?|days?|nights?|weeks?"
+    r"|itinerary|fly(?:ing)?|go(?:ing)?|head(?:ing)?|destination|city|plan(?:ning)?)\s+(?:to|in)|visit(?:ing)?)\s+"
+    + _CITY_NAME
+)
+# A whole trip stated at once ("3 days in Paris", "a trip to Rome"); together with dates it replaces known core slots
+_TRIP_STATEMENT_PATTERN = re.compile(
+    r"\b(?:\d{1,2}[\s-]*(?:days?|nights?|weeks?)|trip|vacation|holiday|getaway|weekend)\s+(?:to|in)\s+" + _CITY_NAME
+)
+# "let's do Rome instead", "how about Lisbon instead"
+_CITY_INSTEAD_PATTERN = re.compile(r"\b(?:do|try|about|pick|choose|with)\s+" + _CITY_NAME + r"\s+instead\b")
+# An explicit change of destination or dates; without one, known core slots are kept
+_TRIP_CHANGE_PATTERN = re.compile(
+    r"\b(?:change|switch|move|shift|reschedule|swap)\b[^.!?]{0,30}?\b(?:trip|destination|city|dates?|travel)\b"
+    r"|\binstead\b|\brather than\b",
+    re.IGNORECASE,
+)
+# A negation applies to the rest of its clause
+_NEGATION_PATTERN = re.compile(
+    r"\b(?:no|not|never|without|avoid|skip|hate|dislike|exclude|remove|drop|fewer|less)\b|n't\b",
+    re.IGNORECASE,
+)
+_CLAUSE_BOUNDARY_PATTERN = re.compile(
+    r"[.,;:!?\n]|\b(?:but|however|instead|and (?=add|include|more|want|like|love|prefer|please|make))\b",
+    re.IGNORECASE,
+)
+_CITY_LABEL_PATTERN = re.compile(r"\b(?:city|destination)\s*[:=]\s*([^\n,.;]+)", re.IGNORECASE)
+_ISO_DATE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_DURATION_PATTERN = re.compile(r"\b(\d{1,2})[\s-]*(?:day|days|night|nights)\b", re.IGNORECASE)
+
+_INTEREST_KEYWORDS = {
+    "museums": r"museums?",
+    "art": r"art|galleries|gallery",
+    "cafes": r"caf[eé]s?|coffee",
+    "food": r"food|restaurants?|cuisine|eats|dining|foodie",
+    "history": r"history|historic(?:al)?|heritage",
+    "architecture": r"architecture|cathedrals?|churches",
+    "nature": r"nature|parks?|gardens?|hiking|outdoors?",
+    "beaches": r"beach(?:es)?",
+    "nightlife": r"nightlife|bars?|clubs?",
+    "shopping": r"shopping|markets?|boutiques?",
+    "music": r"music|concerts?|jazz|opera",
+}
+_INTEREST_PATTERNS = {
+    interest: re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE)
+    for interest, pattern in _INTEREST_KEYWORDS.items()
+}
+
+_BUDGET_PATTERNS = (
+    ("budget", re.compile(r"\b(?:cheap|low[\s-]cost|backpack(?:er|ing)?|shoestring|budget[\s-]friendly|on a budget|tight budget|low budget)\b", re.IGNORECASE)),
+    ("mid-range", re.compile(r"\b(?:mid[\s-]?range|moderate budget|medium budget|mid budget)\b", re.IGNORECASE)),
+    ("luxury", re.compile(r"\b(?:luxury|luxurious|high[\s-]end|splurge|upscale|premium)\b", re.IGNORECASE)),
+)
+_PACE_PATTERNS = (
+    ("relaxed", re.compile(r"\b(?:relaxed|leisurely|slow|easy[\s-]going|laid[\s-]back)(?:\s+pace)?\b", re.IGNORECASE)),
+    ("moderate", re.compile(r"\b(?:moderate|balanced|medium)\s+pace\b|\bpace\s*[:=]?\s*moderate\b", re.IGNORECASE)),
+    ("fast", re.compile(r"\b(?:fast|packed|busy|intense|action[\s-]packed)(?:\s+pace)?\b", re.IGNORECASE)),
+)
+# Values match the Google Directions `mode` parameter used by `get_travel_info`.
+_TRAVEL_MODE_PATTERNS = (
+    ("transit", re.compile(r"\b(?:public transport(?:ation)?|transit|metro|subway|underground|bus(?:es)?|trams?|trains?)\b", re.IGNORECASE)),
+    ("walking", re.compile(r"\b(?:walk|walking|on foot)\b", re.IGNORECASE)),
+    ("bicycling", re.compile(r"\b(?:bike|biking|bicycle|bicycling|cycling)\b", re.IGNORECASE)),
+    ("driving", re.compile(r"\b(?:drive|driving|car|rental car)\b", re.IGNORECASE)),
+)
+
+SLOT_EXTRACTION_PROMPT = """Extract the trip details from the user's message. Return ONLY a JSON object with these keys,
+using null for anything the message does not state:
+{"target_city": string, "start_date_str": "YYYY-MM-DD", "end_date_str": "YYYY-MM-DD", "interests": [string],
+ "budget_preference": "budget" | "mid-range" | "luxury", "pace": "relaxed" | "moderate" | "fast",
+ "travel_mode": "transit" | "walking" | "bicycling" | "driving"}"""
+
+
+def _valid_date(value: str) -> Optional[str]:
+    """Returns the date string if it parses as YYYY-MM-DD."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return value
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_match(patterns, text: str) -> Optional[str]:
+    """Returns the label of the first pattern that matches the text."""
+    for label, pattern in patterns:
+        if pattern.search(text):
+            return label
+    return None
+
+
+def _city_words(candidate: str) -> Optional[str]:
+    words = candidate.split()
+    while words and words[-1].lower() in _NON_CITY_WORDS | {"de", "del", "la", "le", "am", "upon", "on"}:
+        words.pop()
+    if any(word.lower().strip(".,;:!?") in _VENUE_WORDS for word in words):
+        return None
+    if words and words[0].lower() not in _NON_CITY_WORDS:
+        return " ".join(words).strip(".,;:!?")
+    return None
+
+
+def _extract_city(text: str) -> Optional[str]:
+    """Finds a capitalized place name following trip wording ('trip to', 'days in', 'visit', ...)."""
+    labelled = _CITY_LABEL_PATTERN.search(text)
+    if labelled:
+        return labelled.group(1).strip()
+    for pattern in (_CITY_INSTEAD_PATTERN, _TRIP_STATEMENT_PATTERN, _CITY_PATTERN):
+        for match in pattern.finditer(text):
+            city = _city_words(match.group(1))
+            if city:
+                return city
+    return None
+
+
+def _split_negated(text: str):
+    """Splits a message into (affirmative text, negated text); a negation covers the rest of its clause."""
+    affirmative, negated = [], []
+    start = 0
+    boundaries = [m.start() for m in _CLAUSE_BOUNDARY_PATTERN.finditer(text)] + [len(text)]
+    for end in boundaries:
+        clause = text[start:end]
+        negation = _NEGATION_PATTERN.search(clause)
+        if negation:
+            affirmative.append(clause[:negation.start()])
+            negated.append(clause[negation.start():])
+        else:
+            affirmative.append(clause)
+        start = end
+    return " ".join(affirmative), " ".join(negated)
+
+
+def requests_trip_change(text: str) -> bool:
+    """True if the message explicitly changes the destination or dates."""
+    return bool(text and _TRIP_CHANGE_PATTERN.search(text))
+
+
+def states_trip(text: str) -> bool:
+    """True if the message states a whole trip: a city after strong trip wording plus dates."""
+    if not text or not _ISO_DATE_PATTERN.search(text):
+        return False
+    affirmative, _ = _split_negated(text)
+    return any(_city_words(m.group(1)) for m in _TRIP_STATEMENT_PATTERN.finditer(affirmative))
+
+
+def negated_interests(text: str) -> List[str]:
+    """Interests the message rules out ("no bars", "I don't like museums")."""
+    _, negated = _split_negated(text or "")
+    return [interest for interest, pattern in _INTEREST_PATTERNS.items() if pattern.search(negated)]
+
+
+def extract_slots_with_rules(text: str) -> Dict[str, Any]:
+    """Extracts whatever trip slots the regex rules can find in a single message (ignoring negated clauses)."""
+    slots: Dict[str, Any] = {}
+    if not text:
+        return slots
+    affirmative, _ = _split_negated(text)
+
+    city = _extract_city(affirmative)
+    if city:
+        slots["target_city"] = city
+
+    dates = [d for d in _ISO_DATE_PATTERN.findall(text) if _valid_date(d)]
+    if dates:
+        slots["start_date_str"] = dates[0]
+        if len(dates) > 1:
+            slots["end_date_str"] = dates[1]
+        else:
+            duration = _DURATION_PATTERN.search(text)
+            if duration and int(duration.group(1)) > 0:
+                start = datetime.strptime(dates[0], "%Y-%m-%d")
+                slots["end_date_str"] = (start + timedelta(days=int(duration.group(1)) - 1)).strftime("%Y-%m-%d")
+
+    interests = [interest for interest, pattern in _INTEREST_PATTERNS.items() if pattern.search(affirmative)]
+    if interests:
+        slots["interests"] = interests
+
+    budget = _first_match(_BUDGET_PATTERNS, affirmative)
+    if budget:
+        slots["budget_preference"] = budget
+    pace = _first_match(_PACE_PATTERNS, affirmative)
+    if pace:
+        slots["pace"] = pace
+    travel_mode = _first_match(_TRAVEL_MODE_PATTERNS, affirmative)
+    if travel_mode:
+        slots["travel_mode"] = travel_mode
+    return slots
+
+
+def extract_slots_with_llm(slot_llm: Any, text: str) -> Dict[str, Any]:
+    """Asks a small model to fill slots the rules missed. Returns only well-formed values."""
+    if slot_llm is None or not text:
+        return {}
+    try:
+        response = slot_llm.invoke([SystemMessage(content=SLOT_EXTRACTION_PROMPT), HumanMessage(content=text)])
+        content = response.content if isinstance(response.content, str) else " ".join(
+            item for item in response.content if isinstance(item, str))
+        start_index, end_index = content.find('{'), content.rfind('}')
+        if start_index == -1 or end_index <= start_index:
+            return {}
+        raw = json.loads(content[start_index:end_index + 1])
+    except Exception as e:
+        logging.warning(f"LLM slot extraction failed: {e}")
+        return {}
+
+    slots: Dict[str, Any] = {}
+    if isinstance(raw.get("target_city"), str) and raw["target_city"].strip():
+        slots["target_city"] = raw["target_city"].strip()
+    for key in ("start_date_str", "end_date_str"):
+        if isinstance(raw.get(key), str) and _valid_date(raw[key]):
+            slots[key] = raw[key]
+    if isinstance(raw.get("interests"), list):
+        interests = [str(i).strip().lower() for i in raw["interests"] if str(i).strip()]
+        if interests:
+            slots["interests"] = interests
+    allowed = {
+        "budget_preference": ("budget", "mid-range", "luxury"),
+        "pace": ("relaxed", "moderate", "fast"),
+        "travel_mode": ("transit", "walking", "bicycling", "driving"),
+    }
+    for key, values in allowed.items():
+        if raw.get(key) in values:
+            slots[key] = raw[key]
+    return slots
+
+
+def merge_slots(existing: Dict[str, Any], update: Dict[str, Any], change_core: bool = False,
+                removed_interests: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Merges newly extracted slots into existing ones. Core slots that are already
+    known are only replaced with `change_core` (an explicit change of trip); other
+    slots take the latest value. Interests accumulate, minus `removed_interests`.
+    """
+    merged = dict(existing)
+    if removed_interests and merged.get("interests"):
+        merged["interests"] = [i for i in merged["interests"] if i not in set(removed_interests)]
+    old_start, old_end = existing.get("start_date_str"), existing.get("end_date_str")
+    for key, value in update.items():
+        if value in (None, "", []):
+            continue
+        if key in CORE_SLOT_KEYS and merged.get(key) and not change_core:
+            continue
+        if key == "interests" and merged.get("interests"):
+            merged["interests"] = list(dict.fromkeys(list(merged["interests"]) + list(value)))
+        else:
+            merged[key] = value
+    # A new start date without an end date keeps the trip length
+    if change_core and "start_date_str" in update and "end_date_str" not in update and old_start and old_end:
+        length = datetime.strptime(old_end, "%Y-%m-%d") - datetime.strptime(old_start, "%Y-%m-%d")
+        merged["end_date_str"] = (datetime.strptime(update["start_date_str"], "%Y-%m-%d") + length).strftime("%Y-%m-%d")
+    return merged
+
+
+def apply_user_message(slots: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Folds one user message into the known slots using the rules."""
+    return merge_slots(slots, extract_slots_with_rules(text), change_core=requests_trip_change(text) or states_trip(text),
+                       removed_interests=negated_interests(text))
+
+
+def _message_text(message: BaseMessage) -> str:
+    """Flattens message content into plain text."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(item if isinstance(item, str) else str(item.get("text", ""))
+                        for item in content if isinstance(item, (str, dict)))
+    return ""
+
+
+def user_texts(messages: Sequence[BaseMessage]) -> List[str]:
+    """Returns the text of every real user message (automated feedback messages carry a name)."""
+    return [_message_text(m) for m in messages if isinstance(m, HumanMessage) and not m.name]
+
+
+def get_trip_slots(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the populated trip slots from a state dict."""
+    return {key: state.get(key) for key in TRIP_SLOT_KEYS if state.get(key) not in (None, "", [])}
+
+
+def missing_core_slots(slots: Dict[str, Any]) -> List[str]:
+    """Lists the core slots still missing."""
+    return [key for key in CORE_SLOT_KEYS if not slots.get(key)]
+
+
+def trip_days(slots: Dict[str, Any]) -> List[str]:
+    """Expands the slot date range into a list of YYYY-MM-DD strings."""
+    start, end = slots.get("start_date_str"), slots.get("end_date_str")
+    if not (start and end):
+        return [start] if start else []
+    start_date = datetime.strptime(start, "%Y-%m-%d").date()
+    end_date = datetime.strptime(end, "%Y-%m-%d").date()
+    if end_date < start_date:
+        return [start]
+    return [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end_date - start_date).days + 1)]
+
+
+def normalize_city(city: Optional[str]) -> str:
+    """Normalizes a city name for use in cache keys."""
+    return re.sub(r"\s+", " ", (city or "").strip().lower())
+
+
+def slots_cache_key(slots: Dict[str, Any], keys: Sequence[str] = TRIP_SLOT_KEYS) -> str:
+    """Stable hash of the given slots, for caches keyed by trip parameters."""
+    normalized = {}
+    for key in keys:
+        value = slots.get(key)
+        if key == "target_city":
+            value = normalize_city(value)
+        elif key == "interests" and value:
+            value = sorted({str(i).strip().lower() for i in value})
+        normalized[key] = value
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def format_slot_summary(slots: Dict[str, Any]) -> str:
+    """Renders the known slots as a compact block for the planner prompt."""
+    if not slots:
+        return ""
+    labels = {
+        "target_city": "City",
+        "start_date_str": "Start date",
+        "end_date_str": "End date",
+        "interests": "Interests",
+        "budget_preference": "Budget",
+        "pace": "Pace",
+        "travel_mode": "Travel mode",
+    }
+    lines = []
+    for key in TRIP_SLOT_KEYS:
+        if key in slots:
+            value = slots[key]
+            lines.append(f"- {labels[key]}: {', '.join(value) if isinstance(value, list) else value}")
+    missing = [labels[key] for key in TRIP_SLOT_KEYS if key not in slots]
+    summary = "**Known trip details (extracted from the conversation):**\n" + "\n".join(lines)
+    if missing:
+        summary += f"\n- Still unknown: {', '.join(missing)}"
+    return summary
@@ -4,6 +4,12 @@ from typing import TypedDict, Annotated, Sequence, Optional, Dict, Any, List
 import operator
 from langchain_core.messages import BaseMessage
 
+def merge_leg_plans(current: Optional[List[Dict[str, Any]]], update: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Collects leg results from parallel leg planners; a None update clears them."""
+    if update is None:
+        return []
+    return list(current or []) + list(update)
+
 class InteractivePlanState(TypedDict):
     """State definition for the interactive travel planning system."""
     # Primary driver: the conversation history
@@ -15,11 +21,33 @@ class InteractivePlanState(TypedDict):
     # Error tracking for the current turn
     error_message: Optional[str]
 
-    # User preferences extracted from conversation (for future use)
-    # target_city: Optional[str]
-    # start_date_str: Optional[str]
-    # end_date_str: Optional[str]
-    # interests: Optional[List[str]]
-    # budget_preference: Optional[str]
-    # pace: Optional[str]
-    # travel_mode: Optional[str]
+    # Trip slots extracted from the conversation (see core/slots.py)
+    target_city: Optional[str]
+    start_date_str: Optional[str]
+    end_date_str: Optional[str]
+    interests: Optional[List[str]]
+    budget_preference: Optional[str]
+    pace: Optional[str]
+    travel_mode: Optional[str]
+
+    # Per-turn latency budget (see core/budget.py); reset at the start of every turn
+    turn_started_at: Optional[float]
+    turn_deadline: Optional[float]
+    tool_rounds: Optional[int]
+    # Planner input tokens this turn, and how many of them were read from the context cache
+    turn_input_tokens: Optional[int]
+    turn_cached_input_tokens: Optional[int]
+
+    # Plan validation (see core/validation.py); reset at the start of every turn.
+    # `validation_feedback_at` is the message index after a rejected plan, where the
+    # validator's feedback is shown to the planner until a revision is accepted.
+    plan_violations: Optional[List[Dict[str, Any]]]
+    validation_rounds: Optional[int]
+    validation_feedback_at: Optional[int]
+
+    # Response cache key of this turn's request (see core/response_cache.py); set on a cache miss
+    response_cache_key: Optional[str]
+
+    # Fan-out planning (see core/fanout.py); reset at the start of every turn
+    trip_legs: Optional[List[Dict[str, Any]]]
+    leg_plans: Annotated[List[Dict[str, Any]], merge_leg_plans]
@@ -0,0 +1,221 @@
+"""
+Local validation of parsed itineraries.
+
+Two passes, both cheap enough to run on every parsed plan:
+
+- a schema check compiled once at import time from a small declarative spec
+  (required fields, types, ranges, patterns), and
+- a feasibility check per day: activity time ranges must parse, must not
+  overlap, and the gap between consecutive activities must cover the
+  estimated travel time between them, and
+- a coverage check against the trip dates, when both are known: every day
+  from start to end appears exactly once and no other dates do.
+
+Every problem is reported as a machine-readable violation
+`{"code", "severity", "path", "message", ...}` that the graph feeds back to the
+planner (see parse_and_save_plan_node). Only "error" violations trigger a
+revision; "warning" violations are informational.
+"""
+
+import json
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config.settings import VALIDATION_TRANSFER_SLACK_MIN
+from ..utils.routing import estimate_travel_matrix, parse_time_range
+from .slots import trip_days
+
+Violation = Dict[str, Any]
+Check = Callable[[Any, str, List[Violation]], None]
+
+_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+ACTIVITY_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "required": ["name", "time", "description", "location", "address", "budget", "notes"],
+    "properties": {
+        "name": {"type": "string", "min_length": 1},
+        "time": {"type": "string", "min_length": 1},
+        "description": {"type": "string"},
+        "location": {
+            "type": "object",
+            "required": ["latitude", "longitude"],
+            "properties": {
+                "latitude": {"type": "number", "min": -90, "max": 90},
+                "longitude": {"type": "number", "min": -180, "max": 180},
+            },
+        },
+        "address": {"type": "string", "min_length": 1},
+        "budget": {"type": ("string", "number")},
+        "notes": {"type": "string"},
+    },
+}
+
+DAY_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "required": ["date", "activities"],
+    "properties": {
+        "date": {"type": "string", "pattern": _DATE_PATTERN},
+        "activities": {"type": "array", "items": ACTIVITY_SCHEMA},
+    },
+}
+
+_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "object": (dict,),
+    "array": (list,),
+}
+
+
+def _violation(code: str, path: str, message: str, severity: str = "error", **details: Any) -> Violation:
+    return {"code": code, "severity": severity, "path": path, "message": message, **details}
+
+
+def compile_schema(spec: Dict[str, Any]) -> Check:
+    """Turns a schema spec into a nested closure that appends violations for a value."""
+    type_names = spec.get("type")
+    type_names = (type_names,) if isinstance(type_names, str) else tuple(type_names or ())
+    allowed = tuple(t for name in type_names for t in _TYPES[name])
+    pattern = re.compile(spec["pattern"]) if "pattern" in spec else None
+    required = tuple(spec.get("required", ()))
+    properties = {key: compile_schema(sub) for key, sub in spec.get("properties", {}).items()}
+    items = compile_schema(spec["items"]) if "items" in spec else None
+    min_length, low, high = spec.get("min_length"), spec.get("min"), spec.get("max")
+
+    def check(value: Any, path: str, out: List[Violation]) -> None:
+        if allowed and (not isinstance(value, allowed) or isinstance(value, bool)):
+            out.append(_violation("wrong_type", path, f"Expected {'/'.join(type_names)}, got {type(value).__name__}."))
+            return
+        if min_length is not None and len(value) < min_length:
+            out.append(_violation("empty_value", path, "Value must not be empty."))
+        if pattern is not None and not pattern.match(value):
+            out.append(_violation("bad_format", path, f"Value '{value}' does not match {pattern.pattern}."))
+        if low is not None and value < low or high is not None and value > high:
+            out.append(_violation("out_of_range", path, f"Value {value} outside [{low}, {high}]."))
+        for key in required:
+            if key not in value or value[key] is None:
+                out.append(_violation("missing_field", f"{path}.{key}", f"Missing required field '{key}'."))
+        for key, sub_check in properties.items():
+            if value.get(key) is not None:
+                sub_check(value[key], f"{path}.{key}", out)
+        if items is not None:
+            for i, item in enumerate(value):
+                items(item, f"{path}[{i}]", out)
+
+    return check
+
+
+_check_day = compile_schema(DAY_SCHEMA)
+
+def _iter_days(itinerary: Any):
+    if isinstance(itinerary, dict):
+        for key, day in itinerary.items():
+            yield f"itinerary[{key!r}]", day
+    else:
+        for i, day in enumerate(itinerary):
+            yield f"itinerary[{i}]", day
+
+
+def _point(activity: Any) -> Optional[Tuple[float, float]]:
+    location = activity.get("location") if isinstance(activity, dict) else None
+    if isinstance(location, dict):
+        lat, lon = location.get("latitude"), location.get("longitude")
+        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+            return float(lat), float(lon)
+    return None
+
+
+def _check_feasibility(activities: List[Any], path: str, mode: str, out: List[Violation]) -> None:
+    previous = None  # (index, start, end, point)
+    for i, activity in enumerate(activities):
+        if not isinstance(activity, dict) or not isinstance(activity.get("time"), str):
+            continue
+        start, end = parse_time_range(activity["time"])
+        here = f"{path}.activities[{i}]"
+        if start is None:
+            out.append(_violation("unparseable_time", f"{here}.time", f"Cannot read a time from '{activity['time']}'.",
+                                  severity="warning"))
+            continue
+        if end is not None and end <= start:
+            out.append(_violation("invalid_time_range", f"{here}.time", f"End time is not after start time in '{activity['time']}'."))
+            end = None
+        if previous is not None:
+            prev_index, prev_start, prev_end, prev_point = previous
+            if start < prev_start:
+                out.append(_violation("out_of_order", f"{here}.time",
+                                      f"Starts before activity {prev_index} of the same day.", other=prev_index))
+            elif prev_end is not None and start < prev_end:
+                out.append(_violation("overlapping_activities", f"{here}.time",
+                                      f"Overlaps activity {prev_index} by {prev_end - start} min.",
+                                      other=prev_index, overlap_min=prev_end - start))
+            elif prev_end is not None and prev_point and _point(activity):
+                required = estimate_travel_matrix([prev_point, _point(activity)], mode)[0][1]
+                available = start - prev_end
+                if required > available + VALIDATION_TRANSFER_SLACK_MIN:
+                    out.append(_violation("infeasible_transfer", f"{here}.time",
+                                          f"Needs ~{required:.0f} min of {mode} travel from activity {prev_index} but only {available} min are free.",
+                                          other=prev_index, required_min=round(required), available_min=available))
+        previous = (i, start, end, _point(activity))
+
+
+def validate_plan(plan: Dict[str, Any], slots: Optional[Dict[str, Any]] = None) -> List[Violation]:
+    """All schema and feasibility violations of a parsed plan, in document order."""
+    slots = slots or {}
+    out: List[Violation] = []
+    itinerary = plan.get("itinerary") if isinstance(plan, dict) else None
+    if not isinstance(itinerary, (dict, list)) or not itinerary:
+        return [_violation("missing_itinerary", "itinerary", "Plan needs a non-empty 'itinerary' list or object.")]
+
+    mode = (slots.get("travel_mode") or "walking").lower()
+    try:
+        first = datetime.strptime(slots["start_date_str"], "%Y-%m-%d").date() if slots.get("start_date_str") else None
+        last = datetime.strptime(slots["end_date_str"], "%Y-%m-%d").date() if slots.get("end_date_str") else None
+    except ValueError:
+        first = last = None
+
+    seen: Dict[str, str] = {}  # date -> path of the first day with it
+    for path, day in _iter_days(itinerary):
+        _check_day(day, path, out)
+        if not isinstance(day, dict):
+            continue
+        if isinstance(day.get("date"), str) and first and last:
+            try:
+                date = datetime.strptime(day["date"], "%Y-%m-%d").date()
+                if not first <= date <= last:
+                    out.append(_violation("date_out_of_range", f"{path}.date",
+                                          f"{day['date']} is outside the trip ({first} to {last})."))
+                elif day["date"] in seen:
+                    out.append(_violation("duplicate_date", f"{path}.date",
+                                          f"{day['date']} already planned at {seen[day['date']]}."))
+                else:
+                    seen[day["date"]] = path
+            except ValueError:
+                pass  # already reported by the schema check
+        if isinstance(day.get("activities"), list):
+            if not day["activities"]:
+                out.append(_violation("empty_day", f"{path}.activities", "Day has no activities.", severity="warning"))
+            _check_feasibility(day["activities"], path, mode, out)
+    if first and last and first <= last:
+        missing = [date for date in trip_days(slots) if date not in seen]
+        if missing:
+            out.append(_violation("missing_dates", "itinerary", f"No plan for {', '.join(missing)}.", dates=missing))
+    return out
+
+
+def has_errors(violations: List[Violation]) -> bool:
+    return any(v["severity"] == "error" for v in violations)
+
+
+def format_feedback(violations: List[Violation], limit: int) -> str:
+    """Planner-facing feedback listing the errors of a rejected plan."""
+    errors = [v for v in violations if v["severity"] == "error"]
+    shown = errors[:limit]
+    more = f"\n(and {len(errors) - len(shown)} more)" if len(errors) > len(shown) else ""
+    return (
+        "The itinerary you just produced failed automatic validation. Fix every issue below "
+        "(use tools if you need coordinates or travel times) and output the complete corrected "
+        "JSON itinerary. Do not mention this check to the user.\n"
+        + "\n".join(json.dumps(v, ensure_ascii=False) for v in shown) + more
+    )
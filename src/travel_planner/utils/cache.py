@@ -0,0 +1,117 @@
+"""
+TTL caches for external API results.
+Each cache is bounded in size (LRU eviction) and in lifetime (per-entry TTL),
+and reports hits and misses to the shared metrics registry. With a shared
+state backend (SHARED_STATE_BACKEND, see utils/shared_state.py) entries live in
+the shared tier instead, so all workers see them; the shared tier bounds its
+own size and the TTLs still apply.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from ..config.settings import (
+    GEOCODE_CACHE_TTL_S,
+    WEATHER_CACHE_TTL_S,
+    PLACES_CACHE_TTL_S,
+    TRAVEL_CACHE_TTL_S,
+    CACHE_MAX_ENTRIES,
+    logging
+)
+from .metrics import metrics
+from .shared_state import SharedStateError, shared_key, state
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._shared = state if state.shared else None
+
+    def _shared_get(self, key: Hashable) -> Any:
+        try:
+            return self._shared.get(self.name, shared_key(key))
+        except SharedStateError as e:
+            metrics.incr(f"cache.{self.name}.shared_error")
+            logging.warning(f"Shared cache '{self.name}' read failed: {e}")
+            return None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value, or `default` if missing or expired."""
+        if self._shared is not None:
+            value = self._shared_get(key)
+            metrics.incr(f"cache.{self.name}.{'miss' if value is None else 'hit'}")
+            return default if value is None else value
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                metrics.incr(f"cache.{self.name}.hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        metrics.incr(f"cache.{self.name}.miss")
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Stores a value, evicting the least recently used entry when full."""
+        if self._shared is not None:
+            try:
+                self._shared.set(self.name, shared_key(key), value, self.ttl if ttl is None else ttl)
+            except SharedStateError as e:
+                metrics.incr(f"cache.{self.name}.shared_error")
+                logging.warning(f"Shared cache '{self.name}' write failed: {e}")
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        if self._shared is not None:
+            return self._shared_get(key) is not None
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        if self._shared is not None:
+            return self._shared.count(self.name)
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        if self._shared is not None:
+            self._shared.clear(self.name)
+            return
+        with self._lock:
+            self._entries.clear()
+
+
+# --- Shared caches used by utils/tools.py ---
+# (Places results live in the spatially indexed store in utils/place_store.py)
+geocode_cache = TTLCache("geocode", GEOCODE_CACHE_TTL_S, CACHE_MAX_ENTRIES)
+weather_cache = TTLCache("weather", WEATHER_CACHE_TTL_S, CACHE_MAX_ENTRIES)
+# Travel time and distance per (origin, destination, mode) pair
+travel_cache = TTLCache("travel", TRAVEL_CACHE_TTL_S, CACHE_MAX_ENTRIES * 8)
+# Places results per query, shared between workers; only used with a shared state
+# backend (within a process the place store answers repeated queries)
+places_cache = TTLCache("places", PLACES_CACHE_TTL_S, CACHE_MAX_ENTRIES)
+
+CACHES: Dict[str, TTLCache] = {
+    "geocode": geocode_cache,
+    "weather": weather_cache,
+    "travel": travel_cache,
+    "places": places_cache,
+}
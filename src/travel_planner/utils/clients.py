@@ -0,0 +1,103 @@
+"""
+Shared HTTP session and external API clients for the travel planning system.
+
+All tools go through one pooled `requests.Session`: keep-alive connections are
+reused across calls (no TCP+TLS handshake per forecast), idempotent GETs are
+retried on transient failures, responses are requested compressed, and each
+upstream host gets its own timeouts. The urllib3 connection pools behind the
+session are thread-safe, and the session carries no cookies or auth state, so
+it is shared by all sessions and background threads. The Google Maps client is
+built on the same session.
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import googlemaps
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..config.settings import (
+    MAPS_API_KEY,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF_S,
+    HTTP_DEFAULT_TIMEOUT,
+    HTTP_HOST_TIMEOUTS,
+    MAPS_RETRY_TIMEOUT_S,
+    logging
+)
+from .metrics import metrics
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _record_latency(response: requests.Response, *args, **kwargs) -> None:
+    """Response hook: per-host latency and status metrics for every upstream call."""
+    host = urlsplit(response.url).hostname or "unknown"
+    metrics.observe(f"http.{host}.latency_s", response.elapsed.total_seconds())
+    metrics.incr(f"http.{host}.status_{response.status_code}")
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_RETRY_BACKOFF_S,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    session.hooks["response"].append(_record_latency)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """Returns the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def timeout_for(url: str) -> Tuple[float, float]:
+    """(connect, read) timeout for the URL's host."""
+    return HTTP_HOST_TIMEOUTS.get(urlsplit(url).hostname or "", HTTP_DEFAULT_TIMEOUT)
+
+
+def http_get(url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[Tuple[float, float]] = None) -> requests.Response:
+    """GET through the shared session with the host's timeouts."""
+    return get_http_session().get(url, params=params, timeout=timeout or timeout_for(url))
+
+
+# --- Google Maps Client Setup ---
+try:
+    _maps_connect_timeout, _maps_read_timeout = HTTP_HOST_TIMEOUTS["maps.googleapis.com"]
+    gmaps = googlemaps.Client(
+        key=MAPS_API_KEY,
+        requests_session=get_http_session(),
+        connect_timeout=_maps_connect_timeout,
+        read_timeout=_maps_read_timeout,
+        retry_timeout=MAPS_RETRY_TIMEOUT_S
+    )
+    if "YOUR_MAPS_API_KEY" in MAPS_API_KEY:
+         logging.warning("Using placeholder Google Maps API key. Maps calls will fail.")
+         gmaps_active = False
+    else:
+         gmaps_active = True
+         logging.info("Google Maps client initialized successfully.")
+except Exception as e:
+    logging.error(f"Failed to initialize Google Maps client: {e}")
+    gmaps = None
+    gmaps_active = False
@@ -0,0 +1,278 @@
+"""
+Climatology fallback for `get_weather_forecast`.
+
+The One Call daily forecast only covers the next OWM_DAILY_FORECAST_DAYS days,
+while most trips are planned weeks ahead. For dates outside that window the
+tool answers from long-term monthly normals instead, flagged with
+`is_climatology: true` so the planner treats them as typical conditions rather
+than a forecast.
+
+Normals are kept on a regular lat/lon grid in a compressed `.npz` file
+(CLIMATOLOGY_PATH) with int16 arrays of shape (12, n_lat, n_lon):
+
+- `tmax`, `tmin`: mean daily high/low in tenths of °C
+- `precip`: mean monthly precipitation in mm
+- `wet_days` (optional): mean number of days with precipitation, in tenths
+
+Missing cells (e.g. sea) hold MISSING. `grid` is `[lat0, lon0, cell_deg]`, the
+south-west corner of cell (0, 0), and `source` names the dataset. Lookups are
+plain array indexing, so answers take microseconds and need no cache.
+
+The file is built from a CSV of gridded or station normals (WorldClim, CRU,
+NOAA 1991-2020 normals, ...) with `lat`, `lon`, `month`, `tmax_c`, `tmin_c`,
+`precip_mm` and optionally `wet_days` columns:
+
+    python -m travel_planner climate-normals normals.csv --cell-deg 0.5 --source "WorldClim 2.1"
+
+or straight from the CRU CL 2.0 10' land grids (`grid_10min_{tmp,dtr,pre,rd0}.dat.gz`,
+New et al. 2002), which setup.sh downloads and grids at 1°:
+
+    python -m travel_planner climate-normals data/cru --format cru --cell-deg 1 --source "CRU CL 2.0 (1961-1990)"
+
+Grids spanning all longitudes wrap at the antimeridian.
+"""
+
+import calendar
+import csv
+import gzip
+import math
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..config.settings import (
+    CLIMATOLOGY_PATH,
+    CLIMATOLOGY_SEARCH_CELLS,
+    logging
+)
+
+MISSING = np.iinfo(np.int16).min
+_FIELDS = ("tmax", "tmin", "precip", "wet_days")
+# CSV column and the factor that converts it to the stored int16 unit
+_COLUMNS = {"tmax": ("tmax_c", 10), "tmin": ("tmin_c", 10), "precip": ("precip_mm", 1), "wet_days": ("wet_days", 10)}
+# CRU CL 2.0 variables: mean temperature, diurnal temperature range, precipitation, wet days
+_CRU_FILES = {"tmp": "grid_10min_tmp.dat.gz", "dtr": "grid_10min_dtr.dat.gz",
+              "pre": "grid_10min_pre.dat.gz", "rd0": "grid_10min_rd0.dat.gz"}
+
+
+class ClimateNormals:
+    """Monthly climate normals on a regular lat/lon grid."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], grid, source: str = ""):
+        self.lat0, self.lon0, self.cell_deg = (float(v) for v in grid)
+        self.tmax = arrays["tmax"]
+        self.tmin = arrays["tmin"]
+        self.precip = arrays["precip"]
+        self.wet_days = arrays.get("wet_days")
+        self.source = source
+        _, self.n_lat, self.n_lon = self.tmax.shape
+        self.wraps = self.n_lon * self.cell_deg >= 360 - 1e-6
+
+    @classmethod
+    def load(cls, path: str) -> "ClimateNormals":
+        with np.load(path) as data:
+            arrays = {name: data[name].astype(np.int16) for name in _FIELDS if name in data}
+            normals = cls(arrays, data["grid"], str(data["source"]) if "source" in data else "")
+        logging.info(f"Loaded climate normals: {normals.n_lat}x{normals.n_lon} cells of {normals.cell_deg}° "
+                     f"from {path} ({normals.source or 'unknown source'}).")
+        return normals
+
+    def _cell(self, lat: float, lon: float, month: int) -> Optional[tuple]:
+        """Nearest grid cell with data, searching up to CLIMATOLOGY_SEARCH_CELLS rings outwards (coastal cities)."""
+        row = math.floor((lat - self.lat0) / self.cell_deg)
+        col = math.floor((lon - self.lon0) / self.cell_deg)
+        for ring in range(CLIMATOLOGY_SEARCH_CELLS + 1):
+            best, best_distance = None, None
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring or not 0 <= r < self.n_lat:
+                        continue
+                    cell_col = c % self.n_lon if self.wraps else c
+                    if not 0 <= cell_col < self.n_lon or self.tmax[month, r, cell_col] == MISSING:
+                        continue
+                    distance = (r - row) ** 2 + (c - col) ** 2
+                    if best is None or distance < best_distance:
+                        best, best_distance = (r, cell_col), distance
+            if best is not None:
+                return best
+        return None
+
+    def lookup(self, lat: float, lon: float, day: date) -> Optional[Dict[str, Any]]:
+        """Typical conditions for a calendar day at a point, or None outside the data."""
+        month = day.month - 1
+        cell = self._cell(lat, lon, month)
+        if cell is None:
+            return None
+        r, c = cell
+        days_in_month = calendar.monthrange(day.year, day.month)[1]
+        # Normals describe the middle of each month; temperatures are blended with the adjacent month
+        offset = (day.day - 0.5) / days_in_month - 0.5
+        other = (month + (1 if offset > 0 else -1)) % 12
+        weight = abs(offset)
+
+        def blend(values: np.ndarray) -> Optional[float]:
+            here, there = int(values[month, r, c]), int(values[other, r, c])
+            if here == MISSING:
+                return None
+            return here if there == MISSING else (1 - weight) * here + weight * there
+
+        high, low = blend(self.tmax), blend(self.tmin)
+        if high is None or low is None:
+            return None
+        precip = int(self.precip[month, r, c])
+        precip = None if precip == MISSING else precip
+        wet_days = None
+        if self.wet_days is not None and self.wet_days[month, r, c] != MISSING:
+            wet_days = int(self.wet_days[month, r, c]) / 10
+        month_name = calendar.month_name[day.month]
+
+        details = []
+        if precip is not None:
+            details.append(f"{precip} mm of precipitation")
+        if wet_days is not None:
+            details.append(f"rain on about {round(wet_days)} of {days_in_month} days")
+        return {
+            "temp_high_c": round(high / 10, 1),
+            "temp_low_c": round(low / 10, 1),
+            "conditions_main": "Climatology",
+            "conditions_desc": f"typical {month_name}" + (f": {', '.join(details)}" if details else ""),
+            "precip_prob_percent": None if wet_days is None else round(min(100.0, 100 * wet_days / days_in_month), 1),
+            "precip_month_mm": precip,
+            "summary": f"Long-term average for {month_name}, not a forecast.",
+            "is_climatology": True,
+            "source": "climatology",
+        }
+
+
+def _read_csv(source_csv: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """(lat, lon, zero-based month, {field: values in CSV units}) of a normals CSV."""
+    rows = []
+    with open(source_csv, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = {"lat", "lon", "month", "tmax_c", "tmin_c", "precip_mm"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Climate normals CSV is missing columns: {', '.join(sorted(missing))}")
+        has_wet_days = "wet_days" in (reader.fieldnames or [])
+        for line in reader:
+            try:
+                rows.append([float(line["lat"]), float(line["lon"]), int(line["month"])]
+                            + [float(line[_COLUMNS[name][0]]) if line.get(_COLUMNS[name][0]) not in (None, "") else np.nan
+                               for name in _FIELDS])
+            except ValueError:
+                continue
+    if not rows:
+        raise ValueError(f"No usable rows in {source_csv}.")
+    table = np.asarray(rows, dtype=np.float64)
+    fields = {name: table[:, 3 + i] for i, name in enumerate(_FIELDS) if name != "wet_days" or has_wet_days}
+    return table[:, 0], table[:, 1], table[:, 2].astype(np.int64) - 1, fields
+
+
+def _read_cru(directory: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Same as `_read_csv` for the CRU CL 2.0 grids in `directory`. Each line of a
+    file is `lat lon` and twelve monthly values (`pre` adds twelve coefficients
+    of variation, which are ignored); cells are matched across files by position.
+    """
+    grids = {}
+    for variable, name in _CRU_FILES.items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            if variable == "rd0":
+                continue  # wet days are optional
+            raise ValueError(f"CRU CL 2.0 file {path} not found.")
+        with gzip.open(path, "rt") as f:
+            grids[variable] = np.loadtxt(f, usecols=range(14), dtype=np.float64)
+    by_cell = {}
+    for variable, grid in grids.items():
+        keys = np.rint(grid[:, 0] * 1000).astype(np.int64) * 1_000_000 + np.rint(grid[:, 1] * 1000).astype(np.int64)
+        by_cell[variable] = dict(zip(keys.tolist(), range(len(keys))))
+    common = sorted(set.intersection(*(set(cells) for cells in by_cell.values())))
+    if not common:
+        raise ValueError(f"The CRU CL 2.0 files in {directory} share no grid cells.")
+
+    def monthly(variable):
+        rows = np.fromiter((by_cell[variable][key] for key in common), dtype=np.int64, count=len(common))
+        return grids[variable][rows]
+
+    tmp, dtr, pre = monthly("tmp"), monthly("dtr"), monthly("pre")
+    # Cell-major, then month: one row per (cell, month)
+    lat, lon = np.repeat(tmp[:, 0], 12), np.repeat(tmp[:, 1], 12)
+    month = np.tile(np.arange(12, dtype=np.int64), len(common))
+    fields = {"tmax": (tmp[:, 2:] + dtr[:, 2:] / 2).ravel(), "tmin": (tmp[:, 2:] - dtr[:, 2:] / 2).ravel(),
+              "precip": pre[:, 2:].ravel()}
+    if "rd0" in grids:
+        fields["wet_days"] = monthly("rd0")[:, 2:].ravel()
+    return lat, lon, month, fields
+
+
+def build_normals_file(source: str, output: str, cell_deg: float = 0.5, source_name: str = "",
+                       source_format: str = "csv") -> Dict[str, Any]:
+    """
+    Grids monthly normals (a CSV, or a directory of CRU CL 2.0 files with
+    `source_format="cru"`) into the compact file read by ClimateNormals. Rows
+    falling into the same cell and month are averaged. Returns a summary.
+    """
+    lat, lon, month, fields = _read_cru(source) if source_format == "cru" else _read_csv(source)
+    keep = (month >= 0) & (month < 12) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    lat, lon, month = lat[keep], lon[keep], month[keep]
+    if not len(lat):
+        raise ValueError(f"No rows with a valid month (1-12) and coordinates in {source}.")
+
+    lat0 = math.floor(lat.min() / cell_deg) * cell_deg
+    lon0 = math.floor(lon.min() / cell_deg) * cell_deg
+    if lon0 <= -180:
+        lon = np.where(lon >= 180, lon - 360, lon)  # the same meridian, so the grid keeps 360° of columns
+    rows_idx = np.floor((lat - lat0) / cell_deg).astype(np.int64)
+    cols_idx = np.floor((lon - lon0) / cell_deg).astype(np.int64)
+    n_lat, n_lon = int(rows_idx.max()) + 1, int(cols_idx.max()) + 1
+    flat = (month * n_lat + rows_idx) * n_lon + cols_idx
+    size = 12 * n_lat * n_lon
+
+    arrays = {}
+    for name, values in fields.items():
+        values = values[keep]
+        valid = ~np.isnan(values)
+        total = np.bincount(flat[valid], weights=values[valid], minlength=size)
+        count = np.bincount(flat[valid], minlength=size)
+        mean = np.divide(total, count, out=np.zeros(size), where=count > 0) * _COLUMNS[name][1]
+        stored = np.clip(np.rint(mean), MISSING + 1, np.iinfo(np.int16).max).astype(np.int16)
+        stored[count == 0] = MISSING
+        arrays[name] = stored.reshape(12, n_lat, n_lon)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    np.savez_compressed(output, grid=np.asarray([lat0, lon0, cell_deg]), source=np.asarray(source_name), **arrays)
+    cells = int((arrays["tmax"] != MISSING).any(axis=0).sum())
+    return {"output": output, "rows": int(len(lat)), "grid": [n_lat, n_lon], "cells_with_data": cells,
+            "bytes": os.path.getsize(output)}
+
+
+_normals: Optional[ClimateNormals] = None
+_normals_lock = threading.Lock()
+_load_failed = False
+
+
+def get_climate_normals() -> Optional[ClimateNormals]:
+    """Loads the normals file on first use (None when it is not configured or unreadable)."""
+    global _normals, _load_failed
+    if _normals is None and not _load_failed:
+        with _normals_lock:
+            if _normals is None and not _load_failed:
+                if not CLIMATOLOGY_PATH or not os.path.exists(CLIMATOLOGY_PATH):
+                    logging.info("No climate normals file; dates outside the forecast window get no weather.")
+                    _load_failed = True
+                    return None
+                try:
+                    _normals = ClimateNormals.load(CLIMATOLOGY_PATH)
+                except Exception as e:
+                    logging.warning(f"Could not load climate normals from {CLIMATOLOGY_PATH}: {e}")
+                    _load_failed = True
+    return _normals
+
+
+def climate_normals(lat: float, lon: float, day: date) -> Optional[Dict[str, Any]]:
+    """Typical conditions for the day at the point, or None when no normals are available."""
+    normals = get_climate_normals()
+    return normals.lookup(lat, lon, day) if normals is not None else None
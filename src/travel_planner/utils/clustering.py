@@ -0,0 +1,98 @@
+"""
+Geographic clustering of candidate places into day buckets.
+
+Places are projected onto a local plane (km) and split into one cluster per
+trip day with capacity-constrained k-means: k-means++ seeding, then
+alternating (a) a balanced assignment, where points with the largest regret
+(gap between their nearest and second-nearest center) pick first and each
+center takes at most `capacity` points, and (b) a centroid update, until the
+assignment stops changing. All distance computations are vectorized with numpy.
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..config.settings import CLUSTER_MAX_ITERATIONS
+
+_KM_PER_DEG = 111.32
+
+
+def _to_plane(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Equirectangular projection around the points' mean latitude (km)."""
+    scale = math.cos(math.radians(float(lat.mean())))
+    return np.column_stack(((lon - lon.mean()) * _KM_PER_DEG * scale, (lat - lat.mean()) * _KM_PER_DEG))
+
+
+def _kmeans_pp(xy: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centers = [xy[rng.integers(len(xy))]]
+    for _ in range(1, k):
+        d2 = ((xy[:, None, :] - np.asarray(centers)[None, :, :]) ** 2).sum(-1).min(axis=1)
+        total = d2.sum()
+        probs = d2 / total if total > 0 else np.full(len(xy), 1 / len(xy))
+        centers.append(xy[rng.choice(len(xy), p=probs)])
+    return np.asarray(centers)
+
+
+def _balanced_assign(dist: np.ndarray, capacity: int) -> np.ndarray:
+    n, k = dist.shape
+    ranked = np.sort(dist, axis=1)
+    regret = ranked[:, 1] - ranked[:, 0] if k > 1 else np.zeros(n)
+    preference = np.argsort(dist, axis=1)
+    load = np.zeros(k, dtype=int)
+    labels = np.empty(n, dtype=int)
+    for i in np.argsort(-regret, kind="stable"):
+        for c in preference[i]:
+            if load[c] < capacity:
+                labels[i] = c
+                load[c] += 1
+                break
+    return labels
+
+
+def balanced_kmeans(lat: np.ndarray, lon: np.ndarray, k: int, capacity: Optional[int] = None,
+                    seed: int = 0) -> np.ndarray:
+    """Cluster label (0..k-1) per point, with at most `capacity` points per cluster."""
+    n = len(lat)
+    k = max(1, min(k, n))
+    capacity = max(capacity or 0, math.ceil(n / k))
+    xy = _to_plane(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float))
+    centers = _kmeans_pp(xy, k, np.random.default_rng(seed))
+    labels = None
+    for _ in range(CLUSTER_MAX_ITERATIONS):
+        dist = np.sqrt(((xy[:, None, :] - centers[None, :, :]) ** 2).sum(-1))
+        new_labels = _balanced_assign(dist, capacity)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = xy[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+    return labels
+
+
+def group_into_days(places: List[Dict[str, Any]], days: int, max_per_day: int) -> List[Dict[str, Any]]:
+    """
+    Splits places (dicts with `latitude`/`longitude`) into `days` geographic buckets
+    of at most `max_per_day` places. Returns one dict per day with its center,
+    spread (km, max distance from the center) and places, ordered west to east.
+    """
+    lat = np.asarray([p["latitude"] for p in places], dtype=float)
+    lon = np.asarray([p["longitude"] for p in places], dtype=float)
+    labels = balanced_kmeans(lat, lon, days, max_per_day)
+    xy = _to_plane(lat, lon)
+
+    buckets = []
+    for c in np.unique(labels):
+        members = np.flatnonzero(labels == c)
+        center = xy[members].mean(axis=0)
+        spread = float(np.sqrt(((xy[members] - center) ** 2).sum(-1)).max())
+        buckets.append({
+            "center": {"lat": round(float(lat[members].mean()), 5), "lon": round(float(lon[members].mean()), 5)},
+            "spread_km": round(spread, 2),
+            "places": [places[i] for i in members],
+        })
+    buckets.sort(key=lambda b: b["center"]["lon"])
+    return buckets
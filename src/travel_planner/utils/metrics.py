@@ -0,0 +1,79 @@
+"""
+Lightweight in-process metrics for the travel planning system.
+Counters and timing summaries are thread-safe and can be read with `metrics.snapshot()`.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Number of recent samples kept per timing for percentile estimates
+_SAMPLE_WINDOW = 1024
+
+
+class Metrics:
+    """Thread-safe registry of counters and timing observations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, Dict[str, Any]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increments a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        """Records a timing (or any numeric) observation."""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = {"count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=_SAMPLE_WINDOW)}
+                self._timings[name] = timing
+            timing["count"] += 1
+            timing["total"] += value
+            timing["max"] = max(timing["max"], value)
+            timing["samples"].append(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Context manager that observes the elapsed wall time in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def counter(self, name: str) -> float:
+        """Returns the current value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns a copy of all counters and timing summaries (count, mean, p50, p95, max)."""
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {}
+            for name, timing in self._timings.items():
+                samples = sorted(timing["samples"])
+                timings[name] = {
+                    "count": timing["count"],
+                    "mean": timing["total"] / timing["count"] if timing["count"] else 0.0,
+                    "p50": samples[len(samples) // 2] if samples else 0.0,
+                    "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0,
+                    "max": timing["max"],
+                }
+        return {"counters": counters, "timings": timings}
+
+    def reset(self) -> None:
+        """Clears all counters and timings."""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Process-wide registry
+metrics = Metrics()
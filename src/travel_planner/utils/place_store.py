@@ -0,0 +1,394 @@
+"""
+Local place store for Places text-search results.
+
+Places are kept by `place_id`, indexed by grid cell (lat/lng bucketed to
+PLACE_STORE_CELL_DEG degrees) and by normalized query. A search is answered
+locally when either
+- the same normalized query ("Cafes in  Paris" == "cafe in paris") was fetched
+  recently, or
+- enough fresh places of the requested kind are already indexed around the
+  query's city ("coffee in Paris 7e" after "cafes in Paris").
+
+Freshness follows the business status: operational places live for
+PLACES_CACHE_TTL_S, temporarily closed ones for a much shorter time, and
+permanently closed ones are never served from the spatial index.
+
+The store persists to a directory with two files: `places.dat` holds the JSON
+records back to back and `index.json` holds the offsets plus the fields needed
+for lookups. At startup the data file is memory-mapped and records are decoded
+only when they are returned.
+
+Several processes may share one directory. Saves hold an exclusive lock on
+`store.lock` (loads a shared one). Each save merges the index on disk (newest
+entry per place and query wins) and appends only records the data file lacks.
+It then swaps in the index from a uniquely named temporary file. The data file
+is rewritten only when more than half of it is unreferenced.
+"""
+
+import atexit
+import json
+import math
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config.settings import (
+    PLACES_CACHE_TTL_S,
+    PLACE_STORE_PATH,
+    PLACE_STORE_CELL_DEG,
+    PLACE_STORE_RADIUS_M,
+    PLACE_STORE_MIN_RESULTS,
+    PLACE_STORE_TEMP_CLOSED_TTL_S,
+    PLACE_STORE_FLUSH_EVERY,
+    logging
+)
+from .metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from several processes are not coordinated
+    fcntl = None
+
+_INDEX_VERSION = 1
+# The data file is compacted once it is at least this large and half unreferenced
+_COMPACT_MIN_BYTES = 1 << 20
+_MAX_RESULTS = 20  # Same page size as the Places text search
+_RECORD_FIELDS = ("place_id", "name", "formatted_address", "geometry", "rating",
+                  "user_ratings_total", "price_level", "types", "business_status")
+
+_STOPWORDS = {"the", "a", "an", "of", "and", "best", "good", "top", "near", "around", "places", "place", "spots", "with"}
+# Query words mapped onto the Places `types` vocabulary (singular forms)
+_SYNONYMS = {
+    "coffee": "cafe", "cafes": "cafe", "café": "cafe", "cafés": "cafe", "espresso": "cafe",
+    "museums": "museum", "gallery": "art_gallery", "galleries": "art_gallery", "art": "art_gallery",
+    "restaurants": "restaurant", "food": "restaurant", "eats": "restaurant", "dining": "restaurant",
+    "bars": "bar", "pubs": "bar", "pub": "bar", "nightlife": "night_club", "clubs": "night_club",
+    "parks": "park", "gardens": "park", "garden": "park", "nature": "park",
+    "bakeries": "bakery", "shopping": "shopping_mall", "shops": "store", "markets": "market",
+    "churches": "church", "cathedral": "church", "cathedrals": "church", "hotels": "lodging", "hotel": "lodging",
+}
+
+
+def normalize_place_term(word: str) -> str:
+    """Maps a query word onto the Places `types` vocabulary (e.g. 'coffee' -> 'cafe')."""
+    word = _SYNONYMS.get(word, word)
+    if word not in _SYNONYMS.values() and len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = _SYNONYMS.get(word[:-1], word[:-1])
+    return word
+
+
+def query_words(query: str) -> Tuple[List[str], str]:
+    """Splits '<terms> in <city>' into (lowercase words without stopwords, city)."""
+    text = " ".join(query.lower().split())
+    terms_text, _, city = text.rpartition(" in ")
+    if not terms_text:
+        terms_text, city = text, ""
+    return [w for w in re.findall(r"[\w'-]+", terms_text) if w not in _STOPWORDS], city.strip(" .,")
+
+
+def parse_query(query: str) -> Tuple[Tuple[str, ...], str]:
+    """Splits '<terms> in <city>' into (sorted normalized terms, normalized city)."""
+    words, city = query_words(query)
+    return tuple(sorted({normalize_place_term(w) for w in words})), city
+
+
+def query_key(query: str) -> str:
+    terms, city = parse_query(query)
+    return f"{' '.join(terms)}|{city}"
+
+
+def _haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+class PlaceStore:
+    """Thread-safe place index with optional on-disk persistence."""
+
+    def __init__(self, path: Optional[str] = PLACE_STORE_PATH, ttl_s: float = PLACES_CACHE_TTL_S,
+                 cell_deg: float = PLACE_STORE_CELL_DEG):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.cell_deg = cell_deg
+        self._lock = threading.RLock()
+        # place_id -> [lat, lng, fetched_at, business_status, types, rating, offset, length]
+        self._meta: Dict[str, list] = {}
+        self._records: Dict[str, Dict[str, Any]] = {}  # decoded or newly added records
+        self._cells: Dict[Tuple[int, int], set] = {}
+        self._known_types: set = set()
+        # query key -> {"ids": [...], "fetched_at": float}
+        self._queries: Dict[str, Dict[str, Any]] = {}
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_inode: Optional[int] = None  # offsets in _meta refer to this data file
+        self._dirty = 0
+        if path:
+            self.load()
+
+    # --- Indexing ---
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def _index_meta(self, place_id: str, meta: list) -> None:
+        old = self._meta.get(place_id)
+        if old is not None:
+            self._cells.get(self._cell(old[0], old[1]), set()).discard(place_id)
+        self._meta[place_id] = meta
+        self._cells.setdefault(self._cell(meta[0], meta[1]), set()).add(place_id)
+        self._known_types.update(meta[4])
+
+    def add_query_results(self, query: str, places: List[Dict[str, Any]]) -> None:
+        """Indexes the places returned for a query and remembers the query itself."""
+        now = time.time()
+        ids = []
+        with self._lock:
+            for place in places:
+                place_id = place.get("place_id")
+                location = place.get("geometry", {}).get("location", {})
+                if not place_id or location.get("lat") is None or location.get("lng") is None:
+                    continue
+                record = {field: place.get(field) for field in _RECORD_FIELDS}
+                self._records[place_id] = record
+                self._index_meta(place_id, [location["lat"], location["lng"], now, place.get("business_status"),
+                                            place.get("types") or [], place.get("rating") or 0, None, None])
+                ids.append(place_id)
+            self._queries[query_key(query)] = {"ids": ids, "fetched_at": now}
+            self._dirty += 1
+            should_flush = self.path and self._dirty >= PLACE_STORE_FLUSH_EVERY
+        if should_flush:
+            self.save()
+
+    # --- Lookup ---
+
+    def _is_fresh(self, meta: list, now: float) -> bool:
+        ttl = PLACE_STORE_TEMP_CLOSED_TTL_S if meta[3] == "CLOSED_TEMPORARILY" else self.ttl_s
+        return now - meta[2] < ttl
+
+    def _record(self, place_id: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(place_id)
+        if record is None and self._mmap is not None:
+            meta = self._meta.get(place_id)
+            if meta and meta[6] is not None:
+                record = json.loads(self._mmap[meta[6]:meta[6] + meta[7]])
+                self._records[place_id] = record
+        return record
+
+    def lookup(self, query: str, geocoder: Optional[Callable[[str], Optional[Dict[str, float]]]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns stored places for the query in Places-result shape, or None if the
+        store cannot answer it with fresh data. `geocoder` resolves the query's
+        city to a center point for the spatial lookup.
+        """
+        key = query_key(query)
+        now = time.time()
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry and now - entry["fetched_at"] < self.ttl_s:
+                metas = [self._meta.get(pid) for pid in entry["ids"]]
+                if all(m is not None and self._is_fresh(m, now) for m in metas):
+                    metrics.incr("place_store.query_hit")
+                    return [self._record(pid) for pid in entry["ids"]]
+            known_types = self._known_types
+
+        # The spatial index can only answer queries made entirely of place categories
+        terms, city = parse_query(query)
+        if not (terms and city and geocoder) or not known_types.issuperset(terms):
+            metrics.incr("place_store.miss")
+            return None
+        try:
+            center = geocoder(city)
+        except Exception as e:
+            logging.warning(f"Place store: could not geocode '{city}': {e}")
+            center = None
+        if not center:
+            metrics.incr("place_store.miss")
+            return None
+
+        matches = self.nearby(center["lat"], center["lng"], PLACE_STORE_RADIUS_M, set(terms), now)
+        if len(matches) < PLACE_STORE_MIN_RESULTS:
+            metrics.incr("place_store.miss")
+            return None
+        metrics.incr("place_store.spatial_hit")
+        with self._lock:
+            return [self._record(pid) for pid in matches[:_MAX_RESULTS]]
+
+    def nearby(self, lat: float, lng: float, radius_m: float, terms: set, now: Optional[float] = None) -> List[str]:
+        """Fresh, non-closed place ids within the radius whose types match any term, best rated first."""
+        now = time.time() if now is None else now
+        dlat = radius_m / 111320.0
+        dlng = radius_m / (111320.0 * max(0.01, math.cos(math.radians(lat))))
+        lat_cells = range(math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg) + 1)
+        lng_cells = range(math.floor((lng - dlng) / self.cell_deg), math.floor((lng + dlng) / self.cell_deg) + 1)
+        scored = []
+        with self._lock:
+            for cell_lat in lat_cells:
+                for cell_lng in lng_cells:
+                    for place_id in self._cells.get((cell_lat, cell_lng), ()):
+                        meta = self._meta[place_id]
+                        if meta[3] == "CLOSED_PERMANENTLY" or not self._is_fresh(meta, now):
+                            continue
+                        if terms and not terms.intersection(meta[4]):
+                            continue
+                        if _haversine_m(lat, lng, meta[0], meta[1]) <= radius_m:
+                            scored.append((meta[5], place_id))
+        return [place_id for _, place_id in sorted(scored, reverse=True)]
+
+    # --- Persistence ---
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Coordinates loads and saves between processes sharing the directory."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, "store.lock"), "a+b") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_index(self) -> Optional[Dict[str, Any]]:
+        index_path = os.path.join(self.path, "index.json")
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable place store index in {self.path}: {e}")
+            return None
+        if index.get("version") != _INDEX_VERSION:
+            logging.warning("Place store index version mismatch; ignoring it.")
+            return None
+        return index
+
+    def _map_data(self) -> None:
+        """(Re-)maps the data file, closing the previous map. Called with both locks held."""
+        data_path = os.path.join(self.path, "places.dat")
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap, self._mapped_inode = None, None
+        if os.path.exists(data_path):
+            with open(data_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                self._mapped_inode = stat.st_ino
+                if stat.st_size:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _install(self, index: Dict[str, Any]) -> None:
+        self._records.clear()
+        self._meta.clear()
+        self._cells.clear()
+        for place_id, meta in index["places"].items():
+            self._index_meta(place_id, meta)
+        self._queries = index["queries"]
+
+    def _write_atomic(self, name: str, write: Callable[[Any], None]) -> None:
+        """Writes `name` via a uniquely named temporary file in the same directory."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=f"{name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, os.path.join(self.path, name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def load(self) -> None:
+        """Loads the index and memory-maps the record file, if present."""
+        if not os.path.isdir(self.path):
+            return
+        try:
+            with self._lock, self._file_lock(exclusive=False):
+                index = self._read_index()
+                if index is None:
+                    return
+                self._map_data()
+                self._install(index)
+        except OSError as e:
+            logging.warning(f"Could not load place store from {self.path}: {e}")
+            return
+        logging.info(f"Place store loaded {len(self._meta)} places and {len(self._queries)} queries from {self.path}.")
+
+    def save(self) -> None:
+        """Merges the store into the shared directory, dropping expired queries."""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        data_path = os.path.join(self.path, "places.dat")
+        now = time.time()
+        with self._lock, self._file_lock(exclusive=True):
+            disk = self._read_index() or {"places": {}, "queries": {}}
+            disk_inode = os.stat(data_path).st_ino if os.path.exists(data_path) else None
+            places = dict(disk["places"]) if disk_inode is not None else {}
+            pending = []  # (place_id, meta) whose record is not in the data file yet
+            for place_id, meta in self._meta.items():
+                existing = places.get(place_id)
+                if existing is not None and existing[2] >= meta[2]:
+                    continue
+                if meta[6] is not None and self._mapped_inode == disk_inode and place_id not in self._records:
+                    places[place_id] = meta  # its bytes are already in the shared file
+                else:
+                    pending.append((place_id, meta))
+
+            size = os.path.getsize(data_path) if disk_inode is not None else 0
+            with open(data_path, "ab") as f:
+                offset = size
+                for place_id, meta in pending:
+                    record = self._record(place_id)
+                    if record is None:
+                        continue
+                    blob = json.dumps(record, separators=(",", ":")).encode("utf-8")
+                    f.write(blob)
+                    places[place_id] = meta[:6] + [offset, len(blob)]
+                    offset += len(blob)
+
+            queries = {k: v for k, v in disk["queries"].items() if now - v["fetched_at"] < self.ttl_s}
+            for key, entry in self._queries.items():
+                if now - entry["fetched_at"] < self.ttl_s and entry["fetched_at"] >= queries.get(key, {}).get("fetched_at", 0):
+                    queries[key] = entry
+
+            live = sum(meta[7] for meta in places.values())
+            if offset >= _COMPACT_MIN_BYTES and live * 2 < offset:
+                places = self._compact(places)
+            index = {"version": _INDEX_VERSION, "places": places, "queries": queries}
+            self._write_atomic("index.json", lambda f: f.write(json.dumps(index).encode("utf-8")))
+            self._map_data()
+            self._install(index)
+            self._dirty = 0
+        metrics.incr("place_store.saves")
+
+    def _compact(self, places: Dict[str, list]) -> Dict[str, list]:
+        """Rewrites the data file with only the referenced records. Called with both locks held."""
+        data_path = os.path.join(self.path, "places.dat")
+        compacted = {}
+        with open(data_path, "rb") as source:
+            def write(f):
+                offset = 0
+                for place_id, meta in places.items():
+                    source.seek(meta[6])
+                    f.write(source.read(meta[7]))
+                    compacted[place_id] = meta[:6] + [offset, meta[7]]
+                    offset += meta[7]
+            self._write_atomic("places.dat", write)
+        metrics.incr("place_store.compactions")
+        return compacted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._meta)
+
+
+# Process-wide store used by utils/tools.py
+place_store = PlaceStore()
+if place_store.path:
+    atexit.register(place_store.save)
@@ -0,0 +1,282 @@
+"""
+Offline POI dataset backend for `find_places_nearby`.
+
+Loads a local POI file (CSV, or Parquet when pyarrow is installed) with at least
+`name`, `category`, `lat` and `lon` columns, and optionally `id`, `rating`,
+`user_ratings_total`, `price` (0-4 or "$".."$$$$"), `address` and `city`.
+OSM-style categories such as "amenity=cafe" are reduced to their value.
+
+The data is held column-wise in numpy arrays. Rows are sorted by a composite
+key (category, grid cell) and by rating within each key, so one
+`np.searchsorted` over the keys of the cells around a point yields, per
+category and cell, a contiguous run of rows that is already best-first. A query
+only touches the head of each run, which keeps lookups well under a
+millisecond regardless of dataset size.
+
+Names are indexed the same way: an inverted index of (name token, grid cell)
+keys, so a keyword only touches the postings inside the query's bounding box.
+Query words that name a category restrict the category; the remaining words
+must all appear in the name. `benchmarks/bench_poi_dataset.py` measures both
+paths on a synthetic dataset.
+"""
+
+import csv
+import math
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from ..config.settings import (
+    PLACES_BACKEND,
+    POI_DATASET_PATH,
+    PLACE_STORE_RADIUS_M,
+    logging
+)
+from .place_store import query_words, normalize_place_term
+
+_CELL_DEG = 0.01
+_LON_CELLS = 36000  # 360 / _CELL_DEG
+_CATEGORY_STRIDE = 1 << 30  # > number of grid cells
+_MAX_RESULTS = 20
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _cell_ids(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat_cell = np.floor((lat + 90.0) / _CELL_DEG).astype(np.int64)
+    lon_cell = np.floor((lon + 180.0) / _CELL_DEG).astype(np.int64)
+    return lat_cell * _LON_CELLS + lon_cell
+
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def _parse_price(value: Any) -> int:
+    if value is None or value == "":
+        return -1
+    text = str(value).strip()
+    if text and set(text) == {"$"}:
+        return min(4, len(text))
+    try:
+        return int(float(text))
+    except ValueError:
+        return -1
+
+
+def _parse_float(value: Any, default: float = float("nan")) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _normalize_category(value: str) -> str:
+    value = (value or "").strip().lower()
+    if "=" in value:
+        value = value.split("=", 1)[1]
+    return normalize_place_term(value.replace(" ", "_"))
+
+
+def _read_rows(path: str) -> Dict[str, list]:
+    """Reads the POI file into plain column lists."""
+    columns = ("id", "name", "category", "lat", "lon", "rating", "user_ratings_total", "price", "address", "city")
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Reading Parquet POI datasets requires pyarrow.") from e
+        table = pq.read_table(path)
+        return {c: (table.column(c).to_pylist() if c in table.column_names else None) for c in columns}
+
+    data: Dict[str, list] = {c: [] for c in columns}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        present = set(reader.fieldnames or [])
+        for row in reader:
+            for c in columns:
+                data[c].append(row.get(c))
+    return {c: (v if c in present else None) for c, v in data.items()}
+
+
+class POIDataset:
+    """Columnar POI table with category+cell and name-token+cell indexes and per-city centers."""
+
+    def __init__(self, columns: Dict[str, Optional[list]]):
+        n = len(columns["name"])
+        lat = np.asarray([_parse_float(v) for v in columns["lat"]], dtype=np.float64)
+        lon = np.asarray([_parse_float(v) for v in columns["lon"]], dtype=np.float64)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+
+        categories = [_normalize_category(v) for v in columns["category"]]
+        self.categories = sorted(set(categories))
+        self.category_codes = {c: i for i, c in enumerate(self.categories)}
+        category = np.asarray([self.category_codes[c] for c in categories], dtype=np.int32)
+
+        rating = np.asarray([_parse_float(v) for v in columns["rating"]] if columns["rating"] else np.full(n, np.nan), dtype=np.float32)
+        ratings_total = np.asarray([int(_parse_float(v, 0)) for v in columns["user_ratings_total"]]
+                                   if columns["user_ratings_total"] else np.zeros(n), dtype=np.int32)
+        price = np.asarray([_parse_price(v) for v in columns["price"]] if columns["price"] else np.full(n, -1), dtype=np.int8)
+
+        cells = _cell_ids(np.where(valid, lat, 0), np.where(valid, lon, 0))
+        keys = category.astype(np.int64) * _CATEGORY_STRIDE + cells
+        # Primary order: (category, cell) ascending, rating descending within each run
+        order = np.lexsort((-np.nan_to_num(rating, nan=-1.0), keys))
+        order = order[valid[order]]
+
+        self.lat = lat[order].astype(np.float32)
+        self.lon = lon[order].astype(np.float32)
+        self.rating = rating[order]
+        self.ratings_total = ratings_total[order]
+        self.price = price[order]
+        self.category = category[order]
+        self.keys = keys[order]
+        self.cells = cells[order]
+
+        take = order.tolist()
+        self.names = [columns["name"][i] for i in take]
+        self._index_names()
+        self.ids = [columns["id"][i] for i in take] if columns["id"] else [f"poi_{i}" for i in take]
+        self.addresses = [columns["address"][i] for i in take] if columns["address"] else None
+
+        self.city_centers: Dict[str, tuple] = {}
+        if columns["city"]:
+            city_names = np.asarray([(columns["city"][i] or "").strip().lower() for i in take])
+            for city in np.unique(city_names):
+                if city:
+                    mask = city_names == city
+                    self.city_centers[city] = (float(np.median(self.lat[mask])), float(np.median(self.lon[mask])))
+
+    def _index_names(self) -> None:
+        """Builds the (token, cell) -> rows inverted index over lowercase name tokens."""
+        self.name_vocab: Dict[str, int] = {}
+        token_ids, token_rows = [], []
+        for row, name in enumerate(self.names):
+            for token in set(_tokens(name)):
+                token_ids.append(self.name_vocab.setdefault(token, len(self.name_vocab)))
+                token_rows.append(row)
+        rows = np.asarray(token_rows, dtype=np.int32)
+        keys = np.asarray(token_ids, dtype=np.int64) * _CATEGORY_STRIDE + self.cells[rows]
+        order = np.argsort(keys, kind="stable")
+        self.name_keys = keys[order]
+        self.name_rows = rows[order]
+
+    def _name_rows(self, token: str, cells: np.ndarray) -> np.ndarray:
+        """Sorted rows in the cells whose name contains the token."""
+        token_id = self.name_vocab.get(token)
+        if token_id is None:
+            return np.empty(0, dtype=np.int64)
+        wanted = token_id * _CATEGORY_STRIDE + cells
+        starts = np.searchsorted(self.name_keys, wanted, side="left")
+        ends = np.searchsorted(self.name_keys, wanted, side="right")
+        runs = [self.name_rows[s:e] for s, e in zip(starts, ends) if e > s]
+        return np.sort(np.concatenate(runs)).astype(np.int64) if runs else np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def load(cls, path: str) -> "POIDataset":
+        dataset = cls(_read_rows(path))
+        logging.info(f"Loaded offline POI dataset: {len(dataset)} places, {len(dataset.categories)} categories from {path}.")
+        return dataset
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _bbox_cells(self, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        dlat = radius_m / 111320.0
+        dlon = radius_m / (111320.0 * max(0.01, math.cos(math.radians(lat))))
+        lat_cells = np.arange(math.floor((lat - dlat + 90.0) / _CELL_DEG), math.floor((lat + dlat + 90.0) / _CELL_DEG) + 1)
+        lon_cells = np.arange(math.floor((lon - dlon + 180.0) / _CELL_DEG), math.floor((lon + dlon + 180.0) / _CELL_DEG) + 1)
+        return (lat_cells[:, None] * _LON_CELLS + lon_cells[None, :]).ravel()
+
+    def _within(self, rows: np.ndarray, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        dy = (self.lat[rows] - lat) * 111320.0
+        dx = (self.lon[rows] - lon) * 111320.0 * math.cos(math.radians(lat))
+        return rows[dx * dx + dy * dy <= radius_m * radius_m]
+
+    def search(self, lat: float, lon: float, radius_m: float, categories: List[str],
+               keyword: Optional[str] = None, limit: int = _MAX_RESULTS) -> np.ndarray:
+        """
+        Row ids of the best-rated places near the point in any of the categories
+        (all categories when empty) whose name contains every keyword token.
+        """
+        cells = self._bbox_cells(lat, lon, radius_m)
+        codes = [self.category_codes[c] for c in categories if c in self.category_codes]
+        if categories and not codes:
+            return np.empty(0, dtype=np.int64)
+        tokens = _tokens(keyword)
+        if tokens:
+            # Start from the rarest token and intersect the others' postings
+            postings = sorted((self._name_rows(t, cells) for t in set(tokens)), key=len)
+            rows = postings[0]
+            for other in postings[1:]:
+                rows = np.intersect1d(rows, other, assume_unique=True)
+            if codes:
+                rows = rows[np.isin(self.category[rows], codes)]
+            runs = [rows] if len(rows) else []
+        else:
+            # Without any terms every category competes
+            codes = codes or list(range(len(self.categories)))
+            wanted = (np.asarray(codes, dtype=np.int64)[:, None] * _CATEGORY_STRIDE + cells[None, :]).ravel()
+            starts = np.searchsorted(self.keys, wanted, side="left")
+            ends = np.searchsorted(self.keys, wanted, side="right")
+            # Each run is best-first, so only its head can make the top `limit`
+            runs = [np.arange(s, min(e, s + limit)) for s, e in zip(starts, ends) if e > s]
+        if not runs:
+            return np.empty(0, dtype=np.int64)
+        candidates = self._within(np.concatenate(runs).astype(np.int64), lat, lon, radius_m)
+        scores = np.nan_to_num(self.rating[candidates], nan=0.0)
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        return candidates[np.argsort(-scores, kind="stable")]
+
+    def to_place(self, row: int) -> Dict[str, Any]:
+        """Renders a row in the Places text-search result shape."""
+        rating = float(self.rating[row])
+        price = int(self.price[row])
+        return {
+            "place_id": self.ids[row],
+            "name": self.names[row],
+            "formatted_address": self.addresses[row] if self.addresses else None,
+            "geometry": {"location": {"lat": round(float(self.lat[row]), 6), "lng": round(float(self.lon[row]), 6)}},
+            "rating": None if math.isnan(rating) else round(rating, 1),
+            "user_ratings_total": int(self.ratings_total[row]),
+            "price_level": None if price < 0 else price,
+            "types": [self.categories[self.category[row]]],
+            "business_status": "OPERATIONAL",
+        }
+
+    def text_search(self, query: str, geocoder: Optional[Callable[[str], Optional[Dict[str, float]]]] = None,
+                    radius_m: float = PLACE_STORE_RADIUS_M) -> Dict[str, Any]:
+        """Answers a '<terms> in <city>' query with a Places-shaped response."""
+        words, city = query_words(query)
+        center = self.city_centers.get(city)
+        if center is None and geocoder is not None:
+            coords = geocoder(city)
+            center = (coords["lat"], coords["lng"]) if coords else None
+        if center is None:
+            return {"status": "ZERO_RESULTS", "results": []}
+
+        # Words naming a category select it; the rest must match the place name
+        categories = sorted({normalize_place_term(w) for w in words} & set(self.category_codes))
+        keyword = " ".join(w for w in words if normalize_place_term(w) not in self.category_codes)
+        rows = self.search(center[0], center[1], radius_m, categories, keyword=keyword)
+        results = [self.to_place(int(r)) for r in rows]
+        return {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+
+
+_dataset: Optional[POIDataset] = None
+_dataset_lock = threading.Lock()
+
+
+def get_poi_dataset() -> Optional[POIDataset]:
+    """Loads the configured dataset on first use (None when the offline backend is not configured)."""
+    global _dataset
+    if PLACES_BACKEND != "offline" or not POI_DATASET_PATH:
+        return None
+    if _dataset is None:
+        with _dataset_lock:
+            if _dataset is None:
+                _dataset = POIDataset.load(POI_DATASET_PATH)
+    return _dataset
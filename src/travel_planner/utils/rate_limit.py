@@ -0,0 +1,99 @@
+"""
+Token-bucket rate limiting for upstream API quotas.
+Buckets are thread-safe and meant to be shared process-wide, so every session
+draws from the same requests-per-minute and tokens-per-minute allowance. With a
+shared state backend (see utils/shared_state.py) a bucket's tokens are kept in
+the shared tier, so all workers draw from one allowance.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from ..config.settings import logging
+from .shared_state import SharedStateError, state
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a bucket cannot grant the requested amount within the allowed wait."""
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously at `rate_per_s`."""
+
+    def __init__(self, name: str, rate_per_s: float, capacity: float):
+        self.name = name
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._shared = state if state.shared else None
+
+    @classmethod
+    def per_minute(cls, name: str, per_minute: float) -> "TokenBucket":
+        """Bucket allowing `per_minute` units per minute, with up to one minute of burst."""
+        return cls(name, per_minute / 60.0, per_minute)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_s)
+        self._updated_at = now
+
+    def _shared_call(self, method: str, amount: float) -> Optional[float]:
+        """Runs a shared-tier bucket operation; None when the tier is unavailable (the local bucket is used)."""
+        try:
+            return getattr(self._shared, method)(self.name, amount, self.rate_per_s, self.capacity)
+        except SharedStateError as e:
+            logging.warning(f"Shared rate limit '{self.name}' unavailable, limiting locally: {e}")
+            return None
+
+    def _take(self, amount: float) -> float:
+        """Takes `amount` tokens if available; returns 0.0 if taken, else the seconds until they would be."""
+        if self._shared is not None:
+            wait_s = self._shared_call("take_tokens", amount)
+            if wait_s is not None:
+                return wait_s
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate_per_s
+
+    def acquire(self, amount: float = 1, max_wait_s: Optional[float] = None) -> float:
+        """
+        Takes `amount` tokens, sleeping until they are available.
+        Returns the seconds spent waiting; raises RateLimitTimeout if that would exceed `max_wait_s`.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            wait_s = self._take(amount)
+            if wait_s == 0.0:
+                return waited
+            if max_wait_s is not None and waited + wait_s > max_wait_s:
+                raise RateLimitTimeout(f"{self.name}: would wait {waited + wait_s:.1f}s for {amount:g} tokens")
+            time.sleep(wait_s)
+            waited += wait_s
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        """Takes `amount` tokens only if they are available right now."""
+        return self._take(amount) == 0.0
+
+    def adjust(self, delta: float) -> None:
+        """Returns (positive) or charges (negative) tokens, e.g. to correct an estimate after the fact."""
+        if self._shared is not None and self._shared_call("add_tokens", delta) is not None:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + delta)
+
+    @property
+    def available(self) -> float:
+        if self._shared is not None:
+            tokens = self._shared_call("add_tokens", 0)
+            if tokens is not None:
+                return tokens
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
@@ -0,0 +1,46 @@
+"""
+Side store for full tool outputs.
+
+The planner only sees a compact projection of each tool result (see
+core/projection.py); the full payload is kept here under a short reference ID
+so later tools (or `lookup_tool_result`) can retrieve it.
+
+The store is a cache, so refs outlive it: a later turn may run on another
+worker, after a restart or past TOOL_RESULT_TTL_S. Payloads therefore also
+travel with the session as the `artifact` of their ToolMessage, and the tool
+executor re-registers them with `restore_result` before a tool reads refs.
+"""
+
+import hashlib
+import json
+from typing import Any, Optional
+
+from ..config.settings import TOOL_RESULT_TTL_S, CACHE_MAX_ENTRIES
+from .cache import TTLCache
+
+_results = TTLCache("tool_results", TOOL_RESULT_TTL_S, CACHE_MAX_ENTRIES)
+
+
+def _ref(tool_name: str, payload: Any) -> str:
+    blob = json.dumps([tool_name, payload], sort_keys=True, default=str)
+    return "r" + hashlib.sha1(blob.encode("utf-8")).hexdigest()[:8]
+
+
+def put_result(tool_name: str, payload: Any) -> str:
+    """Stores a full tool payload and returns its reference ID (stable for identical payloads)."""
+    ref = _ref(tool_name, payload)
+    _results.set(ref, payload)
+    return ref
+
+
+def restore_result(tool_name: str, payload: Any) -> str:
+    """Re-registers a payload kept with the session under its original ref, if the store lost it."""
+    ref = _ref(tool_name, payload)
+    if _results.get(ref) is None:
+        _results.set(ref, payload)
+    return ref
+
+
+def get_result(ref: str) -> Optional[Any]:
+    """Returns the stored payload for a reference ID, or None if unknown or expired."""
+    return _results.get(ref)
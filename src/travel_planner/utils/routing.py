@@ -0,0 +1,376 @@
+"""
+Deterministic visit-order optimization for a day's activities.
+
+A day is solved as an open path (optionally with a fixed first and/or last
+stop) over a travel-time matrix, with optional per-stop time windows and visit
+durations:
+
+- up to ROUTE_EXACT_MAX_STOPS stops: Held-Karp dynamic programming over
+  subsets, minimizing (minutes late, travel minutes) lexicographically. This is
+  exact for travel time whenever the windows do not bind.
+- larger days: nearest-neighbour construction improved by 2-opt and or-opt
+  moves until no move helps.
+
+Travel times are estimated from great-circle distance (per-mode speed and
+detour factor) unless a measured matrix is passed in.
+
+`optimize_plan_routes` (off by default, ROUTE_OPTIMIZE_PLAN) reorders the
+stops between pinned activities of a parsed plan. It keeps each activity's
+duration, recomputes start times from durations plus travel, and honours
+`opens`/`closes` when an activity has them. A reorder is rejected if a stop
+would miss its window or the run would end later than the planner's own
+schedule. Moved activities get a fresh travel note.
+"""
+
+import copy
+import re
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..config.settings import (
+    ROUTE_EXACT_MAX_STOPS,
+    ROUTE_MIN_SAVING_MIN,
+    logging
+)
+from .place_store import _haversine_m
+
+# Average door-to-door speeds in km/h and a fixed per-leg overhead in minutes
+_MODE_SPEEDS = {"walking": (4.8, 0), "bicycling": (14.0, 2), "transit": (18.0, 6), "driving": (24.0, 5)}
+_DETOUR_FACTOR = 1.3
+_LATE_PENALTY = 1000.0  # one minute late outweighs any amount of extra travel
+
+_DEFAULT_VISIT_MIN = 60
+# A sentence of an activity note that talks about getting there
+_TRAVEL_NOTE_RE = re.compile(r"[^.;]*\b(?:walk\w*|travel\w*|driv\w*|metro|subway|bus|tram|taxi|transit|ride|min(?:ute)?s?)\b[^.;]*[.;]?\s*",
+                             re.IGNORECASE)
+
+_MEAL_WORDS = ("breakfast", "brunch", "lunch", "dinner", "supper", "restaurant", "cafe", "café", "coffee", "meal")
+
+Matrix = List[List[float]]
+
+
+def estimate_travel_matrix(points: Sequence[Tuple[float, float]], mode: str = "walking") -> Matrix:
+    """Travel minutes between every pair of (lat, lon) points, estimated from distance."""
+    speed_kmh, overhead_min = _MODE_SPEEDS.get((mode or "walking").lower(), _MODE_SPEEDS["walking"])
+    n = len(points)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i, j in combinations(range(n), 2):
+        km = _haversine_m(points[i][0], points[i][1], points[j][0], points[j][1]) * _DETOUR_FACTOR / 1000
+        matrix[i][j] = matrix[j][i] = km / speed_kmh * 60 + overhead_min
+    return matrix
+
+
+def parse_clock(value: Optional[str]) -> Optional[int]:
+    """'09:30' -> 570 minutes after midnight; None if absent or unparseable."""
+    if not value:
+        return None
+    try:
+        hours, minutes = str(value).strip().split(":")[:2]
+        return int(hours) * 60 + int(minutes[:2])
+    except ValueError:
+        return None
+
+
+_TIME_RE = re.compile(r"(\d{1,2})(?:[:.h](\d{2}))?\s*([ap])\.?\s*m\.?\b|(\d{1,2})[:.h](\d{2})", re.IGNORECASE)
+
+
+def parse_time_range(text: str) -> Tuple[Optional[int], Optional[int]]:
+    """'09:00 - 11:30', '9am-11:30am', '2:00 PM' -> (start, end) minutes after midnight."""
+    found = []
+    for m in _TIME_RE.finditer(text or ""):
+        if m.group(1) is not None:
+            hours, minutes, meridiem = int(m.group(1)), int(m.group(2) or 0), m.group(3).lower()
+            hours = hours % 12 + (12 if meridiem == "p" else 0)
+        else:
+            hours, minutes = int(m.group(4)), int(m.group(5))
+        if hours < 24 and minutes < 60:
+            found.append(hours * 60 + minutes)
+    if not found:
+        return None, None
+    return found[0], (found[1] if len(found) > 1 else None)
+
+
+def format_clock(minutes: float) -> str:
+    minutes = int(round(minutes))
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+class RouteProblem:
+    """A travel-time matrix plus per-stop visit minutes and (open, close) windows."""
+
+    def __init__(self, matrix: Matrix, visit_min: Optional[Sequence[float]] = None,
+                 windows: Optional[Sequence[Tuple[Optional[int], Optional[int]]]] = None,
+                 start: Optional[int] = None, end: Optional[int] = None, day_start_min: int = 9 * 60):
+        self.n = len(matrix)
+        self.matrix = matrix
+        self.visit_min = list(visit_min) if visit_min else [0.0] * self.n
+        self.windows = list(windows) if windows else [(None, None)] * self.n
+        self.start = start
+        self.end = end
+        self.day_start_min = day_start_min
+
+    def _step(self, clock: float, late: float, prev: Optional[int], stop: int) -> Tuple[float, float]:
+        """Clock and accumulated lateness after visiting `stop` (arriving from `prev`)."""
+        arrive = clock + (self.matrix[prev][stop] if prev is not None else 0)
+        opens, closes = self.windows[stop]
+        begin = max(arrive, opens) if opens is not None else arrive
+        if closes is not None and begin > closes:
+            late += begin - closes
+        return begin + self.visit_min[stop], late
+
+    def evaluate(self, order: Sequence[int]) -> Tuple[float, float]:
+        """(minutes late, travel minutes) for visiting the stops in `order`."""
+        clock, late, travel = float(self.day_start_min), 0.0, 0.0
+        prev = None
+        for stop in order:
+            if prev is not None:
+                travel += self.matrix[prev][stop]
+            clock, late = self._step(clock, late, prev, stop)
+            prev = stop
+        return late, travel
+
+    def schedule(self, order: Sequence[int]) -> List[Dict[str, Any]]:
+        """Arrival/departure times and the travel leg into each stop."""
+        clock, late = float(self.day_start_min), 0.0
+        prev, rows = None, []
+        for stop in order:
+            leg = self.matrix[prev][stop] if prev is not None else 0.0
+            arrive = clock + leg
+            clock, late = self._step(clock, late, prev, stop)
+            rows.append({"stop": stop, "travel_min": round(leg), "arrive": format_clock(arrive),
+                         "depart": format_clock(clock), "depart_min": clock})
+            prev = stop
+        return rows
+
+    def _cost(self, order: Sequence[int]) -> float:
+        late, travel = self.evaluate(order)
+        return late * _LATE_PENALTY + travel
+
+    def solve(self) -> List[int]:
+        """Best visit order found (exact for small problems, local search otherwise)."""
+        if self.n <= 2:
+            order = list(range(self.n))
+            if self.start is not None and order and order[0] != self.start:
+                order.reverse()
+            return order
+        if self.n <= ROUTE_EXACT_MAX_STOPS:
+            return self._held_karp()
+        return self._local_search(self._nearest_neighbour())
+
+    def _held_karp(self) -> List[int]:
+        n, full = self.n, (1 << self.n) - 1
+        # best[(mask, last)] = (cost, clock, late, prev_last)
+        best: Dict[Tuple[int, int], Tuple[float, float, float, Optional[int]]] = {}
+        firsts = [self.start] if self.start is not None else [i for i in range(n) if i != self.end]
+        layer = []
+        for i in firsts:
+            clock, late = self._step(float(self.day_start_min), 0.0, None, i)
+            best[(1 << i, i)] = (late * _LATE_PENALTY, clock, late, None)
+            layer.append((1 << i, i))
+
+        for size in range(1, n):
+            next_layer = set()
+            for mask, last in layer:
+                cost, clock, late, _ = best[(mask, last)]
+                for nxt in range(n):
+                    if mask & (1 << nxt) or (nxt == self.end and size != n - 1):
+                        continue
+                    new_clock, new_late = self._step(clock, late, last, nxt)
+                    new_cost = cost + self.matrix[last][nxt] + (new_late - late) * _LATE_PENALTY
+                    key = (mask | (1 << nxt), nxt)
+                    if key not in best or new_cost < best[key][0]:
+                        best[key] = (new_cost, new_clock, new_late, last)
+                        next_layer.add(key)
+            layer = next_layer
+
+        lasts = [self.end] if self.end is not None else range(n)
+        last = min((j for j in lasts if (full, j) in best), key=lambda j: best[(full, j)][0])
+        order, mask = [], full
+        while last is not None:
+            order.append(last)
+            prev = best[(mask, last)][3]
+            mask &= ~(1 << last)
+            last = prev
+        return order[::-1]
+
+    def _nearest_neighbour(self) -> List[int]:
+        remaining = set(range(self.n)) - {self.end}
+        current = self.start if self.start is not None else min(remaining)
+        order = [current]
+        remaining.discard(current)
+        while remaining:
+            current = min(remaining, key=lambda j, c=current: self.matrix[c][j])
+            order.append(current)
+            remaining.discard(current)
+        if self.end is not None:
+            order.append(self.end)
+        return order
+
+    def _local_search(self, order: List[int]) -> List[int]:
+        lo = 1 if self.start is not None else 0
+        hi = self.n - 1 if self.end is not None else self.n  # movable positions are [lo, hi)
+        best_cost = self._cost(order)
+        improved = True
+        while improved:
+            improved = False
+            # 2-opt: reverse a segment
+            for i in range(lo, hi - 1):
+                for j in range(i + 1, hi):
+                    candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                    cost = self._cost(candidate)
+                    if cost < best_cost - 1e-9:
+                        order, best_cost, improved = candidate, cost, True
+            # or-opt: move a run of 1-3 stops elsewhere
+            for length in (1, 2, 3):
+                for i in range(lo, hi - length + 1):
+                    segment = order[i:i + length]
+                    rest = order[:i] + order[i + length:]
+                    for j in range(lo, hi - length + 1):
+                        if j == i:
+                            continue
+                        candidate = rest[:j] + segment + rest[j:]
+                        cost = self._cost(candidate)
+                        if cost < best_cost - 1e-9:
+                            order, best_cost, improved = candidate, cost, True
+                            break
+        return order
+
+
+def is_meal_activity(activity: Dict[str, Any]) -> bool:
+    """Meals stay where the planner put them; the stops between them are reordered."""
+    text = f"{activity.get('name', '')} {activity.get('description', '')}".lower()
+    return any(word in text for word in _MEAL_WORDS)
+
+
+def _activity_point(activity: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    location = activity.get("location")
+    if not isinstance(location, dict):
+        return None
+    lat, lon = location.get("latitude"), location.get("longitude")
+    if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+        return float(lat), float(lon)
+    return None
+
+
+def _span(activity: Dict[str, Any]) -> Tuple[Optional[int], float]:
+    """(start minute, visit minutes) of an activity's time range."""
+    start, end = parse_time_range(activity.get("time") if isinstance(activity.get("time"), str) else "")
+    return start, (end - start if start is not None and end is not None and end > start else _DEFAULT_VISIT_MIN)
+
+
+def _retime(activity: Dict[str, Any], begin: float, end: float, leg: Optional[float],
+            previous: Optional[Dict[str, Any]], mode: str) -> Dict[str, Any]:
+    activity = dict(activity)
+    activity["time"] = f"{format_clock(begin)} - {format_clock(end)}"
+    notes = _TRAVEL_NOTE_RE.sub("", str(activity.get("notes") or "")).strip()
+    if leg is not None and previous is not None:
+        notes = f"{notes} About {round(leg)} min {mode} from {previous.get('name', 'the previous stop')}.".strip()
+    activity["notes"] = notes
+    return activity
+
+
+def _optimize_segment(activities: List[Dict[str, Any]], before: Optional[Dict[str, Any]],
+                      after: Optional[Dict[str, Any]], mode: str) -> Tuple[List[Dict[str, Any]], float]:
+    """Reorders a run of routable activities between two pinned ones; returns (activities, minutes saved)."""
+    spans = [_span(a) for a in activities]
+    if any(start is None for start, _ in spans):
+        return activities, 0.0  # no schedule to recompute
+    segment_start = min(start for start, _ in spans)
+    segment_end = max(start + visit for start, visit in spans)
+    anchors_before = [before] if before is not None and _activity_point(before) and _span(before)[0] is not None else []
+    anchors_after = [after] if after is not None and _activity_point(after) else []
+    after_start = _span(after)[0] if after is not None else None
+    deadline = after_start if after_start is not None else segment_end
+
+    stops = anchors_before + activities + anchors_after
+    visit_min, windows = [], []
+    for stop in stops:
+        start, visit = _span(stop)
+        if stop is before or stop is after:
+            windows.append((start, start))  # pinned where the planner put it
+        else:
+            opens, closes = parse_clock(stop.get("opens")), parse_clock(stop.get("closes"))
+            windows.append((max(segment_start, opens or 0), None if closes is None else closes - visit))
+        visit_min.append(0.0 if stop is after else visit)
+    problem = RouteProblem(
+        estimate_travel_matrix([_activity_point(a) for a in stops], mode),
+        visit_min=visit_min,
+        windows=windows,
+        start=0 if anchors_before else None,
+        end=len(stops) - 1 if anchors_after else None,
+        day_start_min=_span(before)[0] if anchors_before else segment_start
+    )
+    original = list(range(len(stops)))
+    order = problem.solve()
+    if order == original:
+        return activities, 0.0
+    late, travel = problem.evaluate(order)
+    saved = problem.evaluate(original)[1] - travel
+    rows = problem.schedule(order)
+    inner_rows = [row for row in rows if stops[row["stop"]] is not before and stops[row["stop"]] is not after]
+    finish = inner_rows[-1]["depart_min"]
+    if anchors_after:
+        finish += problem.matrix[inner_rows[-1]["stop"]][len(stops) - 1]
+    if late > 0 or finish > deadline or saved < ROUTE_MIN_SAVING_MIN:
+        return activities, 0.0
+
+    reordered = []
+    for position, row in enumerate(rows):
+        activity = stops[row["stop"]]
+        if activity is before or activity is after:
+            continue
+        depart = row["depart_min"]
+        previous = stops[rows[position - 1]["stop"]] if position else None
+        reordered.append(_retime(activity, depart - visit_min[row["stop"]], depart,
+                                 row["travel_min"] if previous is not None else None, previous, mode))
+    return reordered, saved
+
+
+def optimize_day_activities(activities: List[Dict[str, Any]], mode: str = "walking") -> Tuple[List[Dict[str, Any]], float]:
+    """Reorders a day's non-meal activities between the pinned ones; returns (activities, minutes saved)."""
+    result: List[Dict[str, Any]] = []
+    segment: List[Dict[str, Any]] = []
+    before: Optional[Dict[str, Any]] = None
+    total_saved = 0.0
+
+    def flush(after):
+        nonlocal total_saved
+        if len(segment) >= 2:
+            reordered, saved = _optimize_segment(segment, before, after, mode)
+            total_saved += saved
+            result.extend(reordered)
+        else:
+            result.extend(segment)
+        segment.clear()
+
+    for activity in activities:
+        if isinstance(activity, dict) and _activity_point(activity) and not is_meal_activity(activity):
+            segment.append(activity)
+            continue
+        flush(activity if isinstance(activity, dict) else None)
+        result.append(activity)
+        before = activity if isinstance(activity, dict) else None
+    flush(None)
+    return result, total_saved
+
+
+def optimize_plan_routes(plan: Dict[str, Any], mode: Optional[str] = None) -> Tuple[Dict[str, Any], float]:
+    """Applies `optimize_day_activities` to every day of a parsed plan (returns a copy)."""
+    itinerary = plan.get("itinerary") if isinstance(plan, dict) else None
+    if isinstance(itinerary, dict):
+        days = list(itinerary.values())
+    elif isinstance(itinerary, list):
+        days = itinerary
+    else:
+        return plan, 0.0
+
+    optimized = copy.deepcopy(plan)
+    new_days = optimized["itinerary"].values() if isinstance(itinerary, dict) else optimized["itinerary"]
+    total_saved = 0.0
+    for day, new_day in zip(days, new_days):
+        if isinstance(day, dict) and isinstance(day.get("activities"), list):
+            new_day["activities"], saved = optimize_day_activities(day["activities"], mode or "walking")
+            if saved:
+                logging.info(f"Route optimizer: reordered {day.get('date')} saving ~{saved:.0f} min of travel.")
+            total_saved += saved
+    return optimized, total_saved
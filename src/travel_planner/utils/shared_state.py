@@ -0,0 +1,655 @@
+"""
+Shared cache and coordination backend for running several workers.
+
+Tool caches (utils/cache.py, utils/result_store.py, core/response_cache.py),
+rate-limit buckets (utils/rate_limit.py), cross-worker request coalescing
+(utils/singleflight.py) and per-session locks (backend views) all go through
+the backend selected by SHARED_STATE_BACKEND:
+
+- "local": everything stays in the process. Caches and buckets keep their own
+  in-memory structures, and session locks are plain thread locks. Use it with
+  a single worker.
+- "sqlite": one SQLite file (SHARED_STATE_PATH, WAL mode) shared by the
+  workers of one host.
+- "resp": a Redis-protocol server at SHARED_STATE_URL, shared by workers on
+  any host. Only GET/SET/DEL/SCAN and WATCH/MULTI/EXEC are used, so it works
+  with Redis, Valkey, KeyDB or `LocalRespServer`. `LocalRespServer` is a small
+  in-process stand-in for tests and development.
+
+Cached values are pickled. The shared tier must therefore only be reachable by
+the application's own workers. Token buckets use each worker's wall clock, so
+hosts sharing a bucket need synchronized clocks.
+"""
+
+import fnmatch
+import os
+import pickle
+import random
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from ..config.settings import (
+    SHARED_STATE_BACKEND,
+    SHARED_STATE_PATH,
+    SHARED_STATE_URL,
+    SHARED_STATE_PREFIX,
+    logging
+)
+
+
+class SharedStateError(Exception):
+    """Raised when the shared tier cannot be reached or rejects a command."""
+
+
+class LockTimeout(Exception):
+    """Raised when a lock could not be acquired within the allowed wait."""
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate_per_s: float, capacity: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate_per_s)
+
+
+class SharedStateBackend:
+    """Key-value store with TTLs, token buckets and leased locks. Subclasses implement the raw operations."""
+
+    # False for the in-process backend: caches and buckets then keep their own local structures
+    shared = True
+
+    def __init__(self):
+        self.owner_prefix = f"{socket.gethostname()}:{os.getpid()}:"
+
+    # --- Values (pickled) ---
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        raw = self._get(namespace, key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, namespace: str, key: str, value: Any, ttl_s: float) -> None:
+        self._set(namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl_s)
+
+    # --- Locks ---
+    @contextmanager
+    def lock(self, name: str, ttl_s: float, wait_s: float) -> Iterator[None]:
+        """
+        Holds `name` across all workers. The lease expires after `ttl_s` even if the
+        holder dies. Raises LockTimeout if the lock is not free within `wait_s`.
+        """
+        owner = self.owner_prefix + uuid.uuid4().hex
+        deadline = time.monotonic() + wait_s
+        delay = 0.01
+        while not self.try_lock(name, owner, ttl_s):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LockTimeout(f"Lock '{name}' is held elsewhere.")
+            time.sleep(min(remaining, delay * random.uniform(0.5, 1.0)))
+            delay = min(delay * 2, 0.25)
+        try:
+            yield
+        finally:
+            # Never raise here: the turn inside the lock has already finished, and the lease expires on its own
+            try:
+                self.unlock(name, owner)
+            except Exception as e:
+                logging.warning(f"Could not release lock '{name}': {e}")
+
+    # --- Raw operations ---
+    def _get(self, namespace: str, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _set(self, namespace: str, key: str, value: bytes, ttl_s: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self, namespace: str) -> None:
+        raise NotImplementedError
+
+    def count(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    def take_tokens(self, bucket: str, amount: float, rate_per_s: float, capacity: float) -> float:
+        """Takes `amount` tokens if available; returns 0.0 if taken, else the seconds until they would be."""
+        raise NotImplementedError
+
+    def add_tokens(self, bucket: str, delta: float, rate_per_s: float, capacity: float) -> float:
+        """Adds (or with a negative delta, charges) tokens; returns the tokens now available."""
+        raise NotImplementedError
+
+    def try_lock(self, name: str, owner: str, ttl_s: float) -> bool:
+        raise NotImplementedError
+
+    def unlock(self, name: str, owner: str) -> None:
+        raise NotImplementedError
+
+
+class InProcessBackend(SharedStateBackend):
+    """Process-local implementation (the "local" mode); correct only with a single worker."""
+
+    shared = False
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, str], Tuple[bytes, float]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+
+    def _get(self, namespace, key):
+        with self._lock:
+            entry = self._values.get((namespace, key))
+            if entry is None or entry[1] <= time.time():
+                self._values.pop((namespace, key), None)
+                return None
+            return entry[0]
+
+    def _set(self, namespace, key, value, ttl_s):
+        with self._lock:
+            self._values[(namespace, key)] = (value, time.time() + ttl_s)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._values.pop((namespace, key), None)
+
+    def clear(self, namespace):
+        with self._lock:
+            for item in [item for item in self._values if item[0] == namespace]:
+                del self._values[item]
+
+    def count(self, namespace):
+        now = time.time()
+        with self._lock:
+            return sum(1 for (ns, _), (_, expires_at) in self._values.items() if ns == namespace and expires_at > now)
+
+    def take_tokens(self, bucket, amount, rate_per_s, capacity):
+        with self._lock:
+            now = time.time()
+            tokens, updated_at = self._buckets.get(bucket, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, rate_per_s, capacity)
+            if tokens >= amount:
+                self._buckets[bucket] = (tokens - amount, now)
+                return 0.0
+            self._buckets[bucket] = (tokens, now)
+            return (amount - tokens) / rate_per_s
+
+    def add_tokens(self, bucket, delta, rate_per_s, capacity):
+        with self._lock:
+            now = time.time()
+            tokens, updated_at = self._buckets.get(bucket, (capacity, now))
+            tokens = min(capacity, _refill(tokens, updated_at, now, rate_per_s, capacity) + delta)
+            self._buckets[bucket] = (tokens, now)
+            return tokens
+
+    def try_lock(self, name, owner, ttl_s):
+        with self._lock:
+            holder = self._locks.get(name)
+            if holder is not None and holder[1] > time.time():
+                return False
+            self._locks[name] = (owner, time.time() + ttl_s)
+            return True
+
+    def unlock(self, name, owner):
+        with self._lock:
+            if self._locks.get(name, ("", 0))[0] == owner:
+                del self._locks[name]
+
+
+class SQLiteBackend(SharedStateBackend):
+    """Shared state in one SQLite file; one connection per thread and process."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS kv (ns TEXT, k TEXT, v BLOB, expires_at REAL, PRIMARY KEY (ns, k)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL);
+        CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL);
+    """
+    # Expired values are swept on every Nth write of a connection
+    _SWEEP_EVERY = 500
+
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():  # connections must not cross a fork
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(self._SCHEMA)
+            local.connection, local.pid, local.writes = connection, os.getpid(), 0
+        return local.connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            raise SharedStateError(f"SQLite shared state unavailable: {e}") from e
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException as e:
+            try:
+                connection.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass  # no transaction left to roll back
+            if isinstance(e, sqlite3.Error):
+                raise SharedStateError(str(e)) from e
+            raise
+
+    def _get(self, namespace, key):
+        try:
+            row = self._connection().execute(
+                "SELECT v FROM kv WHERE ns = ? AND k = ? AND expires_at > ?", (namespace, key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            raise SharedStateError(str(e)) from e
+        return row[0] if row else None
+
+    def _set(self, namespace, key, value, ttl_s):
+        try:
+            connection = self._connection()
+            now = time.time()
+            connection.execute("INSERT OR REPLACE INTO kv (ns, k, v, expires_at) VALUES (?, ?, ?, ?)",
+                               (namespace, key, value, now + ttl_s))
+            self._local.writes += 1
+            if self._local.writes % self._SWEEP_EVERY == 0:
+                connection.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            raise SharedStateError(str(e)) from e
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        try:
+            return self._connection().execute(sql, params)
+        except sqlite3.Error as e:
+            raise SharedStateError(str(e)) from e
+
+    def delete(self, namespace, key):
+        self._execute("DELETE FROM kv WHERE ns = ? AND k = ?", (namespace, key))
+
+    def clear(self, namespace):
+        self._execute("DELETE FROM kv WHERE ns = ?", (namespace,))
+
+    def count(self, namespace):
+        return self._execute("SELECT COUNT(*) FROM kv WHERE ns = ? AND expires_at > ?", (namespace, time.time())).fetchone()[0]
+
+    def _bucket(self, connection, bucket, rate_per_s, capacity, now) -> float:
+        row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (bucket,)).fetchone()
+        return capacity if row is None else _refill(row[0], row[1], now, rate_per_s, capacity)
+
+    def take_tokens(self, bucket, amount, rate_per_s, capacity):
+        with self._transaction() as connection:
+            now = time.time()
+            tokens = self._bucket(connection, bucket, rate_per_s, capacity, now)
+            wait_s = 0.0 if tokens >= amount else (amount - tokens) / rate_per_s
+            connection.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                               (bucket, tokens - amount if wait_s == 0.0 else tokens, now))
+        return wait_s
+
+    def add_tokens(self, bucket, delta, rate_per_s, capacity):
+        with self._transaction() as connection:
+            now = time.time()
+            tokens = min(capacity, self._bucket(connection, bucket, rate_per_s, capacity, now) + delta)
+            connection.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                               (bucket, tokens, now))
+        return tokens
+
+    def try_lock(self, name, owner, ttl_s):
+        with self._transaction() as connection:
+            now = time.time()
+            row = connection.execute("SELECT expires_at FROM locks WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] > now:
+                return False
+            connection.execute("INSERT OR REPLACE INTO locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                               (name, owner, now + ttl_s))
+            return True
+
+    def unlock(self, name, owner):
+        self._execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+
+
+# --- RESP (Redis protocol) ---
+
+def _encode_command(*parts: Any) -> bytes:
+    out = [b"*%d\r\n" % len(parts)]
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+def _read_reply(stream) -> Any:
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the server.")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise SharedStateError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [_read_reply(stream) for _ in range(length)]
+    raise SharedStateError(f"Unexpected reply from server: {line!r}")
+
+
+class RespBackend(SharedStateBackend):
+    """Shared state on a Redis-protocol server; one connection per thread and process."""
+
+    # A token bucket's record outlives the time it takes to refill completely by this factor
+    _BUCKET_TTL_FACTOR = 2
+
+    def __init__(self, url: str = SHARED_STATE_URL, prefix: str = SHARED_STATE_PREFIX, timeout_s: float = 5.0):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip("/") or 0)
+        self.prefix = prefix
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def _stream(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid() or local.stream is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout_s)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            local.sock, local.stream, local.pid = sock, sock.makefile("rwb"), os.getpid()
+            if self.password:
+                self._send(local.stream, "AUTH", self.password)
+            if self.db:
+                self._send(local.stream, "SELECT", self.db)
+        return local.stream
+
+    @staticmethod
+    def _send(stream, *parts: Any) -> Any:
+        stream.write(_encode_command(*parts))
+        stream.flush()
+        return _read_reply(stream)
+
+    def _reset(self) -> None:
+        stream = getattr(self._local, "stream", None)
+        self._local.stream = None
+        if stream is not None:
+            try:
+                stream.close()
+                self._local.sock.close()
+            except OSError:
+                pass
+
+    def command(self, *parts: Any) -> Any:
+        """Runs one command, reconnecting once if the connection dropped."""
+        for attempt in range(2):
+            try:
+                return self._send(self._stream(), *parts)
+            except (OSError, ConnectionError) as e:
+                self._reset()
+                if attempt:
+                    raise SharedStateError(f"Shared state server unavailable: {e}") from e
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    def _get(self, namespace, key):
+        return self.command("GET", self._key("kv", namespace, key))
+
+    def _set(self, namespace, key, value, ttl_s):
+        self.command("SET", self._key("kv", namespace, key), value, "PX", max(1, int(ttl_s * 1000)))
+
+    def delete(self, namespace, key):
+        self.command("DEL", self._key("kv", namespace, key))
+
+    def _scan(self, pattern: str) -> Iterator[List[bytes]]:
+        cursor = "0"
+        while True:
+            cursor, keys = self.command("SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+            if keys:
+                yield keys
+            if cursor == "0":
+                return
+
+    def clear(self, namespace):
+        for keys in self._scan(self._key("kv", namespace, "*")):
+            self.command("DEL", *keys)
+
+    def count(self, namespace):
+        return sum(len(keys) for keys in self._scan(self._key("kv", namespace, "*")))
+
+    def _update_bucket(self, bucket, rate_per_s, capacity, update) -> Any:
+        """Optimistic read-modify-write of a bucket with WATCH/MULTI/EXEC; `update(tokens, now)` -> (new tokens, result)."""
+        key = self._key("bucket", bucket)
+        ttl_ms = max(1000, int(capacity / rate_per_s * self._BUCKET_TTL_FACTOR * 1000))
+        while True:
+            try:
+                stream = self._stream()
+                self._send(stream, "WATCH", key)
+                raw = self._send(stream, "GET", key)
+                now = time.time()
+                if raw is None:
+                    tokens = capacity
+                else:
+                    stored_tokens, updated_at = (float(part) for part in raw.split(b":"))
+                    tokens = _refill(stored_tokens, updated_at, now, rate_per_s, capacity)
+                new_tokens, result = update(tokens, now)
+                self._send(stream, "MULTI")
+                self._send(stream, "SET", key, f"{new_tokens!r}:{now!r}", "PX", ttl_ms)
+                if self._send(stream, "EXEC") is not None:
+                    return result
+            except (OSError, ConnectionError) as e:
+                self._reset()
+                raise SharedStateError(f"Shared state server unavailable: {e}") from e
+            # Another worker changed the bucket in between; retry with the fresh value
+
+    def take_tokens(self, bucket, amount, rate_per_s, capacity):
+        def update(tokens, now):
+            if tokens >= amount:
+                return tokens - amount, 0.0
+            return tokens, (amount - tokens) / rate_per_s
+        return self._update_bucket(bucket, rate_per_s, capacity, update)
+
+    def add_tokens(self, bucket, delta, rate_per_s, capacity):
+        def update(tokens, now):
+            tokens = min(capacity, tokens + delta)
+            return tokens, tokens
+        return self._update_bucket(bucket, rate_per_s, capacity, update)
+
+    def try_lock(self, name, owner, ttl_s):
+        return self.command("SET", self._key("lock", name), owner, "NX", "PX", max(1, int(ttl_s * 1000))) == "OK"
+
+    def unlock(self, name, owner):
+        """Deletes the lock if `owner` still holds it, reconnecting once if the connection dropped."""
+        key = self._key("lock", name)
+        for attempt in range(2):
+            try:
+                stream = self._stream()
+                self._send(stream, "WATCH", key)
+                if self._send(stream, "GET", key) != owner.encode():
+                    self._send(stream, "UNWATCH")
+                    return
+                self._send(stream, "MULTI")
+                self._send(stream, "DEL", key)
+                self._send(stream, "EXEC")
+                return
+            except (OSError, ConnectionError) as e:
+                self._reset()
+                if attempt:
+                    raise SharedStateError(f"Shared state server unavailable: {e}") from e
+
+
+class LocalRespServer:
+    """
+    Minimal in-process Redis-protocol server for tests and local development:
+    GET, SET (NX/XX, EX/PX), DEL, EXISTS, SCAN, WATCH/UNWATCH/MULTI/EXEC/DISCARD,
+    PING, SELECT, AUTH and FLUSHDB, with one keyspace and no persistence.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._lock = threading.Lock()
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._versions: Dict[bytes, int] = {}
+        self.commands = 0
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                session = {"watched": {}, "queue": None}
+                while True:
+                    try:
+                        request = _read_reply(self.rfile)
+                    except (ConnectionError, OSError, SharedStateError):
+                        return
+                    reply = server._execute(session, [part if isinstance(part, bytes) else str(part).encode() for part in request])
+                    self.wfile.write(reply)
+                    self.wfile.flush()
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self.host, self.port = self._server.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    def start(self) -> "LocalRespServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="resp-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # --- Command execution ---
+    def _live(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            self._write(key, None)
+            return None
+        return entry[0] if entry else None
+
+    def _write(self, key: bytes, value: Optional[bytes], expires_at: Optional[float] = None) -> None:
+        if value is None:
+            self._data.pop(key, None)
+        else:
+            self._data[key] = (value, expires_at)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, SharedStateError):
+            return b"-ERR %s\r\n" % str(value).encode()
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        return b"*%d\r\n" % len(value) + b"".join(LocalRespServer._encode(item) for item in value)
+
+    def _execute(self, session: Dict[str, Any], parts: List[bytes]) -> bytes:
+        name = parts[0].upper().decode() if parts else ""
+        with self._lock:
+            self.commands += 1
+            if session["queue"] is not None and name not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+                session["queue"].append(parts)
+                return self._encode("QUEUED")
+            try:
+                return self._encode(self._run(session, name, parts[1:]))
+            except (IndexError, ValueError) as e:
+                return self._encode(SharedStateError(f"wrong arguments for '{name}': {e}"))
+
+    def _run(self, session: Dict[str, Any], name: str, args: List[bytes]) -> Any:
+        if name in ("PING", "SELECT", "AUTH"):
+            return "PONG" if name == "PING" else "OK"
+        if name == "GET":
+            return self._live(args[0])
+        if name == "SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            expires_at = None
+            for i, option in enumerate(options):
+                if option in (b"PX", b"EX"):
+                    expires_at = time.time() + float(args[3 + i]) / (1000 if option == b"PX" else 1)
+            exists = self._live(key) is not None
+            if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                return None
+            self._write(key, value, expires_at)
+            return "OK"
+        if name == "DEL":
+            removed = sum(1 for key in args if self._live(key) is not None)
+            for key in args:
+                if key in self._data:
+                    self._write(key, None)
+            return removed
+        if name == "EXISTS":
+            return sum(1 for key in args if self._live(key) is not None)
+        if name == "SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode() if b"MATCH" in args else "*"
+            keys = [key for key in list(self._data) if self._live(key) is not None and fnmatch.fnmatchcase(key.decode(), pattern)]
+            return [b"0", keys]
+        if name == "FLUSHDB":
+            for key in list(self._data):
+                self._write(key, None)
+            return "OK"
+        if name == "WATCH":
+            for key in args:
+                self._live(key)
+                session["watched"][key] = self._versions.get(key, 0)
+            return "OK"
+        if name == "UNWATCH":
+            session["watched"] = {}
+            return "OK"
+        if name == "MULTI":
+            session["queue"] = []
+            return "OK"
+        if name == "DISCARD":
+            session["queue"], session["watched"] = None, {}
+            return "OK"
+        if name == "EXEC":
+            queue, watched = session["queue"] or [], session["watched"]
+            session["queue"], session["watched"] = None, {}
+            if any(self._versions.get(key, 0) != version for key, version in watched.items()):
+                return None
+            return [self._run(session, parts[0].upper().decode(), parts[1:]) for parts in queue]
+        return SharedStateError(f"unknown command '{name}'")
+
+
+def create_backend(kind: str = SHARED_STATE_BACKEND) -> SharedStateBackend:
+    """Backend for a SHARED_STATE_BACKEND value."""
+    if kind == "sqlite":
+        return SQLiteBackend()
+    if kind == "resp":
+        return RespBackend()
+    if kind != "local":
+        logging.warning(f"Unknown SHARED_STATE_BACKEND '{kind}'; keeping state in process.")
+    return InProcessBackend()
+
+
+state = create_backend()
+
+
+def shared_key(key: Any) -> str:
+    """Stable string form of a cache key (strings as-is, tuples and numbers by repr)."""
+    return key if isinstance(key, str) else repr(key)
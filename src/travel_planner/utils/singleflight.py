@@ -0,0 +1,107 @@
+"""
+Request coalescing ("singleflight") for upstream API calls.
+
+When several threads ask for the same thing at the same moment (e.g. two users
+planning Paris trips both searching "museums in Paris"), only the first caller
+goes upstream; the others wait for and share its result or its exception.
+
+With a shared state backend (see utils/shared_state.py), calls that pass a
+`recheck` also coalesce across workers. The leading thread of each worker
+takes a shared lock for the key. Once it holds the lock, it reads the shared
+cache before going upstream.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .metrics import metrics
+from .shared_state import LockTimeout, SharedStateError, shared_key, state
+
+# Upper bound on one upstream call, so a worker that died holding a key does not stall the others for long
+_SHARED_LOCK_TTL_S = 30.0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.upstream_calls = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Runs `fn` unless a call with the same key is already in flight, in which case its outcome is shared.
+        `recheck` reads the shared cache that `fn` fills; see the module docstring.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._in_flight[key] = call
+                self.upstream_calls += 1
+                leader = True
+
+        if not leader:
+            metrics.incr(f"singleflight.{self.name}.saved")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def _lead(self, key: Hashable, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]]) -> Any:
+        """Runs the upstream call, first waiting for another worker already running it."""
+        if recheck is None or not state.shared:
+            return fn()
+        try:
+            with state.lock(f"flight:{self.name}:{shared_key(key)}", ttl_s=_SHARED_LOCK_TTL_S, wait_s=_SHARED_LOCK_TTL_S):
+                cached = recheck()
+                if cached is not None:
+                    metrics.incr(f"singleflight.{self.name}.shared_saved")
+                    return cached
+                return fn()
+        except (LockTimeout, SharedStateError):
+            return fn()
+
+    def stats(self) -> Dict[str, int]:
+        """Calls seen, calls that went upstream, and upstream calls saved by coalescing."""
+        with self._lock:
+            return {"calls": self.calls, "upstream": self.upstream_calls, "saved": self.calls - self.upstream_calls}
+
+
+# One group per upstream call made by utils/tools.py
+FLIGHTS: Dict[str, SingleFlight] = {
+    name: SingleFlight(name) for name in ("geocode", "weather", "places", "directions")
+}
+
+
+def singleflight_stats() -> Dict[str, Dict[str, int]]:
+    """Per-tool coalescing stats."""
+    return {name: flight.stats() for name, flight in FLIGHTS.items()}
@@ -6,24 +6,46 @@ Tools:
 - get_weather_forecast: Get weather forecast for a specific location and date
 - find_places_nearby: Find places of interest in a city based on criteria
 - get_travel_info: Get travel time and distance between two points
+- group_places_by_day: Split gathered places into geographically coherent day buckets
+- optimize_day_route: Order a day's stops to minimize travel time (see utils/routing.py)
+- lookup_tool_result: Full details of an earlier (compacted) tool result
+
+Dates beyond the daily forecast window are answered from monthly climate normals
+(see utils/climatology.py), flagged with `is_climatology`.
 
 Helper Functions:
 - map_price_level: Convert numeric price levels to dollar sign representation
+- geocode_location, fetch_daily_forecast, search_places, fetch_directions: Cached and/or
+  coalesced upstream calls shared by the tools and the background prefetcher
+- fetch_travel_matrix: Distance Matrix travel minutes, estimated when unavailable
+- travel_key, store_travel_leg: Pairwise travel-time cache shared by get_travel_info
+  and fetch_travel_matrix
 """
 
 from typing import List, Dict, Any, Optional
 from langchain_core.tools import tool
-import requests
 import json
-from datetime import datetime, timezone
+from datetime import date as Date, datetime, timedelta, timezone
 
 from ..config.settings import (
     WEATHER_API_KEY,
     OWM_ONECALL_ENDPOINT,
-    gmaps,
-    gmaps_active,
+    OWM_DAILY_FORECAST_DAYS,
+    PLACES_BACKEND,
+    ROUTE_MATRIX_MAX_STOPS,
+    CLUSTER_MAX_PLACES_PER_DAY,
     logging
 )
+from .clients import gmaps, gmaps_active, http_get
+from .cache import geocode_cache, weather_cache, travel_cache, places_cache
+from .place_store import place_store, query_key
+from .poi_dataset import get_poi_dataset
+from .singleflight import FLIGHTS
+from .shared_state import state as shared_state
+from .result_store import get_result
+from .routing import RouteProblem, estimate_travel_matrix, parse_clock
+from .clustering import group_into_days
+from .climatology import climate_normals
 
 def map_price_level(level: Optional[int]) -> str:
     """Maps Google Places price level (0-4) to $, $$, $$$ etc."""
@@ -34,83 +56,217 @@ def map_price_level(level: Optional[int]) -> str:
     if level == 4: return "$$$$"
     return "Unknown"
 
+def _normalize_text(text: str) -> str:
+    """Lower-cases and collapses whitespace for use in cache keys."""
+    return " ".join((text or "").lower().split())
+
+def geocode_location(location: str) -> Optional[Dict[str, float]]:
+    """Geocodes a location name to {'lat', 'lng'} (cached). Returns None if not found."""
+    key = _normalize_text(location)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return cached or None
+
+    def fetch():
+        geocode_result = gmaps.geocode(location)
+        coords = dict(geocode_result[0]['geometry']['location']) if geocode_result else {}
+        geocode_cache.set(key, coords)
+        return coords
+
+    # Concurrent identical lookups share one upstream request
+    return FLIGHTS["geocode"].do(key, fetch, recheck=lambda: geocode_cache.get(key)) or None
+
+def forecast_today() -> Date:
+    """First day of the provider's daily forecast window. One Call days are UTC dates, so this is too."""
+    return datetime.now(timezone.utc).date()
+
+def fetch_daily_forecast(lat: float, lon: float) -> List[Dict[str, Any]]:
+    """Fetches the One Call daily forecast list for a coordinate (cached per ~1km cell)."""
+    key = (round(lat, 2), round(lon, 2))
+    cached = weather_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'appid': WEATHER_API_KEY,
+            'units': 'metric',
+            'exclude': 'current,minutely,hourly,alerts'
+        }
+        response = http_get(OWM_ONECALL_ENDPOINT, params=params)
+        response.raise_for_status()
+        daily = response.json().get('daily', [])
+        weather_cache.set(key, daily)
+        return daily
+
+    return FLIGHTS["weather"].do(key, fetch, recheck=lambda: weather_cache.get(key))
+
+def build_places_query(city: str, interests: Optional[List[str]], keyword: Optional[str] = None, place_type: Optional[str] = None) -> Optional[str]:
+    """Builds the Places text-search query used by find_places_nearby."""
+    if keyword:
+        return f"{keyword} in {city}"
+    if interests:
+        return f"{' '.join(interests)} in {city}"
+    if place_type:
+        return f"{place_type} in {city}"
+    return None
+
+def search_places(query: str) -> Dict[str, Any]:
+    """
+    Runs a Places text search, answering from the local place store when it has
+    fresh results for the same or an overlapping query. Only OK/ZERO_RESULTS responses are stored.
+    With PLACES_BACKEND="offline" the local POI dataset is searched instead.
+    """
+    if PLACES_BACKEND == "offline":
+        dataset = get_poi_dataset()
+        if dataset is None:
+            return {"status": "REQUEST_DENIED", "results": []}
+        return dataset.text_search(query, geocoder=geocode_location if gmaps_active else None)
+
+    stored = place_store.lookup(query, geocoder=geocode_location)
+    if stored is not None:
+        return {"status": "OK" if stored else "ZERO_RESULTS", "results": stored}
+
+    key = query_key(query)
+    # Results another worker fetched (shared state backends only)
+    shared = places_cache.get(key) if shared_state.shared else None
+    if shared is not None:
+        place_store.add_query_results(query, shared.get('results', []))
+        return shared
+
+    def fetch():
+        places_result = gmaps.places(query=query)
+        if places_result.get('status') in ('OK', 'ZERO_RESULTS'):
+            place_store.add_query_results(query, places_result.get('results', []))
+            if shared_state.shared:
+                places_cache.set(key, places_result)
+        return places_result
+
+    return FLIGHTS["places"].do(key, fetch, recheck=lambda: places_cache.get(key))
+
+def fetch_directions(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float, mode: str) -> List[Dict[str, Any]]:
+    """Fetches Google Directions between two points; concurrent identical requests are coalesced."""
+    mode = mode.lower()
+    key = (round(origin_lat, 5), round(origin_lon, 5), round(dest_lat, 5), round(dest_lon, 5), mode)
+    return FLIGHTS["directions"].do(key, lambda: gmaps.directions(
+        (origin_lat, origin_lon),
+        (dest_lat, dest_lon),
+        mode=mode,
+        departure_time=datetime.now() if mode == 'transit' else None
+    ))
+
+def travel_key(origin: tuple, destination: tuple, mode: str) -> tuple:
+    """travel_cache key for a directed (origin, destination, mode) pair (~10 m cells, the precision of compact tool results)."""
+    return (round(origin[0], 4), round(origin[1], 4), round(destination[0], 4), round(destination[1], 4), mode.lower())
+
+def store_travel_leg(origin: tuple, destination: tuple, mode: str, duration: Dict[str, Any], distance: Dict[str, Any]) -> None:
+    """Caches a Directions/Distance Matrix leg ({"value", "text"} duration and distance); transit is not cached."""
+    if mode.lower() != "transit":
+        travel_cache.set(travel_key(origin, destination, mode), {
+            "duration_seconds": duration["value"], "duration_text": duration["text"],
+            "distance_meters": distance["value"], "distance_text": distance["text"],
+        })
+
+def fetch_travel_matrix(points: List[tuple], mode: str) -> List[List[float]]:
+    """Travel minutes between all points from the Distance Matrix API, falling back to estimates."""
+    mode = mode.lower()
+    if mode != "transit" and len(points) > 1:
+        legs = [[None if i == j else travel_cache.get(travel_key(a, b, mode)) for j, b in enumerate(points)]
+                for i, a in enumerate(points)]
+        if all(leg is not None for i, row in enumerate(legs) for j, leg in enumerate(row) if i != j):
+            return [[0.0 if leg is None else leg["duration_seconds"] / 60 for leg in row] for row in legs]
+    if gmaps_active and 1 < len(points) <= ROUTE_MATRIX_MAX_STOPS:
+        try:
+            response = gmaps.distance_matrix(points, points, mode=mode,
+                                             departure_time=datetime.now() if mode == 'transit' else None)
+            matrix = [[element["duration"]["value"] / 60 if element.get("status") == "OK" else None
+                       for element in row["elements"]] for row in response["rows"]]
+            for i, row in enumerate(response["rows"]):
+                for j, element in enumerate(row["elements"]):
+                    if i != j and element.get("status") == "OK":
+                        store_travel_leg(points[i], points[j], mode, element["duration"], element["distance"])
+            if all(v is not None for row in matrix for v in row):
+                return matrix
+            logging.warning("Distance Matrix returned incomplete rows; using estimated travel times.")
+        except Exception as e:
+            logging.warning(f"Distance Matrix request failed ({e}); using estimated travel times.")
+    return estimate_travel_matrix(points, mode)
+
 @tool
 def get_weather_forecast(location: str, date: str) -> dict:
     """Gets the daily weather forecast for a specific location and date."""
     logging.info(f"TOOL CALLED: get_weather_forecast(location='{location}', date='{date}')")
 
-    if not WEATHER_API_KEY:
+    try:
+        target_date = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        return {"error": f"Invalid date '{date}'; use YYYY-MM-DD."}
+    # One Call has nothing past its daily window, so those dates skip the request
+    in_window = target_date <= forecast_today() + timedelta(days=OWM_DAILY_FORECAST_DAYS - 1)
+    if in_window and not WEATHER_API_KEY:
         return {"error": "Weather API key not configured."}
     if not gmaps_active:
         return {"error": "Maps service unavailable for geocoding."}
 
     # Geocode location
     try:
-        geocode_result = gmaps.geocode(location)
-        if not geocode_result:
+        coords = geocode_location(location)
+        if not coords:
             return {"error": f"Could not find coordinates for location: {location}"}
-        
-        lat = geocode_result[0]['geometry']['location']['lat']
-        lon = geocode_result[0]['geometry']['location']['lng']
+
+        lat = coords['lat']
+        lon = coords['lng']
     except Exception as e:
         return {"error": f"Geocoding error: {str(e)}"}
 
-    # Get weather data
-    try:
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': WEATHER_API_KEY,
-            'units': 'metric',
-            'exclude': 'current,minutely,hourly,alerts'
-        }
-        response = requests.get(OWM_ONECALL_ENDPOINT, params=params, timeout=10)
-        response.raise_for_status()
-        weather_data = response.json()
-    except Exception as e:
-        return {"error": f"Weather API error: {str(e)}"}
-
-    # Find forecast for target date
-    target_date = datetime.strptime(date, "%Y-%m-%d").date()
-    for day_forecast in weather_data.get('daily', []):
-        forecast_date = datetime.fromtimestamp(day_forecast['dt'], tz=timezone.utc).date()
-        if forecast_date == target_date:
-            return {
-                "date": date,
-                "location": location,
-                "latitude": lat,
-                "longitude": lon,
-                "temp_high_c": day_forecast['temp']['max'],
-                "temp_low_c": day_forecast['temp']['min'],
-                "conditions_main": day_forecast['weather'][0]['main'],
-                "conditions_desc": day_forecast['weather'][0]['description'],
-                "precip_prob_percent": round(day_forecast['pop'] * 100, 1),
-                "summary": day_forecast.get('summary', '')
-            }
-
-    return {"error": f"No forecast available for {date}"}
+    error = f"No forecast available for {date}"
+    if in_window:
+        # Get weather data
+        try:
+            daily_forecasts = fetch_daily_forecast(lat, lon)
+        except Exception as e:
+            daily_forecasts, error = [], f"Weather API error: {str(e)}"
+
+        # Find forecast for target date
+        for day_forecast in daily_forecasts:
+            forecast_date = datetime.fromtimestamp(day_forecast['dt'], tz=timezone.utc).date()
+            if forecast_date == target_date:
+                return {
+                    "date": date,
+                    "location": location,
+                    "latitude": lat,
+                    "longitude": lon,
+                    "temp_high_c": day_forecast['temp']['max'],
+                    "temp_low_c": day_forecast['temp']['min'],
+                    "conditions_main": day_forecast['weather'][0]['main'],
+                    "conditions_desc": day_forecast['weather'][0]['description'],
+                    "precip_prob_percent": round(day_forecast['pop'] * 100, 1),
+                    "summary": day_forecast.get('summary', '')
+                }
+
+    # Outside the window (or past dates): typical conditions for that time of year
+    normals = climate_normals(lat, lon, target_date)
+    if normals is not None:
+        return {"date": date, "location": location, "latitude": lat, "longitude": lon, **normals}
+    return {"error": error}
 
 @tool
 def find_places_nearby(city: str, interests: List[str], keyword: Optional[str] = None, place_type: Optional[str] = None) -> List[Dict[str, Any]]:
     """Finds relevant places in a city based on interests, keywords, or place types."""
     logging.info(f"TOOL CALLED: find_places_nearby(city='{city}', interests={interests}, keyword='{keyword}', place_type='{place_type}')")
 
-    if not gmaps_active:
+    if not gmaps_active and PLACES_BACKEND != "offline":
         return [{"error": "Maps service not available."}]
 
     # Construct query
-    query = ""
-    if keyword:
-        query = f"{keyword} in {city}"
-    elif interests:
-        query = f"{' '.join(interests)} in {city}"
-    elif place_type:
-        query = f"{place_type} in {city}"
-    else:
+    query = build_places_query(city, interests, keyword, place_type)
+    if not query:
         return [{"error": "Must provide interests, keyword, or place_type."}]
 
     try:
-        places_result = gmaps.places(query=query)
+        places_result = search_places(query)
         if places_result.get('status') != 'OK':
             return [{"error": f"Places API error: {places_result.get('status')}"}]
 
@@ -151,18 +307,24 @@ def get_travel_info(origin_lat: float, origin_lon: float, dest_lat: float, dest_
             "status": "OK_DUMMY"
         }
 
+    cached = travel_cache.get(travel_key((origin_lat, origin_lon), (dest_lat, dest_lon), mode)) if mode.lower() != "transit" else None
+    if cached is not None:
+        return {
+            "origin": f"({origin_lat},{origin_lon})",
+            "destination": f"({dest_lat},{dest_lon})",
+            "mode": mode.lower(),
+            **cached,
+            "status": "OK"
+        }
+
     try:
-        directions_result = gmaps.directions(
-            (origin_lat, origin_lon),
-            (dest_lat, dest_lon),
-            mode=mode.lower(),
-            departure_time=datetime.now() if mode.lower() == 'transit' else None
-        )
+        directions_result = fetch_directions(origin_lat, origin_lon, dest_lat, dest_lon, mode)
 
         if not directions_result:
             return {"error": "No route found", "status": "ZERO_RESULTS"}
 
         leg = directions_result[0]['legs'][0]
+        store_travel_leg((origin_lat, origin_lon), (dest_lat, dest_lon), mode, leg['duration'], leg['distance'])
         return {
             "origin": f"({origin_lat},{origin_lon})",
             "destination": f"({dest_lat},{dest_lon})",
@@ -177,5 +339,128 @@ def get_travel_info(origin_lat: float, origin_lon: float, dest_lat: float, dest_
     except Exception as e:
         return {"error": f"Error getting travel info: {str(e)}", "status": "REQUEST_FAILED"}
 
+@tool
+def group_places_by_day(days: int, places: Optional[List[Dict[str, Any]]] = None, refs: Optional[List[str]] = None,
+                        max_per_day: Optional[int] = None) -> dict:
+    """
+    Groups candidate places into one geographically coherent bucket per trip day.
+    Pass the candidate `places` (entries of find_places_nearby results as returned: `n`, `lat`, `lon`, `r`,
+    or `name`, `latitude`, `longitude`, `rating`); `refs` of earlier results may be added to include all their places.
+    Keeps the best-rated places when there are more than fit.
+    """
+    logging.info(f"TOOL CALLED: group_places_by_day(days={days}, places={len(places or [])}, refs={refs}, max_per_day={max_per_day})")
+    from ..core.projection import place_relevance  # Import here to avoid circular dependency
+
+    if days < 1:
+        return {"error": "days must be at least 1."}
+    if max_per_day is not None and max_per_day < 1:
+        return {"error": "max_per_day must be at least 1."}
+    max_per_day = max_per_day or CLUSTER_MAX_PLACES_PER_DAY
+
+    candidates, missing_refs = [], []
+    for place in places or []:
+        if not isinstance(place, dict):
+            continue
+        candidates.append({**place, "name": place.get("name", place.get("n")),
+                           "address": place.get("address", place.get("a")),
+                           "rating": place.get("rating", place.get("r")),
+                           "latitude": place.get("latitude", place.get("lat")),
+                           "longitude": place.get("longitude", place.get("lon"))})
+    for ref in refs or []:
+        payload = get_result(ref)
+        if not isinstance(payload, list):
+            missing_refs.append(ref)
+            continue
+        candidates.extend(p for p in payload if isinstance(p, dict) and "error" not in p)
+    if missing_refs and not candidates:
+        return {"error": f"Results {', '.join(missing_refs)} are no longer available. Pass the places inline instead."}
+
+    unique, seen = [], set()
+    for place in candidates:
+        key = place.get("place_id") or (place.get("name"), place.get("address"))
+        usable = isinstance(place.get("latitude"), (int, float)) and isinstance(place.get("longitude"), (int, float))
+        if usable and key not in seen and place.get("status") != "CLOSED_PERMANENTLY":
+            seen.add(key)
+            unique.append(place)
+    if not unique:
+        return {"error": "No places with coordinates to group."}
+    unique.sort(key=place_relevance, reverse=True)
+    unique = unique[:days * max_per_day]
+
+    try:
+        buckets = group_into_days(unique, days, max_per_day)
+    except Exception as e:
+        return {"error": f"Error grouping places: {str(e)}"}
+
+    return {"days": [{
+        "day": i + 1,
+        "center": bucket["center"],
+        "spread_km": bucket["spread_km"],
+        "places": [{"name": p.get("name"), "address": p.get("address"), "lat": round(p["latitude"], 5),
+                    "lon": round(p["longitude"], 5), "rating": p.get("rating")} for p in bucket["places"]],
+    } for i, bucket in enumerate(buckets)]}
+
+@tool
+def optimize_day_route(places: List[Dict[str, Any]], mode: str = "walking", start_time: str = "09:00",
+                       keep_first: bool = False, keep_last: bool = False) -> dict:
+    """
+    Orders one day's places to minimize total travel time and returns a timed schedule.
+    Each place needs `name`, `latitude` and `longitude`; optional `visit_minutes`, `opens` and `closes` ("HH:MM").
+    Use keep_first/keep_last to fix the first/last place (e.g. the hotel).
+    """
+    logging.info(f"TOOL CALLED: optimize_day_route({len(places)} places, mode='{mode}', start_time='{start_time}')")
+
+    points = []
+    for place in places:
+        lat = place.get("latitude", place.get("lat"))
+        lon = place.get("longitude", place.get("lon"))
+        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+            return {"error": f"Place '{place.get('name', place.get('n'))}' has no latitude/longitude."}
+        points.append((float(lat), float(lon)))
+    if not points:
+        return {"error": "No places given."}
+
+    try:
+        problem = RouteProblem(
+            fetch_travel_matrix(points, mode),
+            visit_min=[float(p.get("visit_minutes") or 60) for p in places],
+            windows=[(parse_clock(p.get("opens")), parse_clock(p.get("closes"))) for p in places],
+            start=0 if keep_first else None,
+            end=len(places) - 1 if keep_last and len(places) > 1 else None,
+            day_start_min=parse_clock(start_time) or 9 * 60
+        )
+        order = problem.solve()
+        minutes_late, travel = problem.evaluate(order)
+        original_travel = problem.evaluate(list(range(len(places))))[1]
+    except Exception as e:
+        return {"error": f"Error optimizing route: {str(e)}"}
+
+    schedule = []
+    for row in problem.schedule(order):
+        place = places[row["stop"]]
+        schedule.append({"name": place.get("name", place.get("n")), "arrive": row["arrive"], "depart": row["depart"],
+                         "travel_minutes_from_previous": row["travel_min"]})
+    return {
+        "mode": mode.lower(),
+        "order": schedule,
+        "total_travel_minutes": round(travel),
+        "input_order_travel_minutes": round(original_travel),
+        "minutes_late": round(minutes_late),
+    }
+
+@tool
+def lookup_tool_result(ref: str, index: Optional[int] = None) -> Any:
+    """Returns the full details of an earlier tool result by its `ref`, or of a single place in it by index `i`."""
+    logging.info(f"TOOL CALLED: lookup_tool_result(ref='{ref}', index={index})")
+
+    payload = get_result(ref)
+    if payload is None:
+        return {"error": f"Result {ref} is no longer available. Call the tool that produced it again instead."}
+    if index is None:
+        return payload
+    if not isinstance(payload, list) or not 0 <= index < len(payload):
+        return {"error": f"Result {ref} has no item at index {index}"}
+    return payload[index]
+
 # List of all available tools
-tools = [get_weather_forecast, find_places_nearby, get_travel_info] 
\ No newline at end of file
+tools = [get_weather_forecast, find_places_nearby, get_travel_info, group_places_by_day, optimize_day_route, lookup_tool_result] 
\ No newline at end of file
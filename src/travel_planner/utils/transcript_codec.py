@@ -0,0 +1,143 @@
+"""
+Compact binary encoding of LangChain message transcripts.
+
+Stored transcripts include every tool call and tool result, and the same large
+strings recur throughout (a places payload is re-sent in later turns, tool
+call ids and names repeat). Each encoded blob is laid out as:
+
+    b"UTX" | version (1 byte) | flags (1 byte) | body
+
+The body is `[string_table, messages]`, serialized with msgpack (ormsgpack,
+listed in requirements.txt; JSON is the fallback when it is missing) and
+zlib-compressed when that makes it smaller. The flags record which was used,
+so a blob is always decoded correctly. Decoding a msgpack body still needs
+ormsgpack.
+
+Messages are LangChain's `messages_to_dict` form with defaults (None, empty
+containers, False) and the duplicated `type` key removed. Any string of at least
+INTERN_MIN_LENGTH characters that occurs more than once is stored in the string
+table once. Its occurrences become a reference, "\\x00" followed by the table
+index; a literal string starting with "\\x00" is escaped as "\\x00\\x00...".
+"""
+
+import json
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+try:
+    import ormsgpack
+except ImportError:  # optional: JSON bodies are used instead
+    ormsgpack = None
+
+MAGIC = b"UTX"
+VERSION = 1
+FLAG_COMPRESSED = 0x01
+FLAG_MSGPACK = 0x02
+_HEADER_LENGTH = len(MAGIC) + 2
+
+# Shorter strings cost less inline than as a reference
+INTERN_MIN_LENGTH = 24
+COMPRESSION_LEVEL = 6
+_REF = "\x00"
+
+
+class TranscriptDecodeError(ValueError):
+    """Raised for blobs that are not transcripts or use an unsupported version or body encoding."""
+
+
+def _walk_strings(value: Any, counts: Counter) -> None:
+    if isinstance(value, str):
+        if len(value) >= INTERN_MIN_LENGTH:
+            counts[value] += 1
+    elif isinstance(value, dict):
+        for item in value.values():
+            _walk_strings(item, counts)
+    elif isinstance(value, list):
+        for item in value:
+            _walk_strings(item, counts)
+
+
+def _intern(value: Any, index: Dict[str, int]) -> Any:
+    if isinstance(value, str):
+        if value in index:
+            return f"{_REF}{index[value]}"
+        return _REF + value if value.startswith(_REF) else value
+    if isinstance(value, dict):
+        return {key: _intern(item, index) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_intern(item, index) for item in value]
+    return value
+
+
+def _resolve(value: Any, table: List[str]) -> Any:
+    if isinstance(value, str):
+        if not value.startswith(_REF):
+            return value
+        if value.startswith(_REF, 1):
+            return value[1:]
+        return table[int(value[1:])]
+    if isinstance(value, dict):
+        return {key: _resolve(item, table) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, table) for item in value]
+    return value
+
+
+def _is_default(value: Any) -> bool:
+    return value is None or value is False or (isinstance(value, (dict, list)) and not value)
+
+
+def _compact(message: Dict[str, Any]) -> List[Any]:
+    data = {key: value for key, value in message["data"].items()
+            if key != "type" and (key == "content" or not _is_default(value))}
+    return [message["type"], data]
+
+
+def encode_messages(messages: Sequence[BaseMessage], compress: bool = True) -> bytes:
+    """Encodes a message sequence into a versioned binary blob."""
+    compacted = [_compact(message) for message in messages_to_dict(list(messages))]
+    counts: Counter = Counter()
+    _walk_strings(compacted, counts)
+    table = [text for text, count in counts.items() if count > 1]
+    index = {text: i for i, text in enumerate(table)}
+    body_value = [table, _intern(compacted, index)]
+
+    flags = 0
+    if ormsgpack is not None:
+        body = ormsgpack.packb(body_value, default=str)
+        flags |= FLAG_MSGPACK
+    else:
+        body = json.dumps(body_value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    if compress:
+        compressed = zlib.compress(body, COMPRESSION_LEVEL)
+        if len(compressed) < len(body):
+            body, flags = compressed, flags | FLAG_COMPRESSED
+    return MAGIC + bytes((VERSION, flags)) + body
+
+
+def decode_messages(blob: bytes) -> List[BaseMessage]:
+    """Decodes a blob written by encode_messages back into LangChain messages."""
+    blob = bytes(blob)
+    if len(blob) < _HEADER_LENGTH or not blob.startswith(MAGIC):
+        raise TranscriptDecodeError("Not an encoded transcript.")
+    version, flags = blob[len(MAGIC)], blob[len(MAGIC) + 1]
+    if version != VERSION:
+        raise TranscriptDecodeError(f"Unsupported transcript version {version}.")
+    body = blob[_HEADER_LENGTH:]
+    try:
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        if flags & FLAG_MSGPACK:
+            if ormsgpack is None:
+                raise TranscriptDecodeError("Transcript is msgpack-encoded but ormsgpack is not installed.")
+            table, compacted = ormsgpack.unpackb(body)
+        else:
+            table, compacted = json.loads(body)
+        return messages_from_dict([{"type": kind, "data": _resolve(data, table)} for kind, data in compacted])
+    except TranscriptDecodeError:
+        raise
+    except (zlib.error, ValueError, TypeError, IndexError, KeyError) as e:
+        raise TranscriptDecodeError(f"Corrupt transcript: {e}") from e
@@ -0,0 +1,259 @@
+"""
+Cache warmer for popular destinations.
+
+Pre-populates the caches behind utils/tools.py for a list of cities, date
+windows and interest sets, in three phases with bounded parallelism:
+
+1. geocode every city,
+2. weather for cities with a date window inside the forecast window, and the
+   Places queries the planner is most likely to issue for each interest set
+   (see core/prefetch.py),
+3. travel times between the top places of each (city, interests) pair for
+   each travel mode, stored pairwise in the travel cache.
+
+Every upstream call is charged against a spend cap in billable units (one per
+geocode, weather or Places request, one per Distance Matrix element); entries
+that are already cached cost nothing. Work that would exceed the cap is
+skipped and reported. The report lists per-city coverage.
+
+With a shared state backend (SHARED_STATE_BACKEND "sqlite" or "resp") every
+cache lives in the shared tier, so one warm run serves all workers. With the
+default "local" backend geocode, weather and travel entries live in process
+memory, so warm the process that serves traffic (CACHE_WARMUP_SPEC warms each
+backend worker at startup) or persist Places results with PLACE_STORE_PATH.
+
+    python -m travel_planner warm --cities Paris Rome --interests museums,art food --dates 2026-11-01:2026-11-04
+    python backend/manage.py warm_caches --spec warmup.json
+"""
+
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config.settings import (
+    WEATHER_API_KEY,
+    ROUTE_MATRIX_MAX_STOPS,
+    WARMUP_MAX_WORKERS,
+    WARMUP_MAX_SPEND,
+    WARMUP_MATRIX_PLACES,
+    logging
+)
+from .core.prefetch import in_forecast_window, planned_place_queries
+from .core.projection import place_relevance
+from .utils.cache import geocode_cache, weather_cache, travel_cache
+from .utils.clients import gmaps_active
+from .utils.place_store import place_store
+from .utils.tools import (
+    geocode_location,
+    fetch_daily_forecast,
+    search_places,
+    fetch_travel_matrix,
+    travel_key,
+    _normalize_text
+)
+
+DEFAULT_MODES = ["walking"]
+
+
+class SpendCap:
+    """Thread-safe budget of billable upstream units."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, units: int) -> bool:
+        with self._lock:
+            if self.used + units > self.limit:
+                return False
+            self.used += units
+            return True
+
+
+class CacheWarmer:
+    """Runs one warm-up and collects its per-city coverage report."""
+
+    def __init__(self, max_workers: int = WARMUP_MAX_WORKERS, max_spend: int = WARMUP_MAX_SPEND,
+                 matrix_places: int = WARMUP_MATRIX_PLACES):
+        self.max_workers = max_workers
+        self.spend = SpendCap(max_spend)
+        self.matrix_places = max(2, min(matrix_places, ROUTE_MATRIX_MAX_STOPS))
+        self.report: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, city: str, part: str, status: str) -> None:
+        with self._lock:
+            self.report.setdefault(city, {}).setdefault(part, []).append(status)
+
+    def _run(self, executor: ThreadPoolExecutor, tasks: List[Tuple[str, str, bool, int, Callable[[], Any]]]) -> None:
+        """Runs (city, part, cached, cost, fn) tasks; cached ones cost nothing and are not re-fetched."""
+        futures = []
+        for city, part, cached, cost, fn in tasks:
+            if cached:
+                self._record(city, part, "cached")
+            elif not self.spend.reserve(cost):
+                self._record(city, part, "over_budget")
+            else:
+                futures.append((city, part, executor.submit(fn)))
+        for city, part, future in futures:
+            try:
+                ok = future.result() not in (None, False)
+            except Exception as e:
+                logging.warning(f"Warm-up of {part} for {city} failed: {e}")
+                ok = False
+            self._record(city, part, "fetched" if ok else "failed")
+
+    def warm(self, cities: List[str], date_windows: List[Tuple[str, str]], interest_sets: List[List[str]],
+             modes: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Warms all caches for the given destinations and returns the coverage report."""
+        modes = [m.lower() for m in (modes or DEFAULT_MODES)]
+        if not gmaps_active:
+            logging.warning("Google Maps client is not active; nothing to warm.")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="warmup") as executor:
+            self._run(executor, [(city, "geocode", _normalize_text(city) in geocode_cache, 1,
+                                  lambda city=city: geocode_location(city)) for city in cities])
+
+            coords = {city: geocode_cache.get(_normalize_text(city)) for city in cities}
+            tasks = []
+            for city in cities:
+                location = coords.get(city)
+                in_window = any(in_forecast_window(start, end) for start, end in date_windows)
+                if location and WEATHER_API_KEY and in_window:
+                    key = (round(location["lat"], 2), round(location["lng"], 2))
+                    tasks.append((city, "weather", key in weather_cache, 1,
+                                  lambda location=location: fetch_daily_forecast(location["lat"], location["lng"])))
+                else:
+                    self._record(city, "weather", "not_applicable")
+                queries = {query for interests in interest_sets for query in planned_place_queries(city, interests)}
+                for query in sorted(queries):
+                    tasks.append((city, "places", place_store.lookup(query, geocoder=geocode_location) is not None, 1,
+                                      lambda query=query: search_places(query).get("status") in ("OK", "ZERO_RESULTS")))
+            self._run(executor, tasks)
+
+            tasks, seen = [], set()
+            for city in cities:
+                for interests in interest_sets:
+                    points = self._top_points(city, interests)
+                    for mode in modes:
+                        if len(points) < 2 or mode == "transit":
+                            self._record(city, "travel", "not_applicable")
+                            continue
+                        if (tuple(points), mode) in seen:  # interest sets that share their top places
+                            continue
+                        seen.add((tuple(points), mode))
+                        cached = all(travel_key(a, b, mode) in travel_cache for a in points for b in points if a != b)
+                        tasks.append((city, "travel", cached, len(points) ** 2,
+                                      lambda points=points, mode=mode: fetch_travel_matrix(points, mode)))
+            self._run(executor, tasks)
+
+        place_store.save()
+        return self.summary()
+
+    def _top_points(self, city: str, interests: List[str]) -> List[Tuple[float, float]]:
+        """Coordinates of the most relevant places found for an interest set (as stored, no new calls)."""
+        places: Dict[str, Dict[str, Any]] = {}
+        for query in planned_place_queries(city, interests):
+            for place in place_store.lookup(query) or []:
+                places.setdefault(place.get("place_id") or place.get("name"), place)
+        ranked = sorted(places.values(), key=place_relevance, reverse=True)
+        points = []
+        for place in ranked:
+            location = (place.get("geometry") or {}).get("location") or {}
+            if isinstance(location.get("lat"), (int, float)) and isinstance(location.get("lng"), (int, float)):
+                points.append((location["lat"], location["lng"]))
+            if len(points) == self.matrix_places:
+                break
+        return points
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-city counts per cache and overall coverage (warm share of the applicable entries)."""
+        cities, totals = {}, {}
+        for city, parts in self.report.items():
+            cities[city] = {}
+            for part, statuses in parts.items():
+                counts = {status: statuses.count(status) for status in set(statuses)}
+                cities[city][part] = counts
+                for status, count in counts.items():
+                    totals[status] = totals.get(status, 0) + count
+        applicable = sum(count for status, count in totals.items() if status != "not_applicable")
+        warm = totals.get("cached", 0) + totals.get("fetched", 0)
+        return {
+            "cities": cities,
+            "totals": totals,
+            "coverage": round(warm / applicable, 3) if applicable else 1.0,
+            "spend": {"used": self.spend.used, "cap": self.spend.limit},
+        }
+
+
+def _date_window(value: str) -> Tuple[str, str]:
+    start, _, end = value.partition(":")
+    return start, end or start
+
+
+def add_warmup_arguments(parser: argparse.ArgumentParser) -> None:
+    """Arguments shared by `python -m travel_planner warm` and the warm_caches management command."""
+    parser.add_argument("--cities", nargs="+", default=[], help="Destinations to warm")
+    parser.add_argument("--dates", action="append", default=[], metavar="START[:END]",
+                        help="Date window (YYYY-MM-DD); repeatable")
+    parser.add_argument("--interests", nargs="+", default=[], metavar="A,B",
+                        help="Interest sets, each comma-separated (e.g. museums,art food)")
+    parser.add_argument("--modes", nargs="+", default=[], help="Travel modes for travel times (default: walking)")
+    parser.add_argument("--spec", help="JSON file with cities, date_windows, interest_sets and modes")
+    parser.add_argument("--workers", type=int, default=WARMUP_MAX_WORKERS, help="Parallel upstream calls")
+    parser.add_argument("--max-spend", type=int, default=WARMUP_MAX_SPEND,
+                        help="Cap on billable units (1 per geocode/weather/Places request, 1 per matrix element)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+
+def load_spec(path: str) -> Dict[str, Any]:
+    """Reads a warm-up spec: {"cities": [...], "date_windows": [[start, end]], "interest_sets": [[...]], "modes": [...]}."""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    spec["date_windows"] = [tuple(w) if isinstance(w, list) else _date_window(w) for w in spec.get("date_windows", [])]
+    return spec
+
+
+def warm_from_args(args: Any) -> Dict[str, Any]:
+    """Runs a warm-up from parsed arguments (a --spec file is merged with the other flags)."""
+    spec = load_spec(args.spec) if args.spec else {}
+    cities = list(spec.get("cities", [])) + list(args.cities)
+    date_windows = list(spec.get("date_windows", [])) + [_date_window(d) for d in args.dates]
+    interest_sets = list(spec.get("interest_sets", [])) + [[i.strip() for i in s.split(",") if i.strip()] for s in args.interests]
+    modes = list(spec.get("modes", [])) + list(args.modes)
+    warmer = CacheWarmer(max_workers=args.workers, max_spend=args.max_spend)
+    return warmer.warm(cities, date_windows, interest_sets or [[]], modes)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable coverage table."""
+    lines = [f"{'City':<20} {'Cache':<9} {'Cached':>6} {'Fetched':>7} {'Failed':>6} {'Over cap':>8}"]
+    for city, parts in report["cities"].items():
+        for part, counts in parts.items():
+            if set(counts) == {"not_applicable"}:
+                continue
+            lines.append(f"{city[:20]:<20} {part:<9} {counts.get('cached', 0):>6} {counts.get('fetched', 0):>7} "
+                         f"{counts.get('failed', 0):>6} {counts.get('over_budget', 0):>8}")
+    lines.append(f"Coverage: {report['coverage']:.0%}  Spend: {report['spend']['used']}/{report['spend']['cap']} units")
+    return "\n".join(lines)
+
+
+def start_background_warmup(spec_path: str) -> Optional[threading.Thread]:
+    """Warms this process's caches from a spec file without blocking startup."""
+    if not spec_path:
+        return None
+
+    def run():
+        try:
+            spec = load_spec(spec_path)
+            report = CacheWarmer().warm(spec.get("cities", []), spec.get("date_windows", []),
+                                        spec.get("interest_sets") or [[]], spec.get("modes"))
+            logging.info(f"Startup cache warm-up done: coverage {report['coverage']:.0%}, spend {report['spend']['used']} units.")
+        except Exception as e:
+            logging.error(f"Startup cache warm-up failed: {e}", exc_info=True)
+
+    thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread